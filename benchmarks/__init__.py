@@ -0,0 +1,13 @@
+import os
+
+# The benchmarks measure the routes, not the throttle in front of them; set
+# DUMMY_RATE_LIMIT=on to include it (benchmarks.ratelimit measures it directly)
+os.environ.setdefault("DUMMY_RATE_LIMIT", "off")
+
+# Likewise, queue image renders rather than answering 503 once the media pool
+# is busy (benchmarks.media measures the backpressure with --queue)
+os.environ.setdefault("DUMMY_MEDIA_QUEUE", "1000")
+
+# The admin routes are closed unless someone is named; the samples are sent as
+# the default user
+os.environ.setdefault("DUMMY_ADMIN_EMAILS", "user@example.com")
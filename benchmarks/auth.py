@@ -0,0 +1,84 @@
+"""Bearer-token auth overhead: verified-token cache vs full HS256 verification.
+
+Times TokenAuthority.verify on its own (cache hit vs base64 + JSON + HMAC), then
+drives a protected route through the ASGI app with auth off, with the cache and
+without it, and reports the per-request difference:
+
+    python -m benchmarks.auth --tokens 10000 --requests 2000
+    python -m benchmarks.auth --route /api/jobs/stats --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+import dummy_endpoint
+from benchmarks.routes import USER_EMAIL, auth_headers, bench_http_route
+from dummy_api import app
+from dummy_auth import TokenAuthority
+
+
+def per_op_ns(operation, items):
+    start = time.perf_counter_ns()
+    for item in items:
+        operation(item)
+    return round((time.perf_counter_ns() - start) / len(items), 1)
+
+
+def verify_costs(count):
+    user = dummy_endpoint.mock_db.get_user_by_email(USER_EMAIL)
+    authority = TokenAuthority("bench-secret", cache_size=count)
+    tokens = [authority.issue(user) for _ in range(count)]
+    return {
+        "issue_ns": per_op_ns(lambda _: authority.issue(user), range(count)),
+        "verify_uncached_ns": per_op_ns(authority.verify, tokens),
+        "verify_cached_ns": per_op_ns(authority.verify, tokens),
+        "decode_ns": per_op_ns(authority.decode, tokens),
+    }
+
+
+async def route_costs(route, requests, concurrency):
+    authority = dummy_endpoint.auth
+    cache_size, enabled_before = authority.cache_size, dummy_endpoint.AUTH_ENABLED
+    modes = {}
+    try:
+        async with httpx.AsyncClient(base_url="http://bench", transport=httpx.ASGITransport(app=app),
+                                     headers=auth_headers()) as client:
+            for mode, enabled, size in [("auth_off", False, cache_size), ("cached", True, cache_size),
+                                        ("uncached", True, 0)]:
+                dummy_endpoint.AUTH_ENABLED = enabled
+                authority.cache_size = size
+                authority.cache.clear()
+                report = await bench_http_route(client, "GET", route, {}, requests, concurrency)
+                modes[mode] = {
+                    "requests_per_sec": report["requests_per_sec"],
+                    "mean_ms": report["latency_ms"]["mean"],
+                    "p99_ms": report["latency_ms"]["p99"],
+                }
+    finally:
+        dummy_endpoint.AUTH_ENABLED = enabled_before
+        authority.cache_size = cache_size
+    baseline = modes["auth_off"]["mean_ms"]
+    for mode in ("cached", "uncached"):
+        modes[mode]["auth_overhead_us"] = round((modes[mode]["mean_ms"] - baseline) * 1000, 1)
+    return {"route": route, "concurrency": concurrency, "modes": modes}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=10_000, help="distinct tokens for the verify micro-benchmark")
+    parser.add_argument("--route", default="/verify-token", help="protected GET route to drive")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args(argv)
+    report = {
+        "verify": verify_costs(args.tokens),
+        "route": asyncio.run(route_costs(args.route, args.requests, args.concurrency)),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Page loads as separate requests versus one /batch round trip.
+
+A page load is the frontend's burst of calls (benchmarks.routes.PAGE_LOAD),
+made four ways:
+
+- sequential: one request after another, as the frontend does today
+- parallel: all at once, one request each
+- batch: a single POST /batch
+- stream: POST /batch?stream=true; also reports the time to the first result
+
+--rtt-ms adds a simulated network round trip to every request, which is what
+batching saves on a real network; loopback and in-process calls only save the
+per-request HTTP and middleware work:
+
+    python -m benchmarks.batch --loads 500 --concurrency 8
+    python -m benchmarks.batch --mode loopback --rtt-ms 40
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from benchmarks.routes import PAGE_LOAD, LatencyRecorder, LoopbackServer, auth_headers, fund
+from dummy_api import app
+
+STRATEGIES = ("sequential", "parallel", "batch", "stream")
+
+
+async def round_trip(client, rtt, method, path, **kwargs):
+    if rtt:
+        await asyncio.sleep(rtt)
+    return await client.request(method, path, **kwargs)
+
+
+async def page_load(client, strategy, rtt, first):
+    """One page load; returns the number of failed calls."""
+    if strategy == "sequential":
+        responses = [await round_trip(client, rtt, call["method"], call["path"]) for call in PAGE_LOAD]
+        return sum(response.status_code >= 400 for response in responses)
+    if strategy == "parallel":
+        responses = await asyncio.gather(*(round_trip(client, rtt, call["method"], call["path"]) for call in PAGE_LOAD))
+        return sum(response.status_code >= 400 for response in responses)
+    if strategy == "batch":
+        response = await round_trip(client, rtt, "POST", "/batch", json={"requests": PAGE_LOAD})
+        if response.status_code != 200:
+            return len(PAGE_LOAD)
+        return sum(result["status"] >= 400 for result in response.json()["responses"])
+    start = time.perf_counter()
+    if rtt:
+        await asyncio.sleep(rtt)
+    failed = len(PAGE_LOAD)
+    async with client.stream("POST", "/batch", params={"stream": "true"}, json={"requests": PAGE_LOAD}) as response:
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            if failed == len(PAGE_LOAD):
+                first.record(time.perf_counter() - start)
+            failed -= json.loads(line)["status"] < 400
+    return failed
+
+
+async def run_strategy(client, strategy, loads, concurrency, rtt):
+    recorder = LatencyRecorder()
+    first = LatencyRecorder()
+    remaining = iter(range(loads))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                recorder.errors += await page_load(client, strategy, rtt, first)
+            except httpx.HTTPError:
+                recorder.errors += 1
+                continue
+            recorder.record(time.perf_counter() - start)
+
+    # Warm up before timing
+    await page_load(client, strategy, 0, LatencyRecorder())
+    recorder.started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    recorder.finished = time.perf_counter()
+    report = recorder.report()
+    del report["histogram"]
+    report["page_loads_per_sec"] = report.pop("requests_per_sec")
+    if strategy == "stream":
+        report["first_result_ms"] = first.report()["latency_ms"]
+    return report
+
+
+async def run(args, base_url, transport):
+    # A browser opens up to six connections per host
+    limits = httpx.Limits(max_connections=6 * args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, transport=transport, limits=limits,
+                                 headers=auth_headers()) as client:
+        return {strategy: await run_strategy(client, strategy, args.loads, args.concurrency, args.rtt_ms / 1000)
+                for strategy in args.strategies}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["inprocess", "loopback"], default="inprocess")
+    parser.add_argument("--loads", type=int, default=200, help="timed page loads per strategy")
+    parser.add_argument("--concurrency", type=int, default=4, help="page loads at once")
+    parser.add_argument("--rtt-ms", type=float, default=0.0, help="simulated network round trip per request")
+    parser.add_argument("--strategies", nargs="+", choices=STRATEGIES, default=list(STRATEGIES))
+    args = parser.parse_args(argv)
+    fund()
+    if args.mode == "inprocess":
+        results = asyncio.run(run(args, "http://bench", httpx.ASGITransport(app=app)))
+    else:
+        with LoopbackServer() as server:
+            results = asyncio.run(run(args, server.base_url, None))
+    print(json.dumps({"mode": args.mode, "rtt_ms": args.rtt_ms, "calls_per_load": len(PAGE_LOAD),
+                      "strategies": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Credit ledger under contention: debits per second for one hot user, with a double-spend check.
+
+Times reserve/commit/release on the ledger alone, then fires concurrent
+/movie/clips requests for a single user whose balance covers only part of
+them, and checks that exactly balance // cost succeed and the rest get 402:
+
+    python -m benchmarks.credits --ops 200000
+    python -m benchmarks.credits --requests 5000 --concurrency 64
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import httpx
+
+import dummy_endpoint
+from benchmarks.routes import auth_headers
+from dummy_api import app
+from dummy_credits import CREDIT_COSTS, CreditLedger, InsufficientCredits
+
+
+def ledger_costs(ops):
+    ledger = CreditLedger()
+    user = {"email": "hot@example.com", "credits_remaining": ops * 2}
+    start = time.perf_counter()
+    for _ in range(ops):
+        ledger.commit(ledger.reserve(user, 1))
+    committed = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(ops):
+        ledger.release(ledger.reserve(user, 1))
+    released = time.perf_counter() - start
+    user["credits_remaining"] = 0
+    start = time.perf_counter()
+    for _ in range(ops):
+        try:
+            ledger.reserve(user, 1)
+        except InsufficientCredits:
+            pass
+    rejected = time.perf_counter() - start
+    return {
+        "reserve_commit_per_sec": round(ops / committed),
+        "reserve_release_per_sec": round(ops / released),
+        "rejected_reserve_per_sec": round(ops / rejected),
+    }
+
+
+async def hot_user(requests, concurrency, affordable):
+    email = f"hot-{uuid.uuid4().hex}@example.com"
+    user = dummy_endpoint.mock_db.create_user(email)
+    cost = CREDIT_COSTS["movie"]
+    user["credits_remaining"] = balance = affordable * cost
+    body = {"clips": [{"url": "https://example.com/clip.mp4", "start": 0, "end": 5}], "output_name": "hot"}
+    statuses = {}
+    remaining = iter(range(requests))
+
+    async def worker(client):
+        for _ in remaining:
+            response = await client.post("/movie/clips", json=body)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url="http://bench", transport=httpx.ASGITransport(app=app),
+                                 headers=auth_headers(email), limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    expected = min(requests, affordable)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "requests_per_sec": round(requests / elapsed, 1),
+        "statuses": statuses,
+        "starting_balance": balance,
+        "final_balance": user["credits_remaining"],
+        "consistent": statuses.get(200, 0) == expected and user["credits_remaining"] == balance - expected * cost,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ops", type=int, default=100_000, help="ledger operations per micro-benchmark")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--affordable", type=int, default=None,
+                        help="debits the hot user's balance covers (default: half of --requests)")
+    args = parser.parse_args(argv)
+    affordable = args.requests // 2 if args.affordable is None else args.affordable
+    report = {
+        "ledger": ledger_costs(args.ops),
+        "route": asyncio.run(hot_user(args.requests, args.concurrency, affordable)),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
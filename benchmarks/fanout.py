@@ -0,0 +1,86 @@
+"""Fan-out benchmark for dummy_connections.ConnectionManager.
+
+Registers N in-process subscribers (no sockets: each send is a coroutine that
+records the arrival time, optionally sleeping to model a slow network) plus a
+few stalled ones, publishes a paced job's frames to all of them and reports
+publish cost, delivery latency percentiles and frames dropped:
+
+    python -m benchmarks.fanout --subscribers 10000 --frames 20 --interval 0.05
+    python -m benchmarks.fanout --subscribers 20000 --stalled 100 --send-delay 0.001
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.routes import LatencyRecorder
+from dummy_connections import ConnectionManager
+
+TOPIC = ("user@example.com", "fanout-bench")
+
+
+async def run(args):
+    manager = ConnectionManager(args.queue_size)
+    latency = LatencyRecorder()
+    delivered = 0
+
+    async def send(message):
+        nonlocal delivered
+        if args.send_delay:
+            await asyncio.sleep(args.send_delay)
+        latency.record(time.perf_counter() - json.loads(message)["published_at"])
+        delivered += 1
+
+    async def stalled(message):
+        await asyncio.sleep(3600)
+
+    subscribers = [manager.register(f"user{i}", send) for i in range(args.subscribers)]
+    stuck = [manager.register(f"stalled{i}", stalled) for i in range(args.stalled)]
+    for subscriber in subscribers + stuck:
+        manager.subscribe(subscriber, TOPIC)
+
+    publish_seconds = 0.0
+    start = time.perf_counter()
+    for index in range(args.frames):
+        if index:
+            await asyncio.sleep(args.interval)
+        began = time.perf_counter()
+        frame = {"status": "processing", "progress": round(100 * index / max(1, args.frames - 1)), "published_at": began}
+        manager.publish(TOPIC, frame, final=index == args.frames - 1)
+        publish_seconds += time.perf_counter() - began
+    await asyncio.gather(*(manager.finish(subscriber) for subscriber in subscribers))
+    elapsed = time.perf_counter() - start
+
+    dropped = sum(subscriber.dropped for subscriber in subscribers)
+    stalled_dropped = sum(subscriber.dropped for subscriber in stuck)
+    for subscriber in stuck:
+        manager.disconnect(subscriber)
+    return {
+        "subscribers": args.subscribers,
+        "stalled": args.stalled,
+        "frames": args.frames,
+        "queue_size": args.queue_size,
+        "elapsed_s": round(elapsed, 3),
+        "publish_us_per_frame": round(publish_seconds / args.frames * 1e6, 1),
+        "publish_ns_per_subscriber": round(publish_seconds / args.frames / (args.subscribers + args.stalled) * 1e9, 1),
+        "delivered": delivered,
+        "dropped": dropped,
+        "stalled_dropped": stalled_dropped,
+        "delivery_ms": latency.report()["latency_ms"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscribers", type=int, default=10_000)
+    parser.add_argument("--stalled", type=int, default=10, help="subscribers whose send never completes")
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.05, help="seconds between published frames")
+    parser.add_argument("--send-delay", type=float, default=0.0, help="seconds each send takes")
+    parser.add_argument("--queue-size", type=int, default=32)
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
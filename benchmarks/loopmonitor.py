@@ -0,0 +1,109 @@
+"""Event loop blocking check: loop lag while each route is driven, plus a detection test with injected stalls.
+
+Drives every HTTP route sample from benchmarks.routes with a LoopMonitor
+watching, reports the worst lag and the stacks of any blocked calls per route,
+and exits with status 1 if a route blocked the loop for longer than --budget-ms.
+Garbage collection pauses land on whichever route happens to allocate, so the
+GC part of a stall doesn't count against the budget:
+
+    python -m benchmarks.loopmonitor --requests 200 --budget-ms 50
+    python -m benchmarks.loopmonitor --only /colorize-image --inject 10
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+import httpx
+
+from benchmarks.routes import _selected, auth_headers, bench_http_route, collect_routes, fund
+from dummy_api import app
+from dummy_loopmonitor import LoopMonitor
+
+
+def _injected_block(seconds):
+    time.sleep(seconds)
+
+
+async def detection(monitor, stalls, block_ms):
+    """Block the loop `stalls` times and check that each one is flagged with the culprit's stack."""
+    monitor.blocked_calls.clear()
+    blocked = monitor.blocked
+    for _ in range(stalls):
+        await asyncio.sleep(monitor.interval * 2)
+        _injected_block(block_ms / 1000)
+    await asyncio.sleep(monitor.interval * 2)
+    calls = list(monitor.blocked_calls)
+    measured = [call["blocked_ms"] for call in calls if call["blocked_ms"] is not None]
+    return {
+        "stalls": stalls,
+        "block_ms": block_ms,
+        "flagged": monitor.blocked - blocked,
+        "stacks_captured": len(calls),
+        "stacks_with_culprit": sum(call["stack"][-1].startswith("_injected_block ") for call in calls),
+        "mean_measured_ms": round(sum(measured) / len(measured), 3) if measured else None,
+    }
+
+
+async def route_lag(monitor, requests, concurrency, only, budget_ms):
+    http_routes, _ = collect_routes()
+    results = {}
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url="http://bench", transport=httpx.ASGITransport(app=app),
+                                 headers=auth_headers(), limits=limits) as client:
+        for method, path, sample in http_routes:
+            if not _selected(path, only):
+                continue
+            monitor.recent.clear()
+            monitor.blocked_calls.clear()
+            blocked = monitor.blocked
+            await bench_http_route(client, method, path, sample, requests, concurrency)
+            # Let the heartbeat report a stall that is still in flight
+            await asyncio.sleep(monitor.interval * 2)
+            calls = list(monitor.blocked_calls)
+            results[f"{method} {path}"] = {
+                "max_lag_ms": round(monitor.max_lag() * 1000, 3),
+                "blocked": monitor.blocked - blocked,
+                "over_budget": sum(call["blocked_ms"] is None or call["blocked_ms"] - call["gc_ms"] >= budget_ms
+                                   for call in calls),
+                "blocked_calls": [{"blocked_ms": call["blocked_ms"], "gc_ms": call["gc_ms"], "stack": call["stack"][-3:]}
+                                  for call in calls],
+            }
+    return results
+
+
+async def run(args):
+    monitor = LoopMonitor(args.interval_ms, args.budget_ms, history=100)
+    monitor.start()
+    try:
+        report = {"interval_ms": args.interval_ms, "budget_ms": args.budget_ms}
+        if args.inject:
+            report["detection"] = await detection(monitor, args.inject, args.inject_ms)
+        report["routes"] = await route_lag(monitor, args.requests, args.concurrency, args.only, args.budget_ms)
+    finally:
+        await monitor.stop()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--only", action="append", help="only routes whose path contains this (repeatable)")
+    parser.add_argument("--interval-ms", type=float, default=10.0, help="heartbeat interval")
+    parser.add_argument("--budget-ms", type=float, default=50.0, help="longest acceptable stall")
+    parser.add_argument("--inject", type=int, default=0, help="injected stalls for the detection test")
+    parser.add_argument("--inject-ms", type=float, default=200.0, help="length of each injected stall")
+    args = parser.parse_args(argv)
+    fund()
+    report = asyncio.run(run(args))
+    over = sorted(route for route, result in report["routes"].items() if result["over_budget"])
+    report["over_budget"] = over
+    print(json.dumps(report, indent=2))
+    if over:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
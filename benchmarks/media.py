@@ -0,0 +1,111 @@
+"""Image route throughput per media pool size, with event loop lag and 503s under saturation.
+
+Posts five-image /process_images requests (and /merge_background on the
+result) with the pool resized for each run, and reports renders per second,
+latency, the worst event loop lag seen meanwhile and how many requests were
+turned away with 503:
+
+    python -m benchmarks.media --workers 1 2 4 8 --requests 64
+    python -m benchmarks.media --workers 0 4 --size 1024 --queue 4 --concurrency 32
+
+Workers 0 runs the renders on threads inside the server process, for comparison.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import httpx
+import numpy as np
+
+import dummy_endpoint
+from benchmarks.routes import auth_headers, fund
+from dummy_api import app
+from dummy_loopmonitor import LoopMonitor
+from dummy_media import MediaPool, encode_png
+
+
+def photo_png(size, seed):
+    """Smooth gradients plus noise: compresses like a photo, unlike flat color or pure noise."""
+    rng = np.random.default_rng(seed)
+    ramp = np.linspace(0, 255, size, dtype=np.float32)
+    pixels = np.empty((size, size, 4), np.uint8)
+    pixels[..., 0] = ramp[None, :]
+    pixels[..., 1] = ramp[:, None]
+    pixels[..., 2] = (ramp[None, :] + ramp[:, None]) / 2
+    noise = rng.integers(-12, 13, (size, size, 3))
+    pixels[..., :3] = np.clip(pixels[..., :3] + noise, 0, 255)
+    pixels[..., 3] = 255
+    return encode_png(pixels)
+
+
+async def run_pool(workers, queue, images, requests, concurrency):
+    pool = dummy_endpoint.media = MediaPool(workers, queue)
+    monitor = LoopMonitor(10, 50, history=100)
+    statuses = {}
+    latencies = []
+    files = {f"image{index + 1}": (f"{index}.png", image, "image/png") for index, image in enumerate(images)}
+    remaining = iter(range(requests))
+
+    async def worker(client):
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await client.post("/process_images", files=files)
+            if response.status_code == 200:
+                response = await client.post("/merge_background", json={
+                    "background": {"path": "backgrounds/bench.jpg"}, "emotion": "happy",
+                    "combinedImagePath": response.json()["combined_image_path"]})
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+
+    try:
+        async with httpx.AsyncClient(base_url="http://bench", transport=httpx.ASGITransport(app=app),
+                                     headers=auth_headers(), limits=httpx.Limits(max_connections=concurrency),
+                                     timeout=None) as client:
+            await pool.start()
+            monitor.start()
+            start = time.perf_counter()
+            await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+            elapsed = time.perf_counter() - start
+            await monitor.stop()
+    finally:
+        pool.shutdown()
+    latencies.sort()
+    return {
+        "workers": workers,
+        "max_pending": pool.max_pending,
+        "requests": requests,
+        "renders_per_sec": round(2 * statuses.get(200, 0) / elapsed, 2),
+        "statuses": statuses,
+        "latency_ms": {
+            "p50": round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+            "max": round(latencies[-1] * 1000, 1) if latencies else None,
+        },
+        "max_loop_lag_ms": round(monitor.max_lag() * 1000, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--queue", type=int, default=None, help="renders admitted at once (default: 2x workers)")
+    parser.add_argument("--requests", type=int, default=32, help="process + merge pairs per pool size")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--size", type=int, default=768, help="side of the uploaded square images")
+    args = parser.parse_args(argv)
+    fund()
+    images = [photo_png(args.size, seed) for seed in range(5)]
+    report = {
+        "cpus": os.cpu_count(),
+        "image_size": args.size,
+        "image_bytes": len(images[0]),
+        "runs": [asyncio.run(run_pool(workers, args.queue, images, args.requests, args.concurrency))
+                 for workers in args.workers],
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Metrics recording cost: observe() per request, middleware overhead, and /metrics render time.
+
+    python -m benchmarks.metrics --observations 1000000
+    python -m benchmarks.metrics --route /get-prices --requests 5000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+import dummy_endpoint
+from benchmarks.routes import auth_headers, bench_http_route, collect_routes
+from dummy_api import app
+from dummy_metrics import RequestMetrics
+
+
+def recording_costs(observations):
+    metrics = RequestMetrics()
+    routes = [(method, path) for method, path, _ in collect_routes()[0]]
+    start = time.perf_counter_ns()
+    for index in range(observations):
+        method, path = routes[index % len(routes)]
+        metrics.observe(method, path, 200, 0.0003 * (index % 50), 120 * (index % 1000))
+    observe_ns = (time.perf_counter_ns() - start) / observations
+    start = time.perf_counter()
+    body = metrics.render()
+    return {
+        "observe_ns": round(observe_ns, 1),
+        "series_routes": len(metrics.routes),
+        "render_ms": round((time.perf_counter() - start) * 1000, 3),
+        "render_bytes": len(body),
+    }
+
+
+async def middleware_overhead(route, requests):
+    metrics = dummy_endpoint.metrics
+    enabled = metrics.enabled
+    results = {}
+    try:
+        async with httpx.AsyncClient(base_url="http://bench", transport=httpx.ASGITransport(app=app),
+                                     headers=auth_headers()) as client:
+            # Untimed pass first, so neither mode pays for warming up the app
+            await bench_http_route(client, "GET", route, {}, requests, 1)
+            for mode in ("off", "on"):
+                metrics.enabled = mode == "on"
+                report = await bench_http_route(client, "GET", route, {}, requests, 1)
+                results[mode] = {"requests_per_sec": report["requests_per_sec"], "mean_ms": report["latency_ms"]["mean"]}
+    finally:
+        metrics.enabled = enabled
+    results["overhead_us"] = round((results["on"]["mean_ms"] - results["off"]["mean_ms"]) * 1000, 1)
+    return {"route": route, **results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--observations", type=int, default=500_000)
+    parser.add_argument("--route", default="/api/health", help="GET route for the middleware comparison")
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args(argv)
+    report = {
+        "recording": recording_costs(args.observations),
+        "middleware": asyncio.run(middleware_overhead(args.route, args.requests)),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
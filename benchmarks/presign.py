@@ -0,0 +1,74 @@
+"""Presigned-URL cost: signing (LRU hit vs miss), verification and batch vs per-key requests.
+
+    python -m benchmarks.presign --keys 20000
+    python -m benchmarks.presign --batch 50 --requests 200
+"""
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+import httpx
+
+from benchmarks.routes import auth_headers
+from dummy_api import app
+from dummy_blobs import MEDIA_BUCKET, URLSigner
+
+
+def per_op_ns(operation, items):
+    start = time.perf_counter_ns()
+    for item in items:
+        operation(item)
+    return round((time.perf_counter_ns() - start) / len(items), 1)
+
+
+def signer_costs(count):
+    keys = [f"user@example.com/text_to_video/{index:08d}/thumbnail.jpg" for index in range(count)]
+    signer = URLSigner("bench-secret", cache_size=count)
+    miss = per_op_ns(lambda key: signer.sign(MEDIA_BUCKET, key), keys)
+    hit = per_op_ns(lambda key: signer.sign(MEDIA_BUCKET, key), keys)
+    queries = [(key, dict(parse_qsl(urlsplit(signer.sign(MEDIA_BUCKET, key)[0]).query))) for key in keys]
+    cached_verify = per_op_ns(lambda item: signer.verify(MEDIA_BUCKET, item[0], item[1]), queries)
+    # A fresh signer with the same secret has nothing cached, so every check is an HMAC
+    cold = URLSigner("bench-secret", cache_size=count)
+    hmac_verify = per_op_ns(lambda item: cold.verify(MEDIA_BUCKET, item[0], item[1]), queries)
+    return {
+        "sign_miss_ns": miss,
+        "sign_lru_hit_ns": hit,
+        "verify_lru_hit_ns": cached_verify,
+        "verify_hmac_ns": hmac_verify,
+    }
+
+
+async def round_trips(batch, requests):
+    keys = [f"user@example.com/text_to_video/{index:08d}/thumbnail.jpg" for index in range(batch)]
+    async with httpx.AsyncClient(base_url="http://bench", transport=httpx.ASGITransport(app=app), headers=auth_headers()) as client:
+        start = time.perf_counter()
+        for _ in range(requests):
+            for key in keys:
+                (await client.post("/api/get_s3_file", json={"bucket": MEDIA_BUCKET, "key": key})).raise_for_status()
+        per_key = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(requests):
+            (await client.post("/api/get_s3_file", json={"bucket": MEDIA_BUCKET, "keys": keys})).raise_for_status()
+        batched = time.perf_counter() - start
+    return {
+        "keys_per_page": batch,
+        "per_key_ms_per_page": round(per_key / requests * 1000, 3),
+        "batched_ms_per_page": round(batched / requests * 1000, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=10_000, help="distinct keys for the signer micro-benchmark")
+    parser.add_argument("--batch", type=int, default=20, help="keys per library page")
+    parser.add_argument("--requests", type=int, default=100, help="pages to sign through the route")
+    args = parser.parse_args(argv)
+    report = {"signer": signer_costs(args.keys), "route": asyncio.run(round_trips(args.batch, args.requests))}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Sampling profiler overhead: request latency with the profiler off and sampling at a few intervals.
+
+    python -m benchmarks.profiler --route /get-prices --requests 5000
+    python -m benchmarks.profiler --intervals 10 5 1 --all-threads
+"""
+import argparse
+import asyncio
+import json
+import threading
+
+import httpx
+
+import dummy_endpoint
+from benchmarks.routes import auth_headers, bench_http_route
+from dummy_api import app
+
+
+async def profiler_overhead(route, requests, intervals, all_threads):
+    profiler = dummy_endpoint.profiler
+    results = {}
+    async with httpx.AsyncClient(base_url="http://bench", transport=httpx.ASGITransport(app=app),
+                                 headers=auth_headers()) as client:
+        # Untimed pass first, so no mode pays for warming up the app
+        await bench_http_route(client, "GET", route, {}, requests, 1)
+        report = await bench_http_route(client, "GET", route, {}, requests, 1)
+        results["off"] = {"requests_per_sec": report["requests_per_sec"], "mean_ms": report["latency_ms"]["mean"]}
+        for interval_ms in intervals:
+            profiler.start(interval_ms / 1000, None if all_threads else threading.get_ident())
+            try:
+                report = await bench_http_route(client, "GET", route, {}, requests, 1)
+            finally:
+                profiler.stop()
+            results[f"{interval_ms}ms"] = {
+                "requests_per_sec": report["requests_per_sec"],
+                "mean_ms": report["latency_ms"]["mean"],
+                "overhead_us": round((report["latency_ms"]["mean"] - results["off"]["mean_ms"]) * 1000, 1),
+                "samples": profiler.samples,
+                "distinct_stacks": len(profiler.stacks),
+            }
+    return {"route": route, "all_threads": all_threads, **results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--route", default="/api/health", help="GET route to time")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--intervals", type=float, nargs="+", default=[5.0, 1.0], help="sampling intervals in ms")
+    parser.add_argument("--all-threads", action="store_true", help="sample every thread, not just the event loop")
+    args = parser.parse_args(argv)
+    report = asyncio.run(profiler_overhead(args.route, args.requests, args.intervals, args.all_threads))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
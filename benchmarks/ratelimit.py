@@ -0,0 +1,98 @@
+"""Token-bucket limiter cost: acquire() for hot and distinct callers, bucket memory, and middleware overhead.
+
+    python -m benchmarks.ratelimit --callers 1000000
+    python -m benchmarks.ratelimit --max-buckets 100000 --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+
+import httpx
+
+import dummy_api
+from benchmarks.routes import auth_headers, bench_http_route
+from dummy_ratelimit import STATUS, RateLimiter
+
+
+def per_op_ns(operation, count):
+    start = time.perf_counter_ns()
+    for index in range(count):
+        operation(index)
+    return round((time.perf_counter_ns() - start) / count, 1)
+
+
+def fill(limiter, names, spread):
+    # spread: simulated seconds between new callers, so older buckets refill and go
+    clock = time.monotonic()
+    return per_op_ns(lambda index: limiter.acquire(names[index], "anonymous", STATUS, clock + index * spread),
+                     len(names))
+
+
+def traced_kib(build):
+    tracemalloc.start()
+    try:
+        kept = build()
+        return kept, round(tracemalloc.get_traced_memory()[0] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def limiter_costs(callers, max_buckets):
+    limiter = RateLimiter(max_buckets=max_buckets)
+    hot = per_op_ns(lambda _: limiter.acquire("hot@example.com", "enterprise", STATUS), callers)
+    names = [f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}" for index in range(callers)]
+    report = {"hot_caller_ns": hot, "distinct_callers": callers}
+    # One new caller per millisecond, or all at once (nobody refills, so only max_buckets bounds the dict)
+    for name, spread in [("spread_out", 0.001), ("simultaneous", 0.0)]:
+        limiter = RateLimiter(max_buckets=max_buckets)
+        acquire_ns = fill(limiter, names, spread)
+
+        def build():
+            kept = RateLimiter(max_buckets=max_buckets)
+            fill(kept, names, spread)
+            return kept
+
+        kept, kib = traced_kib(build)
+        report[name] = {"acquire_ns": acquire_ns, "buckets_kept": len(kept.buckets), "traced_kib": kib}
+    return report
+
+
+async def middleware_overhead(route, requests):
+    limiter = dummy_api.limiter
+    enabled, limits = limiter.enabled, limiter.limits
+    # Generous limits, so every request is admitted and only the bookkeeping is timed
+    limiter.limits = {tier: {group: (1e9, 10**9) for group in groups} for tier, groups in limits.items()}
+    results = {}
+    try:
+        async with httpx.AsyncClient(base_url="http://bench", transport=httpx.ASGITransport(app=dummy_api.app),
+                                     headers=auth_headers()) as client:
+            # Untimed pass first, so neither mode pays for warming up the app
+            await bench_http_route(client, "GET", route, {}, requests, 1)
+            for mode in ("off", "on"):
+                limiter.enabled = mode == "on"
+                report = await bench_http_route(client, "GET", route, {}, requests, 1)
+                results[mode] = {"requests_per_sec": report["requests_per_sec"], "mean_ms": report["latency_ms"]["mean"]}
+    finally:
+        limiter.enabled, limiter.limits = enabled, limits
+    results["overhead_us"] = round((results["on"]["mean_ms"] - results["off"]["mean_ms"]) * 1000, 1)
+    return {"route": route, **results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--callers", type=int, default=200_000, help="distinct callers")
+    parser.add_argument("--max-buckets", type=int, default=1_000_000)
+    parser.add_argument("--route", default="/credits", help="limited GET route for the middleware comparison")
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args(argv)
+    report = {
+        "limiter": limiter_costs(args.callers, args.max_buckets),
+        "middleware": asyncio.run(middleware_overhead(args.route, args.requests)),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
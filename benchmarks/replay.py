@@ -0,0 +1,259 @@
+"""Replay a JSONL traffic capture against the app and report latency per route.
+
+Captures come from running the server with DUMMY_RECORD=capture.jsonl (see
+dummy_recorder for the format):
+
+    python -m benchmarks.replay capture.jsonl                          # at the recorded pace
+    python -m benchmarks.replay capture.jsonl --speed 10               # ten times faster
+    python -m benchmarks.replay capture.jsonl --mode open --rate 500   # fixed arrival rate
+    python -m benchmarks.replay capture.jsonl --mode closed --clients 32
+    python -m benchmarks.replay capture.jsonl --base-url http://localhost:8001
+
+recorded and open are open-loop: requests go out on schedule whether or not
+earlier ones were answered, and latency counts from the scheduled time, so a
+server that falls behind can't hide it by slowing the sender down. closed runs
+--clients clients that each send the next request once the previous one is
+answered.
+
+The capture is streamed through generators (lines -> records -> requests) and
+latencies go into fixed histograms per route, so memory stays flat however
+large the capture is; only requests in flight are held.
+"""
+import argparse
+import asyncio
+import base64
+import bisect
+import json
+import math
+import sys
+import time
+
+import httpx
+from starlette.routing import Match
+
+from benchmarks.routes import LATENCY_BUCKETS_MS, USER_EMAIL, auth_headers, fund
+from dummy_api import app
+from dummy_endpoint import router
+
+# Hop-by-hop and framing headers; httpx sets its own
+SKIPPED_HEADERS = {"host", "content-length", "transfer-encoding", "connection", "authorization", "cookie"}
+# Paths remembered by route_label(); ids make most paths unique
+MAX_LABELS = 10_000
+# Routes that revoke the token they're called with; each replay gets its own
+# token so the rest of the capture keeps the shared one
+TOKEN_REVOKING = {"POST /logout"}
+
+
+class RouteLatency:
+    __slots__ = ("counts", "total", "max", "statuses", "errors", "status_changed")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total = 0.0
+        self.max = 0.0
+        self.statuses = {}
+        self.errors = 0
+        self.status_changed = 0
+
+    def record(self, ms, status, recorded_status):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if recorded_status is not None and status != recorded_status:
+            self.status_changed += 1
+
+    def percentile(self, pct):
+        """Upper bound of the histogram bucket holding the pct-th percentile."""
+        requests = sum(self.counts)
+        rank = math.ceil(pct / 100 * requests)
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, round(self.max, 3))
+        return round(self.max, 3)
+
+    def report(self):
+        requests = sum(self.counts)
+        return {
+            "requests": requests,
+            "errors": self.errors,
+            "statuses": self.statuses,
+            "status_changed": self.status_changed,
+            "latency_ms": {
+                "mean": round(self.total / requests, 3) if requests else None,
+                "p50": self.percentile(50) if requests else None,
+                "p90": self.percentile(90) if requests else None,
+                "p99": self.percentile(99) if requests else None,
+                "max": round(self.max, 3) if requests else None,
+            },
+        }
+
+
+class Replay:
+    def __init__(self, path, include_truncated=False, limit=None, user=None):
+        self.path = path
+        self.include_truncated = include_truncated
+        self.limit = limit
+        self.user = user
+        self.routes = {}
+        self.labels = {}
+        self.malformed = 0
+        self.truncated = 0
+
+    def lines(self):
+        file = sys.stdin if self.path == "-" else open(self.path, encoding="utf-8")
+        with file:
+            yield from file
+
+    def records(self, lines):
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                record["method"], record["path"]
+            except (ValueError, KeyError, TypeError):
+                self.malformed += 1
+                continue
+            yield record
+
+    def requests(self, records):
+        """(t, method, path, headers, body, recorded status) per record, up to limit."""
+        sent = 0
+        for record in records:
+            if record.get("truncated") and not self.include_truncated:
+                self.truncated += 1
+                continue
+            if self.limit is not None and sent >= self.limit:
+                return
+            sent += 1
+            if "body_b64" in record:
+                body = base64.b64decode(record["body_b64"])
+            else:
+                body = record.get("body", "").encode()
+            headers = [(name, value) for name, value in record.get("headers", ())
+                       if name.lower() not in SKIPPED_HEADERS]
+            yield record.get("t", 0.0), record["method"], record["path"], headers, body, record.get("status")
+
+    def pipeline(self):
+        return self.requests(self.records(self.lines()))
+
+    def route_label(self, method, path):
+        key = (method, path.partition("?")[0])
+        label = self.labels.get(key)
+        if label is None:
+            scope = {"type": "http", "method": method, "path": key[1], "root_path": ""}
+            label = "unmatched"
+            for route in router.routes:
+                match, _ = route.matches(scope)
+                if match == Match.FULL:
+                    label = route.path
+                    break
+                if match == Match.PARTIAL and label == "unmatched":
+                    label = route.path
+            if len(self.labels) >= MAX_LABELS:
+                self.labels.clear()
+            label = self.labels[key] = f"{method} {label}"
+        return label
+
+    async def send(self, client, request, started):
+        _, method, path, headers, body, recorded_status = request
+        stats = self.routes.get(label := self.route_label(method, path))
+        if stats is None:
+            stats = self.routes[label] = RouteLatency()
+        if self.user is not None and label in TOKEN_REVOKING:
+            headers = headers + list(auth_headers(self.user).items())
+        try:
+            response = await client.request(method, path, headers=headers, content=body or None)
+        except httpx.HTTPError:
+            stats.errors += 1
+            return
+        stats.record((time.perf_counter() - started) * 1000, response.status_code, recorded_status)
+
+    async def open_loop(self, client, schedule, max_in_flight):
+        """Send each request at schedule(index, t) seconds from now, without waiting for answers."""
+        slots = asyncio.Semaphore(max_in_flight)
+        tasks = set()
+        begin = time.perf_counter()
+
+        async def send(request, due):
+            try:
+                await self.send(client, request, due)
+            finally:
+                slots.release()
+
+        for index, request in enumerate(self.pipeline()):
+            due = begin + schedule(index, request[0])
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await slots.acquire()
+            task = asyncio.create_task(send(request, due))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+
+    async def closed_loop(self, client, clients):
+        requests = self.pipeline()
+
+        async def worker():
+            for request in requests:
+                await self.send(client, request, time.perf_counter())
+
+        await asyncio.gather(*(worker() for _ in range(clients)))
+
+
+async def run(args):
+    replay = Replay(args.capture, args.include_truncated, args.limit, None if args.no_auth else args.user)
+    if args.mode == "closed":
+        connections = args.clients
+    else:
+        connections = args.max_in_flight
+    headers = {} if args.no_auth else auth_headers(args.user)
+    transport = None if args.base_url else httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(base_url=args.base_url or "http://replay", transport=transport, headers=headers,
+                                 limits=httpx.Limits(max_connections=connections), timeout=args.timeout) as client:
+        start = time.perf_counter()
+        if args.mode == "recorded":
+            await replay.open_loop(client, lambda index, t: t / args.speed, args.max_in_flight)
+        elif args.mode == "open":
+            await replay.open_loop(client, lambda index, t: index / args.rate, args.max_in_flight)
+        else:
+            await replay.closed_loop(client, args.clients)
+        elapsed = time.perf_counter() - start
+    requests = sum(sum(stats.counts) + stats.errors for stats in replay.routes.values())
+    return {
+        "mode": args.mode,
+        "requests": requests,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_sec": round(requests / elapsed, 1) if elapsed > 0 else None,
+        "malformed_lines": replay.malformed,
+        "truncated_skipped": replay.truncated,
+        "routes": {label: stats.report() for label, stats in sorted(replay.routes.items())},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture", help="JSONL capture file, or - for stdin")
+    parser.add_argument("--mode", choices=("recorded", "open", "closed"), default="recorded")
+    parser.add_argument("--speed", type=float, default=1.0, help="recorded mode: replay this many times faster")
+    parser.add_argument("--rate", type=float, default=100.0, help="open mode: requests per second")
+    parser.add_argument("--clients", type=int, default=16, help="closed mode: concurrent clients")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="open-loop modes: outstanding requests")
+    parser.add_argument("--limit", type=int, default=None, help="stop after this many requests")
+    parser.add_argument("--base-url", default=None, help="replay against a running server instead of in-process")
+    parser.add_argument("--user", default=USER_EMAIL, help="requests carry a fresh token for this user")
+    parser.add_argument("--no-auth", action="store_true", help="send requests without a token")
+    parser.add_argument("--include-truncated", action="store_true", help="send requests whose body was cut short")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args(argv)
+    if not args.base_url:
+        fund(args.user)
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
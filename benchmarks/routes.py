@@ -0,0 +1,479 @@
+"""Throughput and latency benchmark for every route in dummy_endpoint.router.
+
+Drives each HTTP route and the WebSocket routes either in-process (ASGI
+transport, no sockets) or over loopback against a uvicorn server started in a
+background thread, and prints a JSON report:
+
+    python -m benchmarks.routes --mode inprocess --requests 500 --concurrency 16
+    python -m benchmarks.routes --mode loopback --only /get-prices --output bench.json
+
+Per route the report contains requests/sec, a latency histogram with
+percentiles and, from a separate sequential pass under tracemalloc, the
+allocated blocks and bytes per request.
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import math
+import platform
+import socket
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+
+import httpx
+from fastapi.routing import APIRoute, APIWebSocketRoute
+
+from dummy_api import app
+from dummy_endpoint import MEDIA_URL, VIDEOS_URL, auth, ledger, mock_db, router
+
+USER_EMAIL = "user@example.com"
+USER_ID = "123e4567-e89b-12d3-a456-426614174000"
+CREATION_ID = "00000000-0000-4000-8000-000000000001"
+WEBHOOK_SESSION = "cs_test_bench"
+
+# 1x1 PNG, enough for the upload routes to see a real image part
+PNG_BYTES = bytes.fromhex(
+    "89504e470d0a1a0a0000000d49484452000000010000000108060000001f15c489"
+    "0000000d49444154789c6360000002000185d2a4ec0000000049454e44ae426082"
+)
+MP4_BYTES = b"\x00\x00\x00\x18ftypisom\x00\x00\x02\x00isomiso2" + b"\x00" * 1024
+
+# Latency histogram bucket upper bounds in milliseconds (log spaced)
+LATENCY_BUCKETS_MS = [round(0.05 * 2 ** (i / 2), 4) for i in range(36)]
+
+
+def _png(name):
+    return (name, PNG_BYTES, "image/png")
+
+
+def auth_headers(email=USER_EMAIL):
+    """Authorization header carrying a freshly issued token for email."""
+    return {"Authorization": f"Bearer {auth.issue(mock_db.get_user_by_email(email))}"}
+
+
+def fund(email=USER_EMAIL, credits=10**12):
+    """Grant enough credits that the generation routes never answer 402 during a run."""
+    session_id = f"cs_bench_{uuid.uuid4().hex}"
+    ledger.open_checkout(session_id, email, credits)
+    ledger.complete_checkout(session_id, mock_db.get_user_by_email(email))
+    # The session the /webhook sample completes over and over
+    if ledger.checkout_owner(WEBHOOK_SESSION) is None:
+        ledger.open_checkout(WEBHOOK_SESSION, USER_EMAIL)
+
+
+def add_creation(creation_id=None):
+    """A creation owned by the benchmark user; CREATION_ID is the one the status routes poll."""
+    creation_id = creation_id or str(uuid.uuid4())
+    mock_db.add_creation(
+        USER_ID, "sound_effects", f"{VIDEOS_URL}/{USER_EMAIL}/sound_effects/{creation_id}/output.mp4",
+        f"{MEDIA_URL}/{USER_EMAIL}/sound_effects/{creation_id}/thumbnail.jpg", creation_id=creation_id)
+    return creation_id
+
+
+def prepare():
+    """Credits and the creation the samples refer to, so every sample measures its success path."""
+    fund()
+    add_creation(CREATION_ID)
+
+
+def with_token(url, email=USER_EMAIL):
+    # WebSocket clients pass the token as ?token= since browsers can't set headers
+    token = auth.issue(mock_db.get_user_by_email(email))
+    return f"{url}{'&' if '?' in url else '?'}token={token}"
+
+
+# The calls the frontend makes on page load, as /batch sub-requests
+PAGE_LOAD = [
+    {"id": "user", "method": "GET", "path": "/verify-token"},
+    {"id": "prices", "method": "GET", "path": "/get-prices"},
+    {"id": "config", "method": "GET", "path": "/config"},
+    {"id": "library", "method": "GET", "path": f"/library/{USER_ID}"},
+    {"id": "score", "method": "GET", "path": f"/character/score/{USER_ID}"},
+    {"id": "referral", "method": "POST", "path": "/referral/generate"},
+]
+
+# One sample request per (method, path template) in dummy_endpoint.router.
+# Requests carry auth_headers() unless a sample overrides them; callable values
+# (including "path") are evaluated per request. A response outside 2xx/3xx, or
+# outside the sample's "expect" statuses, counts as an error.
+HTTP_SAMPLES = {
+    ("POST", "/signup"): {"json": lambda: {
+        "email": f"bench-{uuid.uuid4().hex}@example.com", "password": "pw", "confirm_password": "pw"}},
+    ("POST", "/login"): {"json": {"email": USER_EMAIL, "password": "pw"}},
+    # Logging out revokes the token, so each request brings its own
+    ("POST", "/logout"): {"headers": auth_headers},
+    ("GET", "/verify-token"): {},
+    ("POST", "/forgot-password"): {"json": {"email": USER_EMAIL}},
+    ("POST", "/verify-otp"): {"json": {"email": USER_EMAIL, "otp": "123456"}},
+    ("POST", "/reset-password"): {"json": {
+        "email": USER_EMAIL, "reset_token": "reset_token_12345",
+        "new_password": "pw2", "confirm_password": "pw2"}},
+    ("GET", "/auth/google"): {},
+    ("POST", "/create-checkout-session"): {"json": {"price_id": "price_1OvnMnSHuGJaxdvpOYxeKBwW"}},
+    # Repeats of one completed session: the first grants, the rest hit the idempotency check
+    ("POST", "/webhook"): {"json": {"id": "evt_bench", "type": "checkout.session.completed", "data": {"object": {
+        "id": WEBHOOK_SESSION, "client_reference_id": USER_EMAIL, "metadata": {"credits": "1000"}}}}},
+    ("GET", "/credits"): {},
+    ("GET", "/get-prices"): {},
+    ("GET", "/config"): {},
+    ("POST", "/text-segmentor"): {"json": {"text": "A sunrise. Birds. A river.", "video_length": 15}},
+    ("POST", "/process_images"): {"files": {"image1": _png("a.png"), "image2": _png("b.png")}},
+    ("POST", "/upload_custom_background"): {"files": {"background_image": _png("bg.png")}},
+    ("POST", "/generate_ai_background"): {"json": {"prompt": "Sunny beach with palm trees"}},
+    ("POST", "/colorize-image"): {"files": {"image": _png("bw.png")}},
+    ("POST", "/merge_background"): {"json": {
+        "background": {"path": "bg.jpg", "url": "https://example.com/bg.jpg"},
+        "emotion": "happy", "combinedImagePath": "combined.png", "numberOfImages": 2}},
+    ("POST", "/generate_prompt"): {"json": {
+        "background": "beach", "emotion": "happy", "mergedImagePath": "merged.jpg", "numberOfImages": 2}},
+    ("POST", "/save_preferences"): {"json": {
+        "backgroundPrompt": "beach sunset", "expressionPrompt": "peaceful scene",
+        "selectedBackground": "bg.jpg", "mergedImagePath": "merged.jpg",
+        "selectedModel": "kling", "numberOfImages": 2}},
+    ("GET", "/api/test-path/{user_id}/{image_name}"): {"path": f"/api/test-path/{USER_ID}/image.png"},
+    ("POST", "/generate_video_thread"): {"json": {"prompt": "A happy scene"}},
+    ("POST", "/api/video/generate"): {},
+    ("POST", "/api/upload_video"): {
+        "files": {"video": ("input.mp4", MP4_BYTES, "video/mp4")}, "data": {"watermark": "false"}},
+    ("POST", "/api/generate_audio"): {"json": {"video_url": "https://example.com/video.mp4", "prompt": "rain"}},
+    ("GET", "/api/audio_status/{creation_id}"): {"path": f"/api/audio_status/{CREATION_ID}"},
+    ("GET", "/api/extract_audio/{creation_id}"): {"path": f"/api/extract_audio/{CREATION_ID}"},
+    ("GET", "/api/status/{creation_id}"): {"path": f"/api/status/{CREATION_ID}"},
+    ("GET", "/api/jobs/stats"): {},
+    ("GET", "/s3/{bucket}/{key:path}"): {
+        "path": f"/s3/vidgencraft-media/{USER_EMAIL}/text_to_video/{CREATION_ID}/thumbnail.jpg"},
+    ("HEAD", "/s3/{bucket}/{key:path}"): {
+        "path": f"/s3/vidgencraft-videos/{USER_EMAIL}/text_to_video/{CREATION_ID}/output.mp4"},
+    ("GET", "/text-to-video/events/{user_email}"): {
+        "path": f"/text-to-video/events/{USER_EMAIL}", "params": {"speed": "instant"}},
+    ("GET", "/events/{user_email}"): {"path": f"/events/{USER_EMAIL}", "params": {"speed": "instant"}},
+    ("GET", "/api/events/generation/{user_email}"): {
+        "path": f"/api/events/generation/{USER_EMAIL}", "params": {"speed": "instant"}},
+    ("GET", "/api/get_output_video/{creation_id}"): {"path": f"/api/get_output_video/{CREATION_ID}"},
+    ("POST", "/api/get_s3_file"): {"json": {"key": f"{USER_EMAIL}/sound_effects/{CREATION_ID}/output.mp4"}},
+    ("GET", "/library/{user_id}"): {"path": f"/library/{USER_ID}"},
+    # Each delete needs a creation of its own
+    ("DELETE", "/library/{creation_id}"): {"path": lambda: f"/library/{add_creation()}"},
+    ("POST", "/watermark"): {"json": {
+        "video_url": "https://example.com/video.mp4", "watermark_text": "Vidgencraft",
+        "watermark_position": "bottom-right"}},
+    ("POST", "/movie/clips"): {"json": {
+        "clips": [{"url": "https://example.com/clip1.mp4", "start": 0, "end": 5}], "output_name": "my_movie"}},
+    ("GET", "/utils/health"): {},
+    ("GET", "/character/score/{user_id}"): {"path": f"/character/score/{USER_ID}"},
+    ("POST", "/referral/generate"): {},
+    ("POST", "/referral/verify"): {"json": {"referral_code": "USER12345678"}},
+    ("POST", "/batch"): {"json": {"requests": PAGE_LOAD}},
+    ("GET", "/metrics"): {},
+    # Concurrent profiles get 409; the one that runs samples for 10 ms
+    ("POST", "/admin/profile"): {"params": {"seconds": "0.01", "interval_ms": "1"}, "expect": (200, 409)},
+    ("GET", "/admin/slow-requests"): {},
+    ("GET", "/admin/loop-lag"): {},
+    ("GET", "/api/health"): {},
+    ("GET", "/"): {},
+    ("GET", "/api"): {},
+}
+
+WEBSOCKET_SAMPLES = {
+    "/ws/{user_email}": f"/ws/{USER_EMAIL}",
+    "/text-to-video/ws/{user_email}": f"/text-to-video/ws/{USER_EMAIL}",
+    "/api/ws/generation/{user_email}": f"/api/ws/generation/{USER_EMAIL}",
+}
+
+
+def collect_routes():
+    """Pair every router route with its sample request, failing on gaps."""
+    http_routes, ws_routes, missing = [], [], []
+    for route in router.routes:
+        if isinstance(route, APIRoute):
+            for method in sorted(route.methods):
+                sample = HTTP_SAMPLES.get((method, route.path))
+                if sample is None:
+                    missing.append(f"{method} {route.path}")
+                    continue
+                http_routes.append((method, route.path, sample))
+        elif isinstance(route, APIWebSocketRoute):
+            url = WEBSOCKET_SAMPLES.get(route.path)
+            if url is None:
+                missing.append(f"WS {route.path}")
+                continue
+            ws_routes.append((route.path, url))
+    if missing:
+        raise SystemExit("no benchmark sample for: " + ", ".join(missing))
+    return http_routes, ws_routes
+
+
+class LatencyRecorder:
+    def __init__(self):
+        self.samples = []
+        self.errors = 0
+        self.started = None
+        self.finished = None
+
+    def record(self, seconds):
+        self.samples.append(seconds * 1000.0)
+
+    def report(self):
+        samples = sorted(self.samples)
+        elapsed = (self.finished or 0.0) - (self.started or 0.0)
+        counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        for value in samples:
+            counts[bisect.bisect_left(LATENCY_BUCKETS_MS, value)] += 1
+        histogram = [
+            {"le_ms": bound, "count": count}
+            for bound, count in zip(LATENCY_BUCKETS_MS + [math.inf], counts)
+            if count
+        ]
+        for bucket in histogram:
+            if bucket["le_ms"] == math.inf:
+                bucket["le_ms"] = "+Inf"
+        return {
+            "requests": len(samples),
+            "errors": self.errors,
+            "elapsed_s": round(elapsed, 4),
+            "requests_per_sec": round(len(samples) / elapsed, 1) if elapsed > 0 else None,
+            "latency_ms": {
+                "mean": round(sum(samples) / len(samples), 4) if samples else None,
+                "p50": _percentile(samples, 50),
+                "p90": _percentile(samples, 90),
+                "p99": _percentile(samples, 99),
+                "max": round(samples[-1], 4) if samples else None,
+            },
+            "histogram": histogram,
+        }
+
+
+def _percentile(sorted_samples, pct):
+    if not sorted_samples:
+        return None
+    index = min(len(sorted_samples) - 1, max(0, math.ceil(pct / 100.0 * len(sorted_samples)) - 1))
+    return round(sorted_samples[index], 4)
+
+
+async def _send(client, method, path, sample):
+    kwargs = {key: value() if callable(value) else value for key, value in sample.items()
+              if key not in ("path", "expect")}
+    path = sample.get("path", path)
+    return await client.request(method, path() if callable(path) else path, **kwargs)
+
+
+def _unexpected(sample, status):
+    expect = sample.get("expect")
+    return status >= 400 if expect is None else status not in expect
+
+
+async def bench_http_route(client, method, path, sample, total, concurrency):
+    recorder = LatencyRecorder()
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                response = await _send(client, method, path, sample)
+                if _unexpected(sample, response.status_code):
+                    recorder.errors += 1
+            except httpx.HTTPError:
+                recorder.errors += 1
+                continue
+            recorder.record(time.perf_counter() - start)
+
+    # Warm up caches, lazy imports and the connection pool before timing
+    await _send(client, method, path, sample)
+    recorder.started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    recorder.finished = time.perf_counter()
+    return recorder.report()
+
+
+async def measure_allocations(client, method, path, sample, rounds):
+    """Sequential pass under tracemalloc; reports per-request averages."""
+    tracemalloc.start()
+    try:
+        peak_bytes = retained_bytes = blocks = 0
+        for _ in range(rounds):
+            blocks_before = sys.getallocatedblocks()
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            await _send(client, method, path, sample)
+            after, peak = tracemalloc.get_traced_memory()
+            blocks += max(0, sys.getallocatedblocks() - blocks_before)
+            peak_bytes += peak - before
+            retained_bytes += after - before
+    finally:
+        tracemalloc.stop()
+    return {
+        "rounds": rounds,
+        "peak_bytes_per_request": round(peak_bytes / rounds, 1),
+        "retained_bytes_per_request": round(retained_bytes / rounds, 1),
+        "retained_blocks_per_request": round(blocks / rounds, 2),
+    }
+
+
+def bench_websocket_inprocess(url, sessions):
+    from starlette.testclient import TestClient
+
+    recorder = LatencyRecorder()
+    frames = 0
+    with TestClient(app) as client:
+        recorder.started = time.perf_counter()
+        for _ in range(sessions):
+            start = time.perf_counter()
+            with client.websocket_connect(url) as websocket:
+                while True:
+                    frame = websocket.receive_json()
+                    frames += 1
+                    if frame.get("status") == "completed":
+                        break
+            recorder.record(time.perf_counter() - start)
+        recorder.finished = time.perf_counter()
+    report = recorder.report()
+    report["frames_per_session"] = frames / sessions if sessions else 0
+    return report
+
+
+async def bench_websocket_loopback(base_url, url, sessions, concurrency):
+    try:
+        import websockets
+    except ImportError:
+        return {"skipped": "websockets package not installed"}
+
+    recorder = LatencyRecorder()
+    frames = 0
+    remaining = iter(range(sessions))
+    ws_url = base_url.replace("http://", "ws://") + url
+
+    async def worker():
+        nonlocal frames
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                async with websockets.connect(ws_url) as websocket:
+                    while True:
+                        frame = json.loads(await websocket.recv())
+                        frames += 1
+                        if frame.get("status") == "completed":
+                            break
+            except (OSError, websockets.WebSocketException):
+                recorder.errors += 1
+                continue
+            recorder.record(time.perf_counter() - start)
+
+    recorder.started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    recorder.finished = time.perf_counter()
+    report = recorder.report()
+    report["frames_per_session"] = frames / sessions if sessions else 0
+    return report
+
+
+class LoopbackServer:
+    """uvicorn on 127.0.0.1:<free port>, running in a daemon thread."""
+
+    def __init__(self):
+        import uvicorn
+
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            self.port = probe.getsockname()[1]
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning", lifespan="on")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self.thread.start()
+        deadline = time.monotonic() + 10
+        while not self.server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("uvicorn did not start within 10s")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+def _selected(path, only):
+    return not only or any(fragment in path for fragment in only)
+
+
+async def run_http(args, base_url, transport):
+    http_routes, _ = collect_routes()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, transport=transport, limits=limits, headers=auth_headers()) as client:
+        for method, path, sample in http_routes:
+            if not _selected(path, args.only):
+                continue
+            result = await bench_http_route(client, method, path, sample, args.requests, args.concurrency)
+            if args.alloc_rounds:
+                result["allocations"] = await measure_allocations(client, method, path, sample, args.alloc_rounds)
+            results[f"{method} {path}"] = result
+            print(f"{method:6} {path:45} {result['requests_per_sec']:>10} req/s", file=sys.stderr)
+    return results
+
+
+def run(args):
+    _, ws_routes = collect_routes()
+    prepare()
+    if args.ws_speed:
+        ws_routes = [(path, f"{url}?speed={args.ws_speed}") for path, url in ws_routes]
+    ws_routes = [(path, with_token(url)) for path, url in ws_routes]
+    report = {
+        "mode": args.mode,
+        "python": platform.python_version(),
+        "requests_per_route": args.requests,
+        "concurrency": args.concurrency,
+        "ws_speed": args.ws_speed or None,
+        "http": {},
+        "websocket": {},
+    }
+    if args.mode == "inprocess":
+        transport = httpx.ASGITransport(app=app)
+        report["http"] = asyncio.run(run_http(args, "http://bench", transport))
+        for path, url in ws_routes:
+            if _selected(path, args.only) and args.ws_sessions:
+                report["websocket"][path] = bench_websocket_inprocess(url, args.ws_sessions)
+    else:
+        with LoopbackServer() as server:
+            report["http"] = asyncio.run(run_http(args, server.base_url, None))
+            for path, url in ws_routes:
+                if _selected(path, args.only) and args.ws_sessions:
+                    report["websocket"][path] = asyncio.run(bench_websocket_loopback(
+                        server.base_url, url, args.ws_sessions, args.concurrency))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["inprocess", "loopback"], default="inprocess")
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per HTTP route")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--ws-sessions", type=int, default=2, help="WebSocket sessions per WS route (0 to skip)")
+    parser.add_argument("--ws-speed", default="instant",
+                        help="?speed= passed to the WebSocket routes (see dummy_timing), '' for the server default")
+    parser.add_argument("--alloc-rounds", type=int, default=20, help="tracemalloc rounds per route (0 to skip)")
+    parser.add_argument("--only", action="append", help="only routes whose path contains this (repeatable)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(payload + "\n")
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Compare JSON backends (see dummy_responses) per route and per WebSocket frame.
+
+For every JSON route the payload is captured once, then each available backend
+encodes it repeatedly (encode cost alone); with --end-to-end the route is also
+driven through the ASGI app under each backend. Prints a JSON report:
+
+    python -m benchmarks.serializers --iterations 20000
+    python -m benchmarks.serializers --end-to-end --requests 300 --only /library
+"""
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+
+import httpx
+
+import dummy_endpoint
+import dummy_responses
+from benchmarks.routes import USER_EMAIL, _selected, _send, auth_headers, bench_http_route, collect_routes, prepare
+from dummy_api import app
+
+
+async def capture_payloads(http_routes):
+    payloads = {}
+    async with httpx.AsyncClient(base_url="http://bench", transport=httpx.ASGITransport(app=app), headers=auth_headers()) as client:
+        for method, path, sample in http_routes:
+            response = await _send(client, method, path, sample)
+            if response.headers.get("content-type", "").startswith("application/json"):
+                payloads[f"{method} {path}"] = response.json()
+    return payloads
+
+
+def frame_payloads():
+    return {
+        "WS /text-to-video/ws/{user_email}": dummy_endpoint.text_to_video_frames(USER_EMAIL),
+        "WS /ws/{user_email}": dummy_endpoint.image_to_video_frames(USER_EMAIL),
+        "WS /api/ws/generation/{user_email}": dummy_endpoint.audio_generation_frames(
+            USER_EMAIL, dummy_endpoint.generate_mock_id()),
+    }
+
+
+def time_encoder(payloads, iterations):
+    """Mean nanoseconds to encode one payload (a frame list counts every frame)."""
+    render = dummy_responses.render_json
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        for payload in payloads:
+            render(payload)
+    return (time.perf_counter_ns() - start) / iterations
+
+
+async def end_to_end(http_routes, args, backends):
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(base_url="http://bench", transport=transport, headers=auth_headers()) as client:
+        for method, path, sample in http_routes:
+            if not _selected(path, args.only):
+                continue
+            per_backend = {}
+            for name in backends:
+                dummy_responses.set_backend(name)
+                report = await bench_http_route(client, method, path, sample, args.requests, args.concurrency)
+                per_backend[name] = {
+                    "requests_per_sec": report["requests_per_sec"],
+                    "p50_ms": report["latency_ms"]["p50"],
+                    "p99_ms": report["latency_ms"]["p99"],
+                }
+            results[f"{method} {path}"] = per_backend
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5000, help="encodes per payload per backend")
+    parser.add_argument("--end-to-end", action="store_true", help="also drive each route under each backend")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--only", action="append", help="only routes whose path contains this (repeatable)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    original = dummy_responses.backend
+    backends = dummy_responses.available_backends()
+    http_routes, _ = collect_routes()
+    prepare()
+    payloads = asyncio.run(capture_payloads(http_routes))
+    payloads.update(frame_payloads())
+
+    encode = {}
+    for key, payload in payloads.items():
+        if not _selected(key, args.only):
+            continue
+        items = payload if key.startswith("WS ") else [payload]
+        row = {}
+        for name in backends:
+            dummy_responses.set_backend(name)
+            row[name] = {"ns_per_encode": round(time_encoder(items, args.iterations), 1)}
+        baseline = row.get("json", {}).get("ns_per_encode")
+        for name, result in row.items():
+            if baseline:
+                result["speedup_vs_json"] = round(baseline / result["ns_per_encode"], 2)
+        encode[key] = row
+        print(f"{key:50} " + "  ".join(f"{n}={r['ns_per_encode']:.0f}ns" for n, r in row.items()), file=sys.stderr)
+
+    report = {"python": platform.python_version(), "backends": backends, "iterations": args.iterations, "encode": encode}
+    if args.end_to_end:
+        report["end_to_end"] = asyncio.run(end_to_end(http_routes, args, backends))
+    dummy_responses.set_backend(original)
+
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(payload + "\n")
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Cold start of dummy_api: import time per module and time until a fresh server answers.
+
+Every run is a new interpreter, as when CI starts a server per test shard:
+
+- import: python -X importtime -c "import dummy_api", reporting the total and
+  the modules costing the most (self time, and cumulative for our own modules)
+- first response: python -m uvicorn dummy_api:app on a loopback port, timed
+  from process start until GET /api/health answers 200
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --runs 10 --budget-ms 1500 --import-budget-ms 600
+
+Medians are reported. The script exits with status 1 if a budget is exceeded
+or if dummy_api imports one of LAZY_MODULES, which only the code paths that
+need them may load.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.workers import ROOT, free_port
+
+# Imported on first use only; importing dummy_api must not load them
+LAZY_MODULES = ("numpy", "PIL", "sqlalchemy", "sqlite3", "multiprocessing", "uvicorn")
+
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us, depth)] from -X importtime output, in import order."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return modules
+
+
+def import_run(module):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    return parse_importtime(result.stderr)
+
+
+def interpreter_ms():
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def first_response_ms(timeout=60):
+    """Milliseconds from starting uvicorn until /api/health answers 200."""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/api/health"
+    # One client for all polls: a new one per poll costs milliseconds of SSL setup
+    client = httpx.Client(timeout=1)
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "dummy_api:app", "--host", "127.0.0.1",
+                                "--port", str(port), "--log-level", "warning"], cwd=ROOT)
+    try:
+        while True:
+            try:
+                if client.get(url).status_code == 200:
+                    return (time.perf_counter() - start) * 1000
+            except httpx.TransportError:
+                pass
+            if process.poll() is not None or time.perf_counter() - start > timeout:
+                raise RuntimeError("server did not start")
+            time.sleep(0.005)
+    finally:
+        client.close()
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def import_report(module, runs, top):
+    totals = []
+    by_module = {}
+    loaded = set()
+    for _ in range(runs):
+        modules = import_run(module)
+        for name, self_us, cumulative_us, depth in modules:
+            by_module.setdefault(name, []).append((self_us, cumulative_us))
+            loaded.add(name.partition(".")[0])
+        totals.append(next(cumulative for name, _, cumulative, depth in modules if name == module and depth == 0))
+
+    def median_ms(values):
+        return round(statistics.median(values) / 1000, 3)
+
+    self_ms = {name: median_ms([timing[0] for timing in timings]) for name, timings in by_module.items()}
+    own_ms = {name: median_ms([timing[1] for timing in timings])
+              for name, timings in by_module.items() if name.startswith("dummy_")}
+    return {
+        "import_ms": median_ms(totals),
+        "top_self_ms": dict(sorted(self_ms.items(), key=lambda item: -item[1])[:top]),
+        "own_cumulative_ms": dict(sorted(own_ms.items(), key=lambda item: -item[1])),
+        "lazy_violations": sorted(loaded.intersection(LAZY_MODULES)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument("--module", default="dummy_api")
+    parser.add_argument("--top", type=int, default=15, help="modules listed by self time")
+    parser.add_argument("--budget-ms", type=float, default=None, help="fail if the median first response is slower")
+    parser.add_argument("--import-budget-ms", type=float, default=None, help="fail if the median import is slower")
+    parser.add_argument("--no-server", action="store_true", help="measure the import only")
+    args = parser.parse_args(argv)
+
+    report = {"runs": args.runs, "interpreter_ms": round(statistics.median(interpreter_ms() for _ in range(args.runs)), 3)}
+    report.update(import_report(args.module, args.runs, args.top))
+    if not args.no_server:
+        report["first_response_ms"] = round(statistics.median(first_response_ms() for _ in range(args.runs)), 3)
+
+    failures = []
+    if report["lazy_violations"]:
+        failures.append(f"importing {args.module} loads {', '.join(report['lazy_violations'])}")
+    if args.import_budget_ms is not None and report["import_ms"] > args.import_budget_ms:
+        failures.append(f"import took {report['import_ms']} ms, budget {args.import_budget_ms} ms")
+    if args.budget_ms is not None and report.get("first_response_ms", 0) > args.budget_ms:
+        failures.append(f"first response took {report['first_response_ms']} ms, budget {args.budget_ms} ms")
+    report["failures"] = failures
+    print(json.dumps(report, indent=2))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Upload throughput for the streaming multipart routes (see dummy_uploads).
+
+Streams a synthetic multipart body of --size-mb to /api/upload_video (or
+--route) and reports MiB/s for the full path (checksum + sniffing) and for
+discard mode, in-process or over loopback:
+
+    python -m benchmarks.uploads --size-mb 256 --rounds 3
+    python -m benchmarks.uploads --mode loopback --size-mb 1024 --discard-only
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+
+import httpx
+
+from benchmarks.routes import LoopbackServer, auth_headers
+from dummy_api import app
+
+BOUNDARY = "benchuploadboundary"
+CHUNK = bytes(range(256)) * 256
+
+
+def multipart_body(field, size):
+    head = (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="upload.mp4"\r\n'
+        "Content-Type: video/mp4\r\n\r\n"
+    ).encode()
+
+    async def body():
+        yield head
+        remaining = size
+        while remaining > 0:
+            piece = CHUNK if remaining >= len(CHUNK) else CHUNK[:remaining]
+            remaining -= len(piece)
+            yield piece
+        yield f"\r\n--{BOUNDARY}--\r\n".encode()
+
+    return body()
+
+
+async def upload_round(client, route, field, size, discard):
+    params = {"discard": "1"} if discard else {}
+    start = time.perf_counter()
+    response = await client.post(
+        route, params=params, content=multipart_body(field, size),
+        headers={"content-type": f"multipart/form-data; boundary={BOUNDARY}"},
+    )
+    elapsed = time.perf_counter() - start
+    response.raise_for_status()
+    return elapsed
+
+
+async def run_rounds(client, args):
+    size = int(args.size_mb * 2**20)
+    results = {}
+    for discard in [True] if args.discard_only else [False, True]:
+        tracemalloc.start()
+        timings = [await upload_round(client, args.route, args.field, size, discard) for _ in range(args.rounds)]
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        best = min(timings)
+        results["discard" if discard else "checksum"] = {
+            "best_s": round(best, 4),
+            "mib_per_sec": round(size / best / 2**20, 1),
+            "peak_traced_kib": round(peak / 1024, 1),
+        }
+    return results
+
+
+async def run(args, base_url=None):
+    if base_url is None:
+        client = httpx.AsyncClient(base_url="http://bench", transport=httpx.ASGITransport(app=app), timeout=None,
+                                   headers=auth_headers())
+    else:
+        client = httpx.AsyncClient(base_url=base_url, timeout=None, headers=auth_headers())
+    async with client:
+        results = await run_rounds(client, args)
+    return {"route": args.route, "mode": args.mode, "size_mb": args.size_mb, "results": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["inprocess", "loopback"], default="inprocess")
+    parser.add_argument("--route", default="/api/upload_video")
+    parser.add_argument("--field", default="video")
+    parser.add_argument("--size-mb", type=float, default=128)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--discard-only", action="store_true")
+    args = parser.parse_args(argv)
+    if args.mode == "loopback":
+        with LoopbackServer() as server:
+            report = asyncio.run(run(args, server.base_url))
+    else:
+        report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
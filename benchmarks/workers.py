@@ -0,0 +1,250 @@
+"""Requests per second of python -m dummy_shared by worker count, with cross-worker consistency checks.
+
+For each worker count the server is started on a loopback port and:
+
+- checked for shared state:
+  - a queued job is followed to completion over WebSockets, and polled over
+    fresh connections, which the kernel hands to any worker
+  - concurrent debits by one user never overspend
+  - a token logged out on one worker is rejected by all of them
+- loaded with a read-mostly mix of authenticated routes from --clients load
+  generator processes for --seconds, reporting requests/sec and latency
+
+    python -m benchmarks.workers --workers 1 2 4 8 --seconds 10
+    python -m benchmarks.workers --workers 4 --clients 8 --connections 64
+
+"scaling" is requests/sec relative to the first worker count, per worker, so
+1.0 is linear. The load generators share the CPUs with the server, so the
+server can only scale up to the cores left over; the report lists the cores.
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import httpx
+
+from dummy_credits import CREDIT_COSTS
+
+USER_EMAIL = "user@example.com"
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+class WorkerServer:
+    """python -m dummy_shared --workers N as a child process."""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.port = free_port()
+        self.process = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        # The image pool isn't exercised here; threads start faster than worker processes
+        env = {**os.environ, "DUMMY_MEDIA_WORKERS": "0"}
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "dummy_shared", "--workers", str(self.workers), "--host", "127.0.0.1",
+             "--port", str(self.port), "--log-level", "warning"], cwd=ROOT, env=env)
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                if httpx.get(self.base_url + "/api/health").status_code == 200:
+                    return self
+            except httpx.TransportError:
+                pass
+            if self.process.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError(f"server with {self.workers} workers did not start")
+            time.sleep(0.1)
+
+    def __exit__(self, *exc):
+        self.process.send_signal(signal.SIGINT)
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+def login(base_url, email):
+    response = httpx.post(base_url + "/login", json={"email": email, "password": "bench"})
+    response.raise_for_status()
+    return response.json()["token"]
+
+
+def fresh_get(base_url, path, token):
+    # A new connection per request, so the requests spread over the workers
+    return httpx.get(base_url + path, headers={"Authorization": f"Bearer {token}"})
+
+
+async def follow_job(base_url, token, followers, polls):
+    """Start a job, follow it over WebSockets and poll its status; returns the check results."""
+    import websockets
+
+    async with httpx.AsyncClient(base_url=base_url, headers={"Authorization": f"Bearer {token}"}) as client:
+        response = await client.post("/api/generate_audio", params={"speed": 10},
+                                     json={"video_url": "https://example.com/video.mp4", "prompt": "rain"})
+    creation_id = response.json()["creation_id"]
+    ws_url = (base_url.replace("http://", "ws://") + f"/api/ws/generation/{USER_EMAIL}"
+              f"?creation_id={creation_id}&token={token}")
+
+    async def follow():
+        frames = []
+        async with websockets.connect(ws_url) as websocket:
+            while True:
+                frame = json.loads(await websocket.recv())
+                frames.append(frame.get("status"))
+                if frame.get("status") in ("completed", "failed", "error"):
+                    return frames
+
+    async def poll():
+        statuses = {}
+        for _ in range(polls):
+            response = await asyncio.to_thread(fresh_get, base_url, f"/api/status/{creation_id}", token)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code == 200 and response.json()["status"] == "completed":
+                break
+            await asyncio.sleep(0.05)
+        return statuses, response.json().get("status")
+
+    results = await asyncio.gather(*(follow() for _ in range(followers)), poll())
+    streams, (poll_statuses, last_status) = results[:-1], results[-1]
+    return creation_id, {
+        "websocket_followers": followers,
+        "websocket_completed": sum(stream[-1] == "completed" for stream in streams),
+        "status_polls": poll_statuses,
+        "status_completed": last_status == "completed",
+    }
+
+
+async def overspend(base_url, requests):
+    """A fresh user (100 credits) fires `requests` concurrent debits over separate connections."""
+    email = f"workers-{uuid.uuid4().hex}@example.com"
+    token = await asyncio.to_thread(login, base_url, email)
+    cost = CREDIT_COSTS["ai_background"]
+    statuses = {}
+
+    async def debit():
+        async with httpx.AsyncClient(base_url=base_url, headers={"Authorization": f"Bearer {token}"}) as client:
+            response = await client.post("/generate_ai_background", json={"prompt": "beach"})
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    await asyncio.gather(*(debit() for _ in range(requests)))
+    balance = (await asyncio.to_thread(fresh_get, base_url, "/credits", token)).json()["credits_remaining"]
+    return {
+        "statuses": statuses,
+        "final_balance": balance,
+        "consistent": statuses.get(200, 0) == min(requests, 100 // cost) and balance == 100 - statuses.get(200, 0) * cost,
+    }
+
+
+def revocation(base_url, checks):
+    """Log a token out on one worker, then use it over fresh connections."""
+    token = login(base_url, f"workers-{uuid.uuid4().hex}@example.com")
+    # Get it into the workers' verified-token caches first
+    before = sum(fresh_get(base_url, "/verify-token", token).status_code == 200 for _ in range(checks))
+    httpx.post(base_url + "/logout", headers={"Authorization": f"Bearer {token}"}).raise_for_status()
+    time.sleep(0.2)
+    rejected = sum(fresh_get(base_url, "/verify-token", token).status_code == 401 for _ in range(checks))
+    return {"accepted_before": before, "rejected_after": rejected, "consistent": before == rejected == checks}
+
+
+def generate_load(base_url, token, paths, seconds, connections):
+    """One load generator process: round-robin over paths; returns (requests, errors, latencies in seconds)."""
+
+    async def run():
+        latencies = []
+        errors = 0
+        deadline = time.perf_counter() + seconds
+        async with httpx.AsyncClient(base_url=base_url, headers={"Authorization": f"Bearer {token}"},
+                                     limits=httpx.Limits(max_connections=connections)) as client:
+
+            async def worker(offset):
+                nonlocal errors
+                index = offset
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    try:
+                        response = await client.get(paths[index % len(paths)])
+                        if response.status_code >= 400:
+                            errors += 1
+                    except httpx.HTTPError:
+                        errors += 1
+                    latencies.append(time.perf_counter() - start)
+                    index += 1
+
+            await asyncio.gather(*(worker(offset) for offset in range(connections)))
+        return len(latencies), errors, latencies
+
+    return asyncio.run(run())
+
+
+def run_workers(args, workers, pool):
+    with WorkerServer(workers) as server:
+        base_url = server.base_url
+        token = login(base_url, USER_EMAIL)
+        creation_id, job_check = asyncio.run(follow_job(base_url, token, args.followers, polls=200))
+        checks = {
+            "job": job_check,
+            "credits": asyncio.run(overspend(base_url, 80)),
+            "logout": revocation(base_url, 20),
+        }
+        paths = ["/credits", "/verify-token", f"/library/{USER_EMAIL}?limit=20", f"/api/status/{creation_id}"]
+
+        def load(seconds):
+            futures = [pool.submit(generate_load, base_url, token, paths, seconds, args.connections)
+                       for _ in range(args.clients)]
+            return [future.result() for future in futures]
+
+        if args.warmup:
+            load(args.warmup)
+        results = load(args.seconds)
+    requests = sum(result[0] for result in results)
+    latencies = sorted(latency for result in results for latency in result[2])
+    return {
+        "workers": workers,
+        "requests": requests,
+        "errors": sum(result[1] for result in results),
+        "requests_per_sec": round(requests / args.seconds, 1),
+        "latency_ms": {
+            "p50": round(latencies[len(latencies) // 2] * 1000, 3) if latencies else None,
+            "p99": round(latencies[int(len(latencies) * 0.99)] * 1000, 3) if latencies else None,
+        },
+        "checks": checks,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seconds", type=float, default=5.0, help="measured load per worker count")
+    parser.add_argument("--warmup", type=float, default=1.0, help="unmeasured load first, while workers settle")
+    parser.add_argument("--clients", type=int, default=os.cpu_count() or 1, help="load generator processes")
+    parser.add_argument("--connections", type=int, default=16, help="keep-alive connections per load generator")
+    parser.add_argument("--followers", type=int, default=4, help="WebSocket connections following the check job")
+    args = parser.parse_args(argv)
+    with ProcessPoolExecutor(args.clients) as pool:
+        runs = [run_workers(args, workers, pool) for workers in args.workers]
+    baseline = runs[0]["requests_per_sec"] / runs[0]["workers"]
+    for run in runs:
+        run["scaling"] = round(run["requests_per_sec"] / run["workers"] / baseline, 3) if baseline else None
+    print(json.dumps({"cpus": os.cpu_count(), "clients": args.clients, "runs": runs}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
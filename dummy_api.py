@@ -1,14 +1,51 @@
+from contextlib import asynccontextmanager
+import asyncio
+import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
-from dummy_endpoint import router
+from dummy_endpoint import (router, batch, mock_db, jobs, loop_monitor, media, metrics, rate_limit_identity,
+                            shared_events, shared_state, slow_requests)
+from dummy_metrics import MetricsMiddleware
+from dummy_profiler import TimingMiddleware
+from dummy_ratelimit import RateLimiter, RateLimitMiddleware
+from dummy_recorder import RecordMiddleware, TrafficRecorder
+from dummy_snapshot import SAVE_ON_EXIT_ENV, SNAPSHOT_ENV, save_snapshot
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loop_monitor.start()
+    # Image workers start in the background, so the server answers at once; a
+    # render that arrives first waits for them
+    media_start = asyncio.create_task(media.start())
+    if shared_events is not None:
+        shared_events.start()
+    yield
+    if shared_events is not None:
+        await shared_events.stop()
+    await loop_monitor.stop()
+    await jobs.stop()
+    await asyncio.gather(media_start, return_exceptions=True)
+    media.shutdown()
+    if recorder is not None:
+        recorder.close()
+    # Persist MockDatabase for the next start; with shared state, dummy_shared
+    # saves it once all workers have stopped
+    if os.environ.get(SNAPSHOT_ENV) and os.environ.get(SAVE_ON_EXIT_ENV) and shared_state is None:
+        save_snapshot(mock_db, os.environ[SNAPSHOT_ENV])
 
 app = FastAPI(
     title="AI Animator API (Dummy)",
     description="Dummy API for AI video and audio generation for development and testing",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
+# Added before CORS so that 429 responses still carry the CORS headers
+limiter = RateLimiter.from_env()
+app.add_middleware(RateLimitMiddleware, limiter=limiter, identify=rate_limit_identity)
+# /batch sub-requests skip the middleware, so the batch takes their tokens itself
+batch.limiter = limiter
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -17,7 +54,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-stage timings for /admin/slow-requests, from as early as possible
+app.add_middleware(TimingMiddleware, log=slow_requests)
+
+# Outermost, so rejected (429) and CORS preflight requests are counted too
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+metrics.register("rate_limited_total", "Requests rejected by the rate limiter.", lambda: limiter.limited, kind="counter")
+metrics.register("rate_limit_buckets", "Token buckets held by the rate limiter.", lambda: len(limiter.buckets))
+
+# Traffic capture for benchmarks.replay when DUMMY_RECORD is set; outermost of
+# all, so the capture holds every request clients sent
+recorder = TrafficRecorder.from_env()
+if recorder is not None:
+    app.add_middleware(RecordMiddleware, recorder=recorder)
+    metrics.register("recorded_requests_total", "Requests queued for the traffic capture.",
+                     lambda: recorder.recorded, kind="counter")
+    metrics.register("recorded_requests_dropped_total", "Requests left out of the capture because its writer fell behind.",
+                     lambda: recorder.dropped, kind="counter")
+
 app.include_router(router)
 
 if __name__ == "__main__":
+    # Development server; python -m dummy_shared --workers N runs several workers
+    import uvicorn
     uvicorn.run("dummy_api:app", host="0.0.0.0", port=8001, reload=True) 
\ No newline at end of file
@@ -0,0 +1,170 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+import uuid
+from collections import OrderedDict
+
+# HS256 bearer tokens for the auth routes.
+#
+# /login and /auth/google issue a JWT per user (sub = email, userId, iat, exp,
+# jti); the endpoint dependency verifies it on every protected route. Verified
+# claims are cached by token string, so a client repeating its token costs a
+# dict lookup instead of base64 decoding, JSON parsing and an HMAC.
+#
+# DUMMY_JWT_SECRET       signing key (default: a fixed development key, so every
+#                        worker and restart accepts the same tokens)
+# DUMMY_TOKEN_TTL        token lifetime in seconds (default 86400)
+# DUMMY_AUTH_CACHE_SIZE  verified tokens remembered (default 10000, 0 disables)
+# DUMMY_AUTH_CACHE_TTL   seconds a verified token is trusted without re-checking
+#                        its signature (default 300; never past its exp)
+# DUMMY_AUTH             "off" to skip authentication; every request then acts
+#                        as user@example.com
+
+JWT_SECRET_ENV = "DUMMY_JWT_SECRET"
+TOKEN_TTL_ENV = "DUMMY_TOKEN_TTL"
+AUTH_CACHE_SIZE_ENV = "DUMMY_AUTH_CACHE_SIZE"
+AUTH_CACHE_TTL_ENV = "DUMMY_AUTH_CACHE_TTL"
+AUTH_ENV = "DUMMY_AUTH"
+
+PASSWORD_ITERATIONS = 10_000
+
+
+class AuthError(Exception):
+    pass
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(segment):
+    return base64.urlsafe_b64decode(segment + b"=" * (-len(segment) % 4))
+
+
+def _json(content):
+    return json.dumps(content, separators=(",", ":")).encode()
+
+
+HEADER_SEGMENT = _b64encode(_json({"alg": "HS256", "typ": "JWT"}))
+
+
+def auth_enabled():
+    return os.environ.get(AUTH_ENV, "on").lower() not in ("0", "off", "false", "no")
+
+
+def hash_password(password, salt=None):
+    salt = salt or secrets.token_hex(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), PASSWORD_ITERATIONS)
+    return f"pbkdf2_sha256${PASSWORD_ITERATIONS}${salt}${digest.hex()}"
+
+
+def check_password(password, stored):
+    try:
+        _, iterations, salt, expected = stored.split("$")
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), int(iterations))
+    except ValueError:
+        return False
+    return hmac.compare_digest(digest.hex(), expected)
+
+
+class TokenAuthority:
+    """Issues and verifies HS256 tokens, keeping verified claims in a bounded TTL cache.
+
+    Cache entries expire after cache_ttl seconds or at the token's exp, whichever
+    comes first; the least recently used entry is evicted when the cache is full.
+    Revoked token ids (logout) are remembered until the token would have expired.
+    """
+
+    def __init__(self, secret, ttl=86400, cache_size=10_000, cache_ttl=300):
+        self.secret = secret.encode() if isinstance(secret, str) else secret
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        # token -> (claims, trusted until)
+        self.cache = OrderedDict()
+        # jti -> exp
+        self.revoked = {}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            os.environ.get(JWT_SECRET_ENV, "dummy-jwt-development-key"),
+            int(os.environ.get(TOKEN_TTL_ENV, 86400)),
+            int(os.environ.get(AUTH_CACHE_SIZE_ENV, 10_000)),
+            float(os.environ.get(AUTH_CACHE_TTL_ENV, 300)),
+        )
+
+    def _signature(self, signing_input):
+        return _b64encode(hmac.new(self.secret, signing_input, hashlib.sha256).digest())
+
+    def issue(self, user, now=None):
+        now = int(time.time() if now is None else now)
+        claims = {
+            "sub": user["email"],
+            "userId": user["id"],
+            "iat": now,
+            "exp": now + self.ttl,
+            "jti": uuid.uuid4().hex,
+        }
+        signing_input = HEADER_SEGMENT + b"." + _b64encode(_json(claims))
+        return (signing_input + b"." + self._signature(signing_input)).decode()
+
+    def decode(self, token, now=None):
+        """Claims of a token, checking signature, expiry and revocation; raises AuthError."""
+        try:
+            signing_input, _, signature = token.encode("ascii").rpartition(b".")
+            header, _, payload = signing_input.partition(b".")
+            if not hmac.compare_digest(signature, self._signature(signing_input)):
+                raise AuthError("invalid token signature")
+            if json.loads(_b64decode(header)).get("alg") != "HS256":
+                raise AuthError("unsupported token algorithm")
+            claims = json.loads(_b64decode(payload))
+        except (ValueError, UnicodeError, AttributeError):
+            raise AuthError("malformed token")
+        if not isinstance(claims, dict) or not isinstance(claims.get("exp"), (int, float)):
+            raise AuthError("malformed token")
+        if claims["exp"] <= (time.time() if now is None else now):
+            raise AuthError("token expired")
+        if claims.get("jti") in self.revoked:
+            raise AuthError("token revoked")
+        return claims
+
+    def verify(self, token, now=None):
+        """Claims of a token, from the cache when it was verified recently; raises AuthError."""
+        now = time.time() if now is None else now
+        cached = self.cache.get(token)
+        if cached is not None:
+            # Another worker's logout revokes the id without knowing the token
+            if cached[1] > now and cached[0].get("jti") not in self.revoked:
+                self.cache.move_to_end(token)
+                self.hits += 1
+                return cached[0]
+            del self.cache[token]
+        self.misses += 1
+        claims = self.decode(token, now)
+        if self.cache_size:
+            self.cache[token] = (claims, min(claims["exp"], now + self.cache_ttl))
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return claims
+
+    def revoke(self, token, claims, now=None):
+        self.cache.pop(token, None)
+        self.revoke_id(claims.get("jti"), claims["exp"], now)
+
+    def revoke_id(self, jti, exp, now=None):
+        """Reject the token with this id until it expires."""
+        now = time.time() if now is None else now
+        self.revoked[jti] = exp
+        # Forget ids whose tokens have expired anyway; logouts are rare enough to scan
+        if len(self.revoked) > self.cache_size:
+            self.revoked = {jti: exp for jti, exp in self.revoked.items() if exp > now}
+
+    def stats(self):
+        return {"cached": len(self.cache), "hits": self.hits, "misses": self.misses, "revoked": len(self.revoked)}
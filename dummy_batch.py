@@ -0,0 +1,282 @@
+import asyncio
+import base64
+import json
+import logging
+import os
+from urllib.parse import unquote
+
+from starlette.exceptions import HTTPException
+from starlette.routing import Match
+
+from dummy_profiler import current_timing
+from dummy_ratelimit import group_for, limited_response
+from dummy_responses import render_json
+
+# POST /batch: several calls to dummy_endpoint's routes in one round trip, for
+# clients that fire a burst of requests at once (a page load asking for
+# /verify-token, /get-prices, /config, /library, /character/score and
+# /referral/generate).
+#
+#   {"requests": [{"id": "me", "method": "GET", "path": "/verify-token"},
+#                 {"id": "ref", "method": "POST", "path": "/referral/generate", "body": {}}]}
+#
+# Each sub-request is an ASGI call straight into the router, in-process: no
+# connection, no HTTP parsing and no middleware pass. It carries the batch's
+# headers (the Authorization header in particular) unless it sets its own,
+# and still takes a token from its rate limit group, as it would on its own.
+# Sub-requests run concurrently, so ones that depend on each other (create,
+# then list) belong in separate batches.
+#
+# Results come back in request order as {"responses": [...]}, or with
+# ?stream=true as NDJSON, one line per sub-request as soon as it finishes.
+# Each result has the sub-request's id, status, headers and body; JSON bodies
+# are spliced in as they are, without being parsed and encoded again, other
+# text is a string and binary bodies are base64 in body_b64. The routes named
+# in `refused` (dummy_endpoint's event streams, whose frames are only useful as
+# they happen) answer 400 without running.
+#
+# DUMMY_BATCH_MAX        sub-requests per batch (default 20)
+# DUMMY_BATCH_TIMEOUT    seconds a sub-request may take before it gets a 504 (default 10)
+
+BATCH_MAX_ENV = "DUMMY_BATCH_MAX"
+BATCH_TIMEOUT_ENV = "DUMMY_BATCH_TIMEOUT"
+
+BATCH_PATH = "/batch"
+METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+# Scope entries a sub-request shares with the batch; the rest are per request
+INHERITED_SCOPE = ("type", "asgi", "http_version", "scheme", "server", "client", "root_path", "app",
+                   "starlette.exception_handlers", "fastapi_middleware_astack", "router")
+# Batch request headers that describe its own body, not a sub-request's
+BODY_HEADERS = {b"content-length", b"content-type", b"transfer-encoding", b"content-encoding"}
+# Response headers left out of results
+SKIPPED_HEADERS = {"content-length"}
+
+logger = logging.getLogger(__name__)
+
+
+class BatchError(ValueError):
+    pass
+
+
+class SubRequest:
+    __slots__ = ("id", "method", "path", "query_string", "headers", "body")
+
+    def __init__(self, id, method, path, query_string, headers, body):
+        self.id = id
+        self.method = method
+        self.path = path
+        self.query_string = query_string
+        self.headers = headers
+        self.body = body
+
+
+def parse_batch(payload, max_requests):
+    """SubRequests from a /batch body; BatchError when it is malformed."""
+    try:
+        data = json.loads(payload)
+    except ValueError:
+        raise BatchError("Invalid JSON payload")
+    items = data.get("requests") if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise BatchError("Expected {\"requests\": [...]} with at least one request")
+    if len(items) > max_requests:
+        raise BatchError(f"At most {max_requests} requests per batch")
+    requests = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get("path"), str) or not item["path"].startswith("/"):
+            raise BatchError(f"Request {index} needs a path starting with /")
+        method = str(item.get("method", "GET")).upper()
+        if method not in METHODS:
+            raise BatchError(f"Request {index} has unsupported method {method}")
+        path, _, query = item["path"].partition("?")
+        if path.rstrip("/") == BATCH_PATH:
+            raise BatchError("Batches can't be nested")
+        headers = item.get("headers") or {}
+        if not isinstance(headers, dict):
+            raise BatchError(f"Request {index} headers must be an object")
+        headers = {name.lower(): str(value) for name, value in headers.items()}
+        try:
+            # As on the wire: the path and query are ASCII, other characters percent-encoded
+            path.encode("ascii")
+            query = query.encode("ascii")
+        except UnicodeEncodeError:
+            raise BatchError(f"Request {index} path must be ASCII; percent-encode other characters")
+        body = b""
+        if "body" in item:
+            content_type = headers.setdefault("content-type", "application/json")
+            try:
+                if isinstance(item["body"], str) and "json" not in content_type:
+                    body = item["body"].encode("utf-8")
+                else:
+                    body = render_json(item["body"])
+            except (TypeError, ValueError, OverflowError) as exc:
+                # orjson's errors are TypeErrors; an unpaired surrogate fails UTF-8 encoding
+                raise BatchError(f"Request {index} body can't be encoded: {exc}")
+        try:
+            raw_headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()]
+        except UnicodeEncodeError:
+            raise BatchError(f"Request {index} headers must be latin-1")
+        requests.append(SubRequest(item.get("id", index), method, path, query, raw_headers, body))
+    return requests
+
+
+class BatchDispatcher:
+    def __init__(self, router, identify=None, refused=(), max_requests=20, timeout=10.0):
+        self.router = router
+        # Route paths sub-requests may not call
+        self.refused = set(refused)
+        # dummy_ratelimit's limiter; dummy_api sets it next to the middleware's
+        self.limiter = None
+        self.identify = identify
+        self.max_requests = max_requests
+        self.timeout = timeout
+        self.batches = 0
+        self.requests = 0
+        self.timeouts = 0
+
+    @classmethod
+    def from_env(cls, router, identify=None, refused=()):
+        return cls(router, identify, refused, int(os.environ.get(BATCH_MAX_ENV, 20)),
+                   float(os.environ.get(BATCH_TIMEOUT_ENV, 10)))
+
+    def parse(self, payload):
+        requests = parse_batch(payload, self.max_requests)
+        self.batches += 1
+        self.requests += len(requests)
+        return requests
+
+    def sub_scope(self, scope, request):
+        sub = {key: scope[key] for key in INHERITED_SCOPE if key in scope}
+        names = {name for name, _ in request.headers}
+        headers = [(name, value) for name, value in scope["headers"] if name not in BODY_HEADERS and name not in names]
+        headers.extend(request.headers)
+        if request.body:
+            headers.append((b"content-length", str(len(request.body)).encode("latin-1")))
+        sub.update({
+            "method": request.method,
+            # Percent-decoded, as an ASGI server passes it; raw_path keeps it as sent
+            "path": unquote(request.path),
+            "raw_path": request.path.encode("ascii"),
+            "query_string": request.query_string,
+            "headers": headers,
+        })
+        if "state" in scope:
+            # Dependencies write the caller into request.state; every sub-request needs its own
+            sub["state"] = dict(scope["state"])
+        return sub
+
+    def match(self, scope):
+        """The route for a sub-request, as the router would pick it; adds its path params to scope."""
+        partial = None
+        for route in self.router.routes:
+            match, child_scope = route.matches(scope)
+            if match == Match.FULL:
+                scope.update(child_scope)
+                return route
+            if match == Match.PARTIAL and partial is None:
+                partial = route, child_scope
+        if partial is None:
+            return None
+        # Path matches, method doesn't: the route answers 405
+        scope.update(partial[1])
+        return partial[0]
+
+    async def call(self, scope, request):
+        """One sub-request's result, encoded as a JSON object."""
+        # The profiler's timing belongs to the batch request, not to its parts
+        current_timing.set(None)
+        sub = self.sub_scope(scope, request)
+        if self.limiter is not None and self.limiter.enabled:
+            group = group_for(sub["path"])
+            if group is not None:
+                wait = self.limiter.acquire(*self.identify(sub), group)
+                if wait:
+                    response = limited_response(group, wait)
+                    return self.result(request, response.status_code, response.raw_headers, response.body)
+
+        route = self.match(sub)
+        if route is None:
+            return self.error(request, 404, "Not Found", detail=True)
+        if route.path in self.refused:
+            return self.error(request, 400, "Event streams can't be batched; connect to them directly")
+
+        start = None
+        chunks = []
+        delivered = False
+
+        async def receive():
+            nonlocal delivered
+            if not delivered:
+                delivered = True
+                return {"type": "http.request", "body": request.body, "more_body": False}
+            # No more body and no disconnect; whoever listens is cancelled once the response is sent
+            await asyncio.Future()
+
+        async def send(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        try:
+            await asyncio.wait_for(route.handle(sub, receive, send), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return self.error(request, 504, f"No response within {self.timeout:g} seconds")
+        except HTTPException as exc:
+            # Raised outside the route's exception handling (405), as the app would answer it
+            return self.error(request, exc.status_code, exc.detail, exc.headers, detail=True)
+        except Exception:
+            logger.exception("batch sub-request %s %s failed", request.method, request.path)
+            # Whatever body was sent before the error may be cut off mid-JSON
+            return self.error(request, 500, "Internal Server Error")
+        return self.result(request, start["status"], start.get("headers", ()), b"".join(chunks))
+
+    def result(self, request, status, raw_headers, body):
+        headers = {}
+        content_type = ""
+        for name, value in raw_headers:
+            name = name.decode("latin-1").lower()
+            if name in SKIPPED_HEADERS:
+                continue
+            headers[name] = value.decode("latin-1")
+            if name == "content-type":
+                content_type = headers[name]
+        envelope = render_json({"id": request.id, "status": status, "headers": headers})
+        if not body:
+            return envelope
+        if "json" in content_type:
+            # Already JSON: spliced in rather than decoded and encoded again
+            return envelope[:-1] + b',"body":' + body + b"}"
+        try:
+            extra = {"body": body.decode("utf-8")}
+        except UnicodeDecodeError:
+            extra = {"body_b64": base64.b64encode(body).decode("ascii")}
+        return envelope[:-1] + b"," + render_json(extra)[1:]
+
+    def error(self, request, status, message, headers=None, detail=False):
+        # detail: FastAPI's shape for HTTPException, rather than this app's
+        raw_headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in (headers or {}).items()]
+        raw_headers.append((b"content-type", b"application/json"))
+        body = {"detail": message} if detail else {"status": "error", "message": message}
+        return self.result(request, status, raw_headers, render_json(body))
+
+    async def run(self, scope, requests):
+        """The whole {"responses": [...]} document, in request order."""
+        results = await asyncio.gather(*(self.call(scope, request) for request in requests))
+        return b'{"responses":[' + b",".join(results) + b"]}"
+
+    async def stream(self, scope, requests):
+        """NDJSON lines, one per sub-request, in the order they finish."""
+        tasks = [asyncio.ensure_future(self.call(scope, request)) for request in requests]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished + b"\n"
+        finally:
+            # The client went away mid-stream
+            for task in tasks:
+                task.cancel()
+
+    def stats(self):
+        return {"batches": self.batches, "requests": self.requests, "timeouts": self.timeouts}
@@ -0,0 +1,450 @@
+import base64
+import hashlib
+import hmac
+import os
+import re
+import struct
+import tempfile
+import time
+import zlib
+from collections import OrderedDict
+from urllib.parse import quote
+
+from starlette.responses import Response
+
+from dummy_responses import JSONResponse
+
+# Local stand-in for the vidgencraft S3 buckets.
+#
+# Objects are stored content-addressed (objects/ab/<sha256>), so identical
+# uploads and identical placeholders share one file; an in-memory index maps
+# (bucket, key) to the object. Keys nobody uploaded get placeholder media
+# synthesized on first read from their extension (.mp4, .jpg, .png, .mp3), which
+# is how generated outputs and library thumbnails become downloadable; those
+# keys are served from one object per extension and never enter the index.
+#
+# DUMMY_BLOB_DIR         object directory (default: <tmp>/dummy-blobs)
+# DUMMY_BLOB_BASE_URL    when set (e.g. http://localhost:8001/s3), returned URLs
+#                        point here instead of https://<bucket>.s3.amazonaws.com
+# DUMMY_PLACEHOLDER_VIDEO_BYTES   size of placeholder videos (default 4 MiB)
+#
+# Presigned URLs (URLSigner) carry Expires, response-content-type and an
+# HMAC-SHA256 Signature over bucket, key, expiry and content type:
+#
+# DUMMY_PRESIGN_SECRET           signing key (default: a fixed development key,
+#                                so every worker and restart accepts the same URLs)
+# DUMMY_PRESIGN_TTL              lifetime of minted URLs in seconds (default 3600)
+# DUMMY_BLOB_REQUIRE_SIGNATURE   1 to reject unsigned /s3 requests with 403
+
+BLOB_DIR_ENV = "DUMMY_BLOB_DIR"
+BLOB_BASE_URL_ENV = "DUMMY_BLOB_BASE_URL"
+PLACEHOLDER_VIDEO_BYTES_ENV = "DUMMY_PLACEHOLDER_VIDEO_BYTES"
+PRESIGN_SECRET_ENV = "DUMMY_PRESIGN_SECRET"
+PRESIGN_TTL_ENV = "DUMMY_PRESIGN_TTL"
+REQUIRE_SIGNATURE_ENV = "DUMMY_BLOB_REQUIRE_SIGNATURE"
+
+VIDEOS_BUCKET = "vidgencraft-videos"
+MEDIA_BUCKET = "vidgencraft-media"
+BUCKETS = (VIDEOS_BUCKET, MEDIA_BUCKET)
+
+CONTENT_TYPES = {
+    ".mp4": "video/mp4",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".mp3": "audio/mpeg",
+}
+
+PLACEHOLDER_SECONDS = 8.0
+PLACEHOLDER_WIDTH = 320
+PLACEHOLDER_HEIGHT = 180
+
+
+def bucket_url(bucket):
+    base = os.environ.get(BLOB_BASE_URL_ENV)
+    if base:
+        return f"{base.rstrip('/')}/{bucket}"
+    return f"https://{bucket}.s3.amazonaws.com"
+
+
+def content_type_for(key):
+    return CONTENT_TYPES.get(os.path.splitext(key)[1].lower(), "application/octet-stream")
+
+
+# Placeholder media: structurally valid files with the right duration or
+# dimensions, but no real picture or sound.
+def _box(box_type, payload):
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def placeholder_mp4(seconds=PLACEHOLDER_SECONDS, size=4 * 2**20):
+    timescale = 1000
+    identity = struct.pack(">9I", 0x10000, 0, 0, 0, 0x10000, 0, 0, 0, 0x40000000)
+    mvhd = _box(
+        b"mvhd",
+        struct.pack(">4xIIII", 0, 0, timescale, int(seconds * timescale))
+        + struct.pack(">IH10x", 0x00010000, 0x0100) + identity + bytes(24) + struct.pack(">I", 1)
+    )
+    head = _box(b"ftyp", b"isom\x00\x00\x02\x00isomiso2mp41") + _box(b"moov", mvhd)
+    # faststart layout (moov before mdat) so players can seek by byte range
+    padding = max(0, size - len(head) - 8)
+    return head + struct.pack(">I4s", 8 + padding, b"mdat") + bytes(padding)
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def png_chunk(chunk_type, data):
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+
+def placeholder_png(width=PLACEHOLDER_WIDTH, height=PLACEHOLDER_HEIGHT, rgb=(128, 128, 128)):
+    row = b"\x00" + bytes(rgb) * width
+    return (
+        PNG_SIGNATURE
+        + png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + png_chunk(b"IDAT", zlib.compress(row * height, 9))
+        + png_chunk(b"IEND", b"")
+    )
+
+
+def placeholder_jpeg(width=PLACEHOLDER_WIDTH, height=PLACEHOLDER_HEIGHT):
+    """Baseline greyscale JPEG of mid grey: every 8x8 block is DC 0, so the scan is two zero bits per block."""
+    # DC table: category 0 only; AC table: end-of-block only; both as the 1-bit code "0"
+    dc_table = b"\x00" + bytes([1] + [0] * 15) + b"\x00"
+    ac_table = b"\x10" + bytes([1] + [0] * 15) + b"\x00"
+    blocks = -(-width // 8) * -(-height // 8)
+    bits = 2 * blocks
+    # Pad the last byte with 1 bits; 0x00 bytes never need stuffing
+    scan = bytes(bits // 8)
+    if bits % 8:
+        scan += bytes([0xFF >> (bits % 8)])
+
+    def segment(marker, payload):
+        return b"\xff" + marker + struct.pack(">H", len(payload) + 2) + payload
+
+    return (
+        b"\xff\xd8"
+        + segment(b"\xdb", b"\x00" + bytes([1] * 64))
+        + segment(b"\xc0", struct.pack(">BHHB", 8, height, width, 1) + b"\x01\x11\x00")
+        + segment(b"\xc4", dc_table + ac_table)
+        + segment(b"\xda", b"\x01\x01\x00\x00\x3f\x00")
+        + scan
+        + b"\xff\xd9"
+    )
+
+
+def placeholder_mp3(seconds=PLACEHOLDER_SECONDS):
+    # MPEG-1 Layer III, 128 kbit/s, 44.1 kHz, mono: 417-byte frames of 1152 samples
+    frame = b"\xff\xfb\x90\xc0" + bytes(413)
+    return frame * max(1, round(seconds * 44100 / 1152))
+
+
+PLACEHOLDERS = {
+    ".mp4": lambda: placeholder_mp4(size=int(os.environ.get(PLACEHOLDER_VIDEO_BYTES_ENV, 4 * 2**20))),
+    ".jpg": placeholder_jpeg,
+    ".jpeg": placeholder_jpeg,
+    ".png": placeholder_png,
+    ".mp3": placeholder_mp3,
+}
+
+
+class BlobWriter:
+    """Temporary file an upload streams into until BlobStore.commit() files it under its digest."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "wb")
+
+    def write(self, data):
+        self.file.write(data)
+
+    def abort(self):
+        self.file.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class BlobStore:
+    def __init__(self, root):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.tmp_dir = os.path.join(root, "tmp")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        # (bucket, key) -> (digest, size, content_type)
+        self.index = {}
+        # extension -> index entry, so each placeholder kind is built once
+        self.placeholders = {}
+        self.deduplicated = 0
+        self._next_tmp = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(os.environ.get(BLOB_DIR_ENV) or os.path.join(tempfile.gettempdir(), "dummy-blobs"))
+
+    def object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def tmp_path(self):
+        """Fresh path in the temporary directory, for content that commit_path() files later."""
+        self._next_tmp += 1
+        return os.path.join(self.tmp_dir, f"{os.getpid()}-{self._next_tmp}")
+
+    def writer(self):
+        return BlobWriter(self.tmp_path())
+
+    def _store_file(self, tmp_path, digest):
+        path = self.object_path(digest)
+        if os.path.exists(path):
+            os.unlink(tmp_path)
+            self.deduplicated += 1
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+
+    def commit(self, writer, digest, size, bucket, key, content_type=None):
+        writer.file.close()
+        return self.commit_path(writer.path, digest, size, bucket, key, content_type)
+
+    def commit_path(self, path, digest, size, bucket, key, content_type=None):
+        """File a complete temporary file (e.g. written by a media worker process) under bucket/key."""
+        self._store_file(path, digest)
+        entry = (digest, size, content_type or content_type_for(key))
+        self.index[(bucket, key)] = entry
+        return entry
+
+    def _store_bytes(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        if os.path.exists(self.object_path(digest)):
+            self.deduplicated += 1
+        else:
+            writer = self.writer()
+            writer.write(data)
+            writer.file.close()
+            self._store_file(writer.path, digest)
+        return digest
+
+    def put(self, bucket, key, data, content_type=None):
+        entry = (self._store_bytes(data), len(data), content_type or content_type_for(key))
+        self.index[(bucket, key)] = entry
+        return entry
+
+    def get(self, bucket, key):
+        """Index entry for a key, synthesizing placeholder media for unknown keys; None if impossible."""
+        entry = self.index.get((bucket, key))
+        if entry is not None or bucket not in BUCKETS:
+            return entry
+        extension = os.path.splitext(key)[1].lower()
+        if extension not in PLACEHOLDERS:
+            return None
+        # Not added to the index: any key may be requested, so recording
+        # each one would grow the index without bound
+        placeholder = self.placeholders.get(extension)
+        if placeholder is None or not os.path.exists(self.object_path(placeholder[0])):
+            data = PLACEHOLDERS[extension]()
+            placeholder = (self._store_bytes(data), len(data), content_type_for(key))
+            self.placeholders[extension] = placeholder
+        return placeholder
+
+    def stats(self):
+        return {
+            "keys": len(self.index),
+            "objects": len({digest for digest, _, _ in self.index.values()}
+                           | {digest for digest, _, _ in self.placeholders.values()}),
+            "deduplicated_writes": self.deduplicated,
+        }
+
+
+class SignatureError(Exception):
+    pass
+
+
+class URLSigner:
+    """Mints and checks presigned blob URLs, remembering recently signed keys in an LRU.
+
+    Expiry times are rounded up to EXPIRY_GRANULARITY, so signing the same key
+    again within that window returns the identical URL straight from the LRU
+    (and clients and CDNs can cache it); verifying a URL that is still in the
+    LRU is a dict lookup and a constant-time compare instead of an HMAC.
+    """
+
+    EXPIRY_GRANULARITY = 60
+
+    def __init__(self, secret, ttl=3600, cache_size=10_000, require_signature=False):
+        self.secret = secret.encode() if isinstance(secret, str) else secret
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.require_signature = require_signature
+        # (bucket, key, content_type) -> (expires, signature, url)
+        self.recent = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            os.environ.get(PRESIGN_SECRET_ENV, "dummy-presign-development-key"),
+            int(os.environ.get(PRESIGN_TTL_ENV, 3600)),
+            require_signature=os.environ.get(REQUIRE_SIGNATURE_ENV, "").lower() in ("1", "true", "yes", "on"),
+        )
+
+    def _signature(self, bucket, key, expires, content_type):
+        message = f"{bucket}/{key}\n{expires}\n{content_type}".encode()
+        digest = hmac.new(self.secret, message, hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+    def sign(self, bucket, key, content_type=None, now=None):
+        """(url, expires) for bucket/key, reusing a recent signature while it has at least half its lifetime left."""
+        content_type = content_type or content_type_for(key)
+        now = time.time() if now is None else now
+        cache_key = (bucket, key, content_type)
+        cached = self.recent.get(cache_key)
+        if cached is not None and cached[0] - now >= self.ttl / 2:
+            self.recent.move_to_end(cache_key)
+            self.hits += 1
+            return cached[2], cached[0]
+        self.misses += 1
+        granularity = self.EXPIRY_GRANULARITY
+        expires = int(-(-(now + self.ttl) // granularity) * granularity)
+        signature = self._signature(bucket, key, expires, content_type)
+        query = f"Expires={expires}&response-content-type={quote(content_type, safe='')}&Signature={signature}"
+        url = f"{bucket_url(bucket)}/{quote(key)}?{query}"
+        self.recent[cache_key] = (expires, signature, url)
+        self.recent.move_to_end(cache_key)
+        if len(self.recent) > self.cache_size:
+            self.recent.popitem(last=False)
+        return url, expires
+
+    def verify(self, bucket, key, query_params, now=None):
+        """Content type the URL was signed for (None if unsigned and allowed); raises SignatureError."""
+        signature = query_params.get("Signature")
+        if signature is None:
+            if self.require_signature:
+                raise SignatureError("request is not signed")
+            return None
+        try:
+            expires = int(query_params.get("Expires", ""))
+        except ValueError:
+            raise SignatureError("missing or malformed Expires")
+        if expires < (time.time() if now is None else now):
+            raise SignatureError("signature expired")
+        content_type = query_params.get("response-content-type") or content_type_for(key)
+        cached = self.recent.get((bucket, key, content_type))
+        # Compare bytes: compare_digest rejects non-ASCII str with TypeError
+        signature = signature.encode()
+        if cached is not None and cached[0] == expires and hmac.compare_digest(cached[1].encode(), signature):
+            return content_type
+        if not hmac.compare_digest(signature, self._signature(bucket, key, expires, content_type).encode()):
+            raise SignatureError("signature does not match")
+        return content_type
+
+    def stats(self):
+        return {"cached": len(self.recent), "hits": self.hits, "misses": self.misses}
+
+
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single-range header; None to send everything; ValueError if unsatisfiable."""
+    match = _RANGE.match(header.strip())
+    if match is None:
+        # Multiple or malformed ranges: serving the whole object is allowed
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+
+class BlobResponse(Response):
+    """Serves [start, start + count) of an object file.
+
+    Uses the ASGI zero-copy send extension when the server offers it (the
+    server sendfile()s straight from the page cache); otherwise the bytes are
+    read with os.pread in CHUNK_SIZE pieces, which never touches a shared file
+    offset, so concurrent Range requests on the same object don't interfere.
+    """
+
+    chunk_size = 256 * 1024
+
+    def __init__(self, path, start, count, status_code=200, headers=None):
+        super().__init__(status_code=status_code, headers=headers)
+        self.path = path
+        self.start = start
+        self.count = count
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope.get("method") == "HEAD" or self.count == 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+        with open(self.path, "rb") as fh:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({"type": "http.response.zerocopysend", "file": fh, "offset": self.start, "count": self.count})
+                return
+            fd = fh.fileno()
+            position = self.start
+            end = self.start + self.count
+            while position < end:
+                data = os.pread(fd, min(self.chunk_size, end - position), position)
+                if not data:
+                    break
+                position += len(data)
+                await send({"type": "http.response.body", "body": data, "more_body": position < end})
+            if position < end:
+                # Object shorter than indexed: end the response instead of hanging
+                await send({"type": "http.response.body", "body": b""})
+
+
+def blob_response(store, request, bucket, key, signer=None):
+    if signer is not None:
+        try:
+            signed_type = signer.verify(bucket, key, request.query_params)
+        except SignatureError as exc:
+            return JSONResponse({"status": "error", "message": str(exc)}, status_code=403)
+    else:
+        signed_type = None
+    entry = store.get(bucket, key)
+    if entry is None:
+        return None
+    digest, size, content_type = entry
+    content_type = signed_type or content_type
+    etag = f'"{digest}"'
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Content-Type": content_type,
+        "Cache-Control": "public, max-age=31536000, immutable"
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and etag in if_none_match:
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return BlobResponse(store.object_path(digest), start, end - start + 1, 206, headers)
+    headers["Content-Length"] = str(size)
+    return BlobResponse(store.object_path(digest), 0, size, 200, headers)
@@ -0,0 +1,152 @@
+import asyncio
+from collections import deque
+
+from dummy_responses import render_text
+
+# Fan-out of progress frames to WebSocket and SSE clients.
+#
+# Each connection gets a bounded send queue, drained by its own writer task or,
+# for a subscriber registered without `send` (an SSE response body), by the
+# caller through next_message(). publish() therefore never awaits a socket: a
+# frame is encoded once, queued for every subscriber of its topic, and a stalled
+# client only loses its own oldest frames (counted in `dropped`) instead of
+# blocking the others. The final frame of a stream is always delivered because
+# the oldest entries go first.
+
+SEND_QUEUE_SIZE = 32
+
+
+class Subscriber:
+    __slots__ = ("user_id", "send", "queue", "limit", "waiter", "topics", "task", "dropped", "closed", "disconnected")
+
+    def __init__(self, user_id, send, queue_size=SEND_QUEUE_SIZE):
+        self.user_id = user_id
+        # async callable taking the encoded frame text, or None to drain with next_message()
+        self.send = send
+        # A deque plus one waiter future is cheaper per frame than asyncio.Queue
+        self.queue = deque()
+        self.limit = max(2, queue_size)
+        self.waiter = None
+        self.topics = set()
+        self.task = None
+        self.dropped = 0
+        self.closed = False
+        self.disconnected = False
+
+    def offer(self, message):
+        if self.closed:
+            return
+        if len(self.queue) >= self.limit:
+            self.queue.popleft()
+            self.dropped += 1
+        self.queue.append(message)
+        waiter = self.waiter
+        if waiter is not None:
+            self.waiter = None
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def next_message(self):
+        """Next queued frame text, or None once the stream has ended."""
+        if self.closed and not self.queue:
+            return None
+        if not self.queue:
+            self.waiter = asyncio.get_running_loop().create_future()
+            await self.waiter
+        return self.queue.popleft()
+
+    async def run(self):
+        try:
+            while True:
+                message = await self.next_message()
+                if message is None:
+                    break
+                await self.send(message)
+        except Exception:
+            # Client went away mid-send; the publisher notices through .closed
+            self.disconnected = True
+        finally:
+            self.closed = True
+
+
+class ConnectionManager:
+    def __init__(self, queue_size=SEND_QUEUE_SIZE):
+        self.queue_size = queue_size
+        # user_id -> subscribers, for per-user messages
+        self.active_connections = {}
+        # topic (usually a creation_id) -> subscribers
+        self.topics = {}
+        self.dropped = 0
+
+    @property
+    def connection_count(self):
+        return sum(len(subscribers) for subscribers in self.active_connections.values())
+
+    def register(self, user_id, send=None):
+        subscriber = Subscriber(user_id, send, self.queue_size)
+        if send is not None:
+            subscriber.task = asyncio.get_running_loop().create_task(subscriber.run())
+        self.active_connections.setdefault(user_id, set()).add(subscriber)
+        return subscriber
+
+    async def connect(self, websocket, user_id):
+        await websocket.accept()
+        return self.register(user_id, websocket.send_text)
+
+    def disconnect(self, subscriber):
+        subscriber.closed = True
+        self.dropped += subscriber.dropped
+        connections = self.active_connections.get(subscriber.user_id)
+        if connections is not None:
+            connections.discard(subscriber)
+            if not connections:
+                del self.active_connections[subscriber.user_id]
+        for topic in subscriber.topics:
+            subscribers = self.topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self.topics[topic]
+        subscriber.topics.clear()
+        if subscriber.task is not None and not subscriber.task.done():
+            subscriber.task.cancel()
+
+    def subscribe(self, subscriber, topic):
+        subscriber.topics.add(topic)
+        self.topics.setdefault(topic, set()).add(subscriber)
+
+    def publish(self, topic, frame, final=False):
+        """Queue `frame` for every subscriber of `topic`; `final` ends their streams after it."""
+        subscribers = self.topics.get(topic)
+        if not subscribers:
+            return 0
+        message = render_text(frame)
+        for subscriber in subscribers:
+            subscriber.offer(message)
+            if final:
+                subscriber.offer(None)
+        if final:
+            for subscriber in subscribers:
+                subscriber.topics.discard(topic)
+            del self.topics[topic]
+        return len(subscribers)
+
+    def send(self, subscriber, frame, final=False):
+        """Queue `frame` for one subscriber only (e.g. the current status when it subscribes)."""
+        subscriber.offer(render_text(frame))
+        if final:
+            subscriber.offer(None)
+
+    async def send_message(self, message: str, user_id: str):
+        for subscriber in self.active_connections.get(user_id, ()):
+            subscriber.offer(message)
+
+    async def finish(self, subscriber):
+        """Wait until the subscriber's stream ended (final frame sent or client gone), then unregister."""
+        try:
+            if subscriber.task is not None:
+                # The writer being cancelled is a normal end of the stream; the
+                # caller being cancelled (shutdown, client gone) still raises
+                await asyncio.gather(subscriber.task, return_exceptions=True)
+        finally:
+            self.disconnect(subscriber)
@@ -0,0 +1,139 @@
+import itertools
+from collections import OrderedDict
+
+# Credit ledger for the generation endpoints.
+#
+# Generation routes reserve their cost up front: the credits leave
+# credits_remaining at once, so concurrent requests from the same user see the
+# reduced balance and can't spend the same credits twice. A reservation is then
+# committed when the work succeeds or released (refunded) when it fails. Grants
+# from the payment webhook are idempotent per checkout session, and only
+# sessions opened by /create-checkout-session grant anything, for the amount
+# stored when they were opened.
+#
+# Every operation is a plain function call with no await inside, so on the
+# event loop each one runs to completion before another request can touch the
+# balance; no lock is needed, and hot users don't contend with anyone else.
+
+# Credits charged per creation type
+CREDIT_COSTS = {
+    "text_to_video": 10,
+    "image_to_video": 10,
+    "sound_effects": 5,
+    "movie": 5,
+    "ai_background": 2,
+    "colorized": 1,
+    "watermarked": 1,
+}
+
+# Credits bought by one checkout session
+CHECKOUT_CREDITS = 1000
+
+# Checkout sessions remembered for webhook idempotency
+MAX_CHECKOUT_SESSIONS = 100_000
+
+
+class InsufficientCredits(Exception):
+    def __init__(self, balance, required):
+        super().__init__(f"{required} credits required, {balance} remaining")
+        self.balance = balance
+        self.required = required
+
+
+class CreditLedger:
+    def __init__(self):
+        # reservation id -> (user dict, amount)
+        self.reservations = {}
+        # email -> credits held by open reservations
+        self.reserved = {}
+        # checkout session id -> (email, credits, granted)
+        self.checkouts = OrderedDict()
+        self._ids = itertools.count(1)
+        self.committed = 0
+        self.released = 0
+        self.rejected = 0
+        self.granted = 0
+        self.duplicate_grants = 0
+
+    def reserve(self, user, amount):
+        """Take amount from the user's balance; returns a reservation id or raises InsufficientCredits."""
+        balance = user["credits_remaining"]
+        if balance < amount:
+            self.rejected += 1
+            raise InsufficientCredits(balance, amount)
+        user["credits_remaining"] = balance - amount
+        reservation = next(self._ids)
+        self.reservations[reservation] = (user, amount)
+        email = user["email"]
+        self.reserved[email] = self.reserved.get(email, 0) + amount
+        return reservation
+
+    def _close(self, reservation):
+        user, amount = self.reservations.pop(reservation)
+        email = user["email"]
+        held = self.reserved[email] - amount
+        if held:
+            self.reserved[email] = held
+        else:
+            del self.reserved[email]
+        return user, amount
+
+    def commit(self, reservation):
+        """The reserved credits are spent for good."""
+        _, amount = self._close(reservation)
+        self.committed += amount
+        return amount
+
+    def release(self, reservation):
+        """Refund a reservation whose work failed or never started."""
+        user, amount = self._close(reservation)
+        user["credits_remaining"] += amount
+        self.released += amount
+        return amount
+
+    def charge(self, user, amount):
+        """Reserve and commit in one step, for work that finishes within the request."""
+        return self.commit(self.reserve(user, amount))
+
+    def open_checkout(self, session_id, email, credits=CHECKOUT_CREDITS):
+        self.checkouts[session_id] = (email, credits, False)
+        while len(self.checkouts) > MAX_CHECKOUT_SESSIONS:
+            self.checkouts.popitem(last=False)
+
+    def checkout_owner(self, session_id):
+        checkout = self.checkouts.get(session_id)
+        return checkout[0] if checkout else None
+
+    def complete_checkout(self, session_id, user):
+        """Grant a session's credits once; returns the credits granted (0 for a repeat).
+
+        Raises KeyError for a session this ledger never opened.
+        """
+        _, amount, done = self.checkouts[session_id]
+        if done:
+            self.duplicate_grants += 1
+            return 0
+        user["credits_remaining"] += amount
+        self.checkouts[session_id] = (user["email"], amount, True)
+        self.checkouts.move_to_end(session_id)
+        while len(self.checkouts) > MAX_CHECKOUT_SESSIONS:
+            self.checkouts.popitem(last=False)
+        self.granted += amount
+        return amount
+
+    def held(self, email):
+        return self.reserved.get(email, 0)
+
+    def total_held(self):
+        return sum(self.reserved.values())
+
+    def stats(self):
+        return {
+            "open_reservations": len(self.reservations),
+            "credits_reserved": self.total_held(),
+            "credits_committed": self.committed,
+            "credits_released": self.released,
+            "credits_granted": self.granted,
+            "rejected": self.rejected,
+            "duplicate_grants": self.duplicate_grants,
+        }
@@ -0,0 +1,387 @@
+import base64
+import bisect
+import math
+import time
+import uuid
+from datetime import datetime, timedelta
+
+# Library creation types; the S3 folder matches the type except for movies
+CREATION_TYPES = ["text_to_video", "image_to_video", "sound_effects", "watermarked", "movie"]
+CREATION_FOLDERS = {"movie": "movies"}
+
+
+def creation_folder(creation_type):
+    return CREATION_FOLDERS.get(creation_type, creation_type)
+
+
+# Tombstones are purged once they outnumber live entries (and at least this
+# many), so deletes stay O(1) amortized. Until then a page may step over every
+# tombstone, up to as many as there are live entries, when the deleted
+# creations sit just above the requested position.
+COMPACT_MIN_TOMBSTONES = 1024
+
+
+class CreationIndex:
+    """Creation ids ordered by (created_at, id), with O(1) tombstone deletes."""
+
+    def __init__(self):
+        self.keys = []
+        self.live = {}
+        self.tombstones = 0
+
+    def __len__(self):
+        return len(self.live)
+
+    def add(self, key):
+        # Creations almost always arrive in time order, so this is an append
+        if not self.keys or key >= self.keys[-1]:
+            self.keys.append(key)
+        else:
+            bisect.insort(self.keys, key)
+        self.live[key[1]] = key
+
+    def remove(self, creation_id):
+        if self.live.pop(creation_id, None) is None:
+            return False
+        self.tombstones += 1
+        if self.tombstones >= COMPACT_MIN_TOMBSTONES and self.tombstones > len(self.live):
+            self.keys = [key for key in self.keys if self.live.get(key[1]) == key]
+            self.tombstones = 0
+        return True
+
+    def page(self, before, limit):
+        """Up to `limit` keys older than `before` (None: from the newest), newest first."""
+        position = len(self.keys) if before is None else bisect.bisect_left(self.keys, before)
+        keys, live = self.keys, self.live
+        found = []
+        while position > 0 and len(found) < limit:
+            position -= 1
+            key = keys[position]
+            if live.get(key[1]) == key:
+                found.append(key)
+        return found
+
+
+class UserLibrary:
+    """Per-user creation index, plus one index per creation type for filtered pages."""
+
+    def __init__(self):
+        self.all = CreationIndex()
+        self.by_type = {}
+
+    def __len__(self):
+        return len(self.all)
+
+    def add(self, key, creation_type):
+        self.all.add(key)
+        index = self.by_type.get(creation_type)
+        if index is None:
+            index = self.by_type[creation_type] = CreationIndex()
+        index.add(key)
+
+    def remove(self, creation_id, creation_type):
+        self.all.remove(creation_id)
+        index = self.by_type.get(creation_type)
+        if index is not None:
+            index.remove(creation_id)
+
+
+# Longest output one creation counts for in usage stats, so no run of
+# additions can overflow a user's total
+MAX_CREATION_SECONDS = 24 * 3600.0
+
+
+def creation_duration(creation):
+    """Seconds of output a creation counts for in usage stats; 0 unless its duration is a finite number >= 0."""
+    duration = creation["metadata"].get("duration")
+    if isinstance(duration, bool) or not isinstance(duration, (int, float)):
+        return 0.0
+    try:
+        duration = float(duration)
+    except OverflowError:
+        return 0.0
+    if not math.isfinite(duration) or duration < 0:
+        return 0.0
+    return min(duration, MAX_CREATION_SECONDS)
+
+
+def add_usage(usage, user_id, creation_type, count, duration):
+    """Add to a user's per-type [count, seconds] totals in a usage dict."""
+    totals = usage.get(user_id)
+    if totals is None:
+        totals = usage[user_id] = {}
+    entry = totals.get(creation_type)
+    if entry is None:
+        entry = totals[creation_type] = [0, 0.0]
+    entry[0] += count
+    entry[1] += duration
+
+
+def encode_cursor(key):
+    created_at, creation_id = key
+    return base64.urlsafe_b64encode(f"{created_at!r}|{creation_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, creation_id = raw.split("|", 1)
+        return float(created_at), creation_id
+    except ValueError:
+        raise ValueError(f"invalid cursor {cursor!r}")
+
+
+def new_user(email, password_hash=None):
+    """A free-tier account with the signup credit grant."""
+    now = datetime.now()
+    user = {
+        "id": str(uuid.uuid4()),
+        "email": email,
+        "credits_remaining": 100,
+        "subscription_tier": "free",
+        "subscription_start_date": now,
+        "subscription_end_date": now + timedelta(days=30)
+    }
+    if password_hash is not None:
+        user["password_hash"] = password_hash
+    return user
+
+
+# Mock data for all endpoints
+class MockDatabase:
+    def __init__(self):
+        self.users = {
+            "user@example.com": {
+                "id": "123e4567-e89b-12d3-a456-426614174000",
+                "email": "user@example.com",
+                "credits_remaining": 100,
+                "subscription_tier": "premium",
+                "subscription_start_date": datetime.now(),
+                "subscription_end_date": datetime.now() + timedelta(days=30)
+            }
+        }
+        # creation_id -> creation dict as returned by /library
+        self.creations = {}
+        # user_id -> UserLibrary
+        self.libraries = {}
+        self.preferences = {}
+        self.watermarks = {}
+        # generation_id -> text segmentation result
+        self.generations = {}
+        # creation_id -> ((created_at, creation_id) sort key, owning user_id)
+        self._creation_keys = {}
+        # user_id -> {creation_type: [count, seconds]}: what the overlay adds
+        # to (or, for deleted fixture rows, takes from) the user's usage, kept
+        # up to date on every add and delete so usage_stats never scans
+        self.usage = {}
+        # Optional read-mostly bulk layer (dummy_fixtures.FixtureTable). Its
+        # records become dicts above only when written; deleted creation rows
+        # are remembered here.
+        self.base = None
+        self._deleted_base = set()
+
+    def attach_base(self, table):
+        self.base = table
+        self._deleted_base = set()
+
+    def overlay_state(self):
+        """Everything not in the base table, for dummy_snapshot."""
+        return {
+            "users": self.users,
+            "creations": self.creations,
+            "creation_keys": self._creation_keys,
+            "preferences": self.preferences,
+            "watermarks": self.watermarks,
+            "generations": self.generations,
+            "deleted_base": sorted(self._deleted_base),
+            "usage": self.usage,
+        }
+
+    def restore_overlay_state(self, state):
+        self.users = state["users"]
+        self.creations = state["creations"]
+        self._creation_keys = state["creation_keys"]
+        self.preferences = state["preferences"]
+        self.watermarks = state["watermarks"]
+        self.generations = state["generations"]
+        self._deleted_base = set(state["deleted_base"])
+        self.usage = state["usage"]
+        self.libraries = {}
+        for creation_id, (key, user_id) in self._creation_keys.items():
+            library = self.libraries.get(user_id)
+            if library is None:
+                library = self.libraries[user_id] = UserLibrary()
+            library.add(key, self.creations[creation_id]["type"])
+
+    def get_user_by_email(self, email):
+        user = self.users.get(email)
+        if user is None and self.base is not None:
+            row = self.base.user_row_by_email(email)
+            if row is not None:
+                # Materialized on first access so update_user has a dict to change
+                user = self.users[email] = self.base.user_dict(row)
+        return user
+
+    def create_user(self, email, password_hash=None):
+        user = self.users[email] = new_user(email, password_hash)
+        return user
+
+    def update_user(self, email, data):
+        if email in self.users:
+            self.users[email].update(data)
+            return True
+        return False
+
+    def add_creation(self, user_id, creation_type, url, thumbnail, metadata=None, creation_id=None, created_at=None):
+        creation_id = creation_id or str(uuid.uuid4())
+        existing = self.get_creation(creation_id)
+        if existing is not None:
+            return existing
+        created_at = time.time() if created_at is None else created_at
+        creation = {
+            "id": creation_id,
+            "type": creation_type,
+            "created_at": datetime.fromtimestamp(created_at).isoformat(),
+            "url": url,
+            "thumbnail": thumbnail,
+            "metadata": metadata or {},
+        }
+        self.creations[creation_id] = creation
+        self._index_creation((created_at, creation_id), user_id, creation_type, creation_duration(creation))
+        return creation
+
+    # The _*creation* methods maintain the per-user order and usage totals of
+    # dict-backed creations and deleted fixture rows; dummy_shared keeps them
+    # in SQLite instead.
+    def _index_creation(self, key, user_id, creation_type, duration):
+        self._creation_keys[key[1]] = (key, user_id)
+        library = self.libraries.get(user_id)
+        if library is None:
+            library = self.libraries[user_id] = UserLibrary()
+        library.add(key, creation_type)
+        add_usage(self.usage, user_id, creation_type, 1, duration)
+
+    def _unindex_creation(self, creation_id, creation_type, duration):
+        _, user_id = self._creation_keys.pop(creation_id)
+        self.libraries[user_id].remove(creation_id, creation_type)
+        add_usage(self.usage, user_id, creation_type, -1, -duration)
+
+    def _delete_base_creation(self, row):
+        self._deleted_base.add(row)
+        add_usage(self.usage, self.base.creation_user_id(row), self.base.creation_type(row), -1,
+                  -self.base.creations["duration"][row])
+
+    def _creation_user(self, creation_id):
+        """Owner of a dict-backed creation; None if it isn't one."""
+        entry = self._creation_keys.get(creation_id)
+        return None if entry is None else entry[1]
+
+    def _overlay_usage(self, user_id):
+        """The overlay's {creation_type: [count, seconds]} for a user."""
+        return self.usage.get(user_id, {})
+
+    def _creation_page(self, user_id, creation_type, before, limit):
+        """Up to `limit` (created_at, id) keys of the user's creations older than `before`, newest first."""
+        library = self.libraries.get(user_id)
+        if library is None:
+            return []
+        index = library.all if creation_type is None else library.by_type.get(creation_type)
+        return [] if index is None else index.page(before, limit)
+
+    def _base_creation_row(self, creation_id):
+        if self.base is None:
+            return None
+        row = self.base.creation_row_by_id(creation_id)
+        return None if row is None or row in self._deleted_base else row
+
+    def get_creation(self, creation_id):
+        creation = self.creations.get(creation_id)
+        if creation is None:
+            row = self._base_creation_row(creation_id)
+            if row is not None:
+                creation = self.base.creation_dict(row)
+        return creation
+
+    def creation_owner(self, creation_id):
+        """Id of the user a creation belongs to; None if there is no such creation."""
+        user_id = self._creation_user(creation_id)
+        if user_id is None:
+            row = self._base_creation_row(creation_id)
+            if row is not None:
+                user_id = self.base.creation_user_id(row)
+        return user_id
+
+    def delete_creation(self, creation_id, user_id=None):
+        """Delete a creation (only if it belongs to user_id, when given); False if there was none to delete."""
+        if user_id is not None and self.creation_owner(creation_id) != user_id:
+            return False
+        creation = self.creations.pop(creation_id, None)
+        if creation is None:
+            row = self._base_creation_row(creation_id)
+            if row is None:
+                return False
+            self._delete_base_creation(row)
+            return True
+        self._unindex_creation(creation_id, creation["type"], creation_duration(creation))
+        return True
+
+    def usage_stats(self, user_id):
+        """Creations, seconds of output and most used type across a user's library, in O(1)."""
+        counts = dict.fromkeys(CREATION_TYPES, 0)
+        duration = 0.0
+        base_row = None if self.base is None else self.base.user_row_by_id(user_id)
+        if base_row is not None:
+            for creation_type, count in zip(CREATION_TYPES, self.base.user_type_counts(base_row)):
+                counts[creation_type] = count
+            duration = self.base.users["total_duration"][base_row]
+        for creation_type, (count, seconds) in self._overlay_usage(user_id).items():
+            counts[creation_type] = counts.get(creation_type, 0) + count
+            duration += seconds
+        total = sum(counts.values())
+        return {
+            "videos_generated": total,
+            # Adding and taking away float seconds leaves rounding noise
+            "total_duration": round(duration, 3) if total else 0,
+            # Ties go to the type listed first in CREATION_TYPES
+            "favorite_type": max(counts, key=counts.get) if total else None,
+        }
+
+    def get_preferences(self, preferences_id):
+        preferences = self.preferences.get(preferences_id)
+        if preferences is None and self.base is not None:
+            row = self.base.preference_row_by_id(preferences_id)
+            if row is not None:
+                preferences = self.base.preference_dict(row)
+        return preferences
+
+    def get_watermark(self, watermark_id):
+        watermark = self.watermarks.get(watermark_id)
+        if watermark is None and self.base is not None:
+            row = self.base.watermark_row_by_id(watermark_id)
+            if row is not None:
+                watermark = self.base.watermark_dict(row)
+        return watermark
+
+    def list_creations(self, user_id, limit=20, cursor=None, creation_type=None):
+        """One page of a user's creations, newest first, and the cursor for the next page."""
+        before = None if cursor is None else decode_cursor(cursor)
+        # One extra entry tells us whether there is a next page
+        wanted = limit + 1
+        entries = [(key, None) for key in self._creation_page(user_id, creation_type, before, wanted)]
+        base_row = None if self.base is None else self.base.user_row_by_id(user_id)
+        if base_row is not None:
+            if creation_type is None:
+                type_codes = range(len(CREATION_TYPES))
+            elif creation_type in CREATION_TYPES:
+                type_codes = [CREATION_TYPES.index(creation_type)]
+            else:
+                type_codes = []
+            entries.extend(self.base.page(base_row, type_codes, before, wanted, self._deleted_base))
+            entries.sort(key=lambda entry: entry[0], reverse=True)
+        more = len(entries) > limit
+        entries = entries[:limit]
+        creations = [
+            self.creations[key[1]] if row is None else self.base.creation_dict(row)
+            for key, row in entries
+        ]
+        return creations, encode_cursor(entries[-1][0]) if more else None
@@ -0,0 +1,398 @@
+"""Seeded bulk fixtures for MockDatabase, stored as array-backed columns.
+
+A FixtureTable holds users, creations, preferences and watermarks in
+array.array columns instead of per-record dicts. Ids and emails are derived
+from the row number, so no strings are stored per record:
+
+    user id         {tag}-0001-4000-8000-{row:012x}     email  user{row}@fixture.test
+    creation id     {tag}-0002-4000-8000-{row:012x}
+    preference id   {tag}-0003-4000-8000-{row:012x}
+    watermark id    {tag}-0004-4000-8000-{row:012x}
+
+where tag is derived from the seed. Bytes per record (column itemsizes):
+
+    user        61  credits q, tier B, subscription start/end d d, first creation Q,
+                    total duration d, per-type counts 5 x I
+    creation    19  user I, type B, created_at d, duration f, prompt H
+    preference  10  user I, background/expression prompt H H, model B, number_of_images B
+    watermark    7  user I, text H, position B
+
+plus array over-allocation (at most ~12%) when generated in-process; a
+mapped snapshot (dummy_snapshot) uses exactly these sizes, from the page
+cache. The per-type counts and total duration are a user's usage stats, so
+MockDatabase.usage_stats needs no pass over their creations. MockDatabase
+only turns rows into dicts when a record is read or written, so memory stays
+bounded by the columns plus the records a test actually touches.
+
+Creations are grouped by user, then by type, with created_at ascending inside
+each (user, type) run; a library page is a bisect per run plus a small merge.
+
+    python -m dummy_fixtures --users 1000000 --creations-per-user 10 --seed 42
+
+At startup dummy_endpoint loads a fixture when DUMMY_FIXTURE_USERS is set
+(with DUMMY_FIXTURE_SEED, DUMMY_FIXTURE_CREATIONS_PER_USER and
+DUMMY_FIXTURE_HEAVY_USERS).
+"""
+import argparse
+import bisect
+import hashlib
+import os
+import random
+import time
+from array import array
+from datetime import datetime
+
+from dummy_blobs import MEDIA_BUCKET, VIDEOS_BUCKET, bucket_url
+from dummy_db import CREATION_TYPES, creation_folder
+
+FIXTURE_EMAIL_DOMAIN = "@fixture.test"
+VIDEOS_URL = bucket_url(VIDEOS_BUCKET)
+MEDIA_URL = bucket_url(MEDIA_BUCKET)
+
+KIND_USER = 1
+KIND_CREATION = 2
+KIND_PREFERENCE = 3
+KIND_WATERMARK = 4
+
+TIERS = ["free", "basic", "premium", "enterprise"]
+MODELS = ["kling", "runway", "pika", "luma"]
+POSITIONS = ["bottom-right", "bottom-left", "top-right", "top-left", "center"]
+WATERMARK_TEXTS = ["Vidgencraft", "Made with Vidgencraft", "Draft", "Preview"]
+DURATIONS = [5.0, 8.0, 10.0, 15.0, 30.0]
+PROMPTS = [
+    "A beautiful sunset over mountains",
+    "Beach scene with waves",
+    "Forest sounds with birds",
+    "A beautiful sunrise over mountains with golden light",
+    "Birds flying across the clear blue sky",
+    "A flowing river through a lush green forest",
+    "City skyline at night with neon lights",
+    "Rain falling on a quiet street",
+    "A cat chasing a butterfly in a garden",
+    "Snow covered cabin in the woods",
+    "Indian holy music",
+    "Crowd cheering in a stadium",
+    "Ocean waves crashing on rocks",
+    "A happy scene showing beach",
+    "Peaceful scene with a lake",
+    "Thunderstorm over the desert",
+]
+# Relative frequency of each entry in CREATION_TYPES
+TYPE_WEIGHTS = [40, 30, 20, 5, 5]
+
+USER_COLUMNS = {
+    "credits": "q",
+    "tier": "B",
+    "subscription_start": "d",
+    "subscription_end": "d",
+    "creation_start": "Q",
+    "total_duration": "d",
+}
+CREATION_COLUMNS = {
+    "user": "I",
+    "type": "B",
+    "created_at": "d",
+    "duration": "f",
+    "prompt": "H",
+}
+PREFERENCE_COLUMNS = {
+    "user": "I",
+    "background_prompt": "H",
+    "expression_prompt": "H",
+    "model": "B",
+    "number_of_images": "B",
+}
+WATERMARK_COLUMNS = {
+    "user": "I",
+    "text": "H",
+    "position": "B",
+}
+
+
+def fixture_tag(seed):
+    return int.from_bytes(hashlib.blake2b(str(seed).encode(), digest_size=4).digest(), "big")
+
+
+class FixtureTable:
+    """Column store behind MockDatabase; see the module docstring for the layout."""
+
+    def __init__(self, tag, users, type_counts, creations, preferences, watermarks):
+        self.tag = tag
+        self.users = users
+        # Flat users x len(CREATION_TYPES); run (u, t) starts at
+        # users["creation_start"][u] + sum(type_counts[u*T : u*T+t])
+        self.type_counts = type_counts
+        self.creations = creations
+        self.preferences = preferences
+        self.watermarks = watermarks
+        self.user_count = len(users["credits"])
+        self.creation_count = len(creations["type"])
+        self.preference_count = len(preferences["user"])
+        self.watermark_count = len(watermarks["user"])
+        self._prefixes = {kind: f"{tag:08x}-{kind:04x}-4000-8000-" for kind in (1, 2, 3, 4)}
+        # Set by dummy_snapshot when the columns are views of a mapped file
+        self.mapping = None
+
+    # Ids and emails
+
+    def make_id(self, kind, row):
+        return f"{self._prefixes[kind]}{row:012x}"
+
+    def _row(self, kind, value, count):
+        prefix = self._prefixes[kind]
+        if len(value) != 36 or not value.startswith(prefix):
+            return None
+        try:
+            row = int(value[24:], 16)
+        except ValueError:
+            return None
+        return row if row < count else None
+
+    def user_email(self, row):
+        return f"user{row}{FIXTURE_EMAIL_DOMAIN}"
+
+    def user_row_by_email(self, email):
+        if not email.startswith("user") or not email.endswith(FIXTURE_EMAIL_DOMAIN):
+            return None
+        digits = email[4:-len(FIXTURE_EMAIL_DOMAIN)]
+        if not digits.isdigit() or str(int(digits)) != digits:
+            return None
+        row = int(digits)
+        return row if row < self.user_count else None
+
+    def user_row_by_id(self, user_id):
+        return self._row(KIND_USER, user_id, self.user_count)
+
+    def creation_row_by_id(self, creation_id):
+        return self._row(KIND_CREATION, creation_id, self.creation_count)
+
+    def preference_row_by_id(self, preference_id):
+        return self._row(KIND_PREFERENCE, preference_id, self.preference_count)
+
+    def watermark_row_by_id(self, watermark_id):
+        return self._row(KIND_WATERMARK, watermark_id, self.watermark_count)
+
+    # Rows as the dicts MockDatabase and the routes use
+
+    def user_dict(self, row):
+        users = self.users
+        return {
+            "id": self.make_id(KIND_USER, row),
+            "email": self.user_email(row),
+            "credits_remaining": users["credits"][row],
+            "subscription_tier": TIERS[users["tier"][row]],
+            "subscription_start_date": datetime.fromtimestamp(users["subscription_start"][row]),
+            "subscription_end_date": datetime.fromtimestamp(users["subscription_end"][row]),
+        }
+
+    def creation_key(self, row):
+        return (self.creations["created_at"][row], self.make_id(KIND_CREATION, row))
+
+    def creation_user_id(self, row):
+        return self.make_id(KIND_USER, self.creations["user"][row])
+
+    def creation_type(self, row):
+        return CREATION_TYPES[self.creations["type"][row]]
+
+    def creation_dict(self, row):
+        columns = self.creations
+        creation_id = self.make_id(KIND_CREATION, row)
+        creation_type = CREATION_TYPES[columns["type"][row]]
+        email = self.user_email(columns["user"][row])
+        folder = creation_folder(creation_type)
+        return {
+            "id": creation_id,
+            "type": creation_type,
+            "created_at": datetime.fromtimestamp(columns["created_at"][row]).isoformat(),
+            "url": f"{VIDEOS_URL}/{email}/{folder}/{creation_id}/output.mp4",
+            "thumbnail": f"{MEDIA_URL}/{email}/{folder}/{creation_id}/thumbnail.jpg",
+            "metadata": {
+                "prompt": PROMPTS[columns["prompt"][row]],
+                "duration": columns["duration"][row],
+            },
+        }
+
+    def preference_dict(self, row):
+        columns = self.preferences
+        preference_id = self.make_id(KIND_PREFERENCE, row)
+        # Image paths follow from the ids, in the layout the background and merge routes use
+        email = self.user_email(columns["user"][row])
+        return {
+            "id": preference_id,
+            "user_id": self.make_id(KIND_USER, columns["user"][row]),
+            "backgroundPrompt": PROMPTS[columns["background_prompt"][row]],
+            "expressionPrompt": PROMPTS[columns["expression_prompt"][row]],
+            "selectedBackground": f"{email}/backgrounds/{preference_id}/background.jpg",
+            "mergedImagePath": f"{email}/merged/{preference_id}/merged.jpg",
+            "selectedModel": MODELS[columns["model"][row]],
+            "numberOfImages": columns["number_of_images"][row],
+        }
+
+    def watermark_dict(self, row):
+        columns = self.watermarks
+        return {
+            "id": self.make_id(KIND_WATERMARK, row),
+            "user_id": self.make_id(KIND_USER, columns["user"][row]),
+            "watermark_text": WATERMARK_TEXTS[columns["text"][row]],
+            "watermark_position": POSITIONS[columns["position"][row]],
+        }
+
+    # Library pages
+
+    def user_type_counts(self, user_row):
+        width = len(CREATION_TYPES)
+        return self.type_counts[user_row * width:(user_row + 1) * width]
+
+    def type_range(self, user_row, type_code):
+        width = len(CREATION_TYPES)
+        counts = self.type_counts
+        start = self.users["creation_start"][user_row]
+        base = user_row * width
+        for code in range(type_code):
+            start += counts[base + code]
+        return start, start + counts[base + type_code]
+
+    def page(self, user_row, type_codes, before, limit, deleted):
+        """Up to `limit` (key, row) pairs per type older than `before`, newest first per type."""
+        created_at = self.creations["created_at"]
+        found = []
+        for type_code in type_codes:
+            start, end = self.type_range(user_row, type_code)
+            if start == end:
+                continue
+            if before is None:
+                position = end
+            else:
+                position = bisect.bisect_left(created_at, before[0], start, end)
+                # Equal timestamps are ordered by id, like CreationIndex keys
+                while position < end and self.creation_key(position) < before:
+                    position += 1
+            taken = 0
+            while position > start and taken < limit:
+                position -= 1
+                if position in deleted:
+                    continue
+                found.append((self.creation_key(position), position))
+                taken += 1
+        return found
+
+    def memory_bytes(self):
+        tables = {
+            "users": list(self.users.values()) + [self.type_counts],
+            "creations": list(self.creations.values()),
+            "preferences": list(self.preferences.values()),
+            "watermarks": list(self.watermarks.values()),
+        }
+        return {
+            name: sum(len(column) * column.itemsize for column in columns)
+            for name, columns in tables.items()
+        }
+
+
+def _columns(spec):
+    return {name: array(code) for name, code in spec.items()}
+
+
+def generate_fixture(users, creations_per_user=10, seed=0, heavy_users=0, heavy_user_creations=100_000,
+                     preferences_per_user=1, watermarks_per_user=0.5, epoch=1735689600.0, span_days=365):
+    """Build a FixtureTable; the same arguments always produce the same table."""
+    rng = random.Random(seed)
+    width = len(CREATION_TYPES)
+    span = span_days * 86400.0
+    prompt_count = len(PROMPTS)
+    type_choices = list(range(width))
+
+    user_columns = _columns(USER_COLUMNS)
+    creation_columns = _columns(CREATION_COLUMNS)
+    preference_columns = _columns(PREFERENCE_COLUMNS)
+    watermark_columns = _columns(WATERMARK_COLUMNS)
+    type_counts = array("I")
+
+    credits, tiers = user_columns["credits"], user_columns["tier"]
+    sub_start, sub_end = user_columns["subscription_start"], user_columns["subscription_end"]
+    creation_start, total_duration = user_columns["creation_start"], user_columns["total_duration"]
+    c_user, c_type = creation_columns["user"], creation_columns["type"]
+    c_created, c_duration, c_prompt = creation_columns["created_at"], creation_columns["duration"], creation_columns["prompt"]
+
+    for user_row in range(users):
+        started = epoch - rng.random() * span
+        credits.append(rng.randrange(0, 1000))
+        tiers.append(rng.randrange(len(TIERS)))
+        sub_start.append(started)
+        sub_end.append(started + 30 * 86400.0)
+        creation_start.append(len(c_type))
+
+        if user_row < heavy_users:
+            count = heavy_user_creations
+        else:
+            count = int(rng.expovariate(1.0 / creations_per_user)) if creations_per_user else 0
+        picked = rng.choices(type_choices, TYPE_WEIGHTS, k=count)
+        for type_code in type_choices:
+            run = picked.count(type_code)
+            type_counts.append(run)
+            if not run:
+                continue
+            # Strictly increasing timestamps inside each (user, type) run
+            step = (epoch - started) / (run + 1)
+            c_created.extend([started + step * (i + rng.random() * 0.5) for i in range(1, run + 1)])
+            c_user.extend([user_row] * run)
+            c_type.extend([type_code] * run)
+            c_duration.extend([DURATIONS[int(rng.random() * len(DURATIONS))] for _ in range(run)])
+            c_prompt.extend([int(rng.random() * prompt_count) for _ in range(run)])
+        total_duration.append(sum(c_duration[creation_start[-1]:]))
+
+        for _ in range(int(preferences_per_user + rng.random())):
+            preference_columns["user"].append(user_row)
+            preference_columns["background_prompt"].append(rng.randrange(prompt_count))
+            preference_columns["expression_prompt"].append(rng.randrange(prompt_count))
+            preference_columns["model"].append(rng.randrange(len(MODELS)))
+            preference_columns["number_of_images"].append(rng.randrange(1, 6))
+        for _ in range(int(watermarks_per_user + rng.random())):
+            watermark_columns["user"].append(user_row)
+            watermark_columns["text"].append(rng.randrange(len(WATERMARK_TEXTS)))
+            watermark_columns["position"].append(rng.randrange(len(POSITIONS)))
+
+    return FixtureTable(fixture_tag(seed), user_columns, type_counts, creation_columns,
+                        preference_columns, watermark_columns)
+
+
+def fixture_from_env(environ=os.environ):
+    users = environ.get("DUMMY_FIXTURE_USERS")
+    if not users:
+        return None
+    return generate_fixture(
+        int(users),
+        creations_per_user=float(environ.get("DUMMY_FIXTURE_CREATIONS_PER_USER", 10)),
+        seed=int(environ.get("DUMMY_FIXTURE_SEED", 0)),
+        heavy_users=int(environ.get("DUMMY_FIXTURE_HEAVY_USERS", 0)),
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--creations-per-user", type=float, default=10)
+    parser.add_argument("--heavy-users", type=int, default=0, help="users with --heavy-user-creations each")
+    parser.add_argument("--heavy-user-creations", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    table = generate_fixture(args.users, args.creations_per_user, args.seed,
+                             args.heavy_users, args.heavy_user_creations)
+    elapsed = time.perf_counter() - start
+    memory = table.memory_bytes()
+    counts = {
+        "users": table.user_count,
+        "creations": table.creation_count,
+        "preferences": table.preference_count,
+        "watermarks": table.watermark_count,
+    }
+    print(f"generated in {elapsed:.2f}s (seed {args.seed}, tag {table.tag:08x})")
+    for name, count in counts.items():
+        per_record = memory[name] / count if count else 0
+        print(f"  {name:12} {count:>12,} rows  {memory[name] / 2**20:10.1f} MiB  {per_record:6.1f} B/row")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+
+import dummy_timing
+
+# In-process job engine for the generation endpoints.
+#
+# Jobs wait in a bounded FIFO and run on a fixed number of worker tasks. A job
+# replays its frame script (the same frames the WebSocket routes send), spending
+# `duration` simulated seconds spread evenly between frames; waits go through
+# the job's dummy_timing.Pacing, so DUMMY_SPEED / ?speed= compress them too.
+# A job whose frames or listeners raise is marked failed and its followers get
+# a final "failed" frame; the worker moves on to the next job.
+#
+# DUMMY_JOB_WORKERS   concurrent jobs (default 4)
+# DUMMY_JOB_QUEUE     queued jobs before submit() raises QueueFull (default 1000)
+
+JOB_WORKERS_ENV = "DUMMY_JOB_WORKERS"
+JOB_QUEUE_ENV = "DUMMY_JOB_QUEUE"
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# Finished jobs kept for status polling before the oldest are forgotten
+MAX_FINISHED_JOBS = 100_000
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class DuplicateJob(Exception):
+    pass
+
+
+class Job:
+    __slots__ = (
+        "id", "kind", "user_id", "state", "progress", "duration", "frames", "pacing",
+        "result", "seq", "submitted_at", "started_at", "finished_at",
+    )
+
+    def __init__(self, job_id, kind, user_id, duration, frames, pacing, result):
+        self.id = job_id
+        self.kind = kind
+        self.user_id = user_id
+        self.state = QUEUED
+        self.progress = 0
+        self.duration = duration
+        self.frames = frames
+        self.pacing = pacing
+        self.result = result
+        self.seq = 0
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+
+
+class JobScheduler:
+    def __init__(self, concurrency=4, max_queue=1000):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.pending = deque()
+        self.active = {}
+        self.finished = OrderedDict()
+        self.listeners = []
+        self.submit_listeners = []
+        self.finish_listeners = []
+        # Optional lookup for jobs queued by other processes (dummy_shared.SharedJobs)
+        self.store = None
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.total_run = 0.0
+        # Sequence numbers give O(1) queue positions
+        self._next_seq = 0
+        self._started_seq = 0
+        self._loop = None
+        self._wakeup = None
+        self._workers = []
+
+    @classmethod
+    def from_env(cls):
+        return cls(int(os.environ.get(JOB_WORKERS_ENV, 4)), int(os.environ.get(JOB_QUEUE_ENV, 1000)))
+
+    def subscribe(self, listener):
+        """listener(job, frame, final) is called synchronously for every frame a job emits.
+
+        final is true for the job's last frame, and for the "failed" frame
+        sent instead when the job fails or is cancelled.
+        """
+        self.listeners.append(listener)
+
+    def on_submit(self, listener):
+        """listener(job) is called once a job has been queued."""
+        self.submit_listeners.append(listener)
+
+    def on_finish(self, listener):
+        """listener(job) is called once a job has completed or failed."""
+        self.finish_listeners.append(listener)
+
+    def _ensure_workers(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        # First submit, or the previous loop is gone (e.g. a test client per request)
+        for job in list(self.active.values()):
+            if job.state == RUNNING:
+                job.state = QUEUED
+                self.running -= 1
+                self.pending.appendleft(job)
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._workers = [loop.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    def submit(self, job_id, kind, user_id, duration, frames, pacing=None, result=None):
+        self._ensure_workers()
+        if job_id in self.active or job_id in self.finished:
+            raise DuplicateJob(f"job {job_id} already exists")
+        if len(self.pending) >= self.max_queue:
+            self.rejected += 1
+            raise QueueFull(f"job queue is full ({self.max_queue} queued)")
+        job = Job(job_id, kind, user_id, duration, frames, pacing or dummy_timing.server_pacing, result)
+        self._next_seq += 1
+        job.seq = self._next_seq
+        self.active[job_id] = job
+        self.pending.append(job)
+        self.submitted += 1
+        self._wakeup.set()
+        for listener in self.submit_listeners:
+            listener(job)
+        return job
+
+    def get(self, job_id):
+        job = self.active.get(job_id) or self.finished.get(job_id)
+        if job is None and self.store is not None:
+            job = self.store.get(job_id)
+        return job
+
+    def queue_position(self, job):
+        """1-based position among queued jobs, or None once the job has started."""
+        if job.state != QUEUED:
+            return None
+        if self.active.get(job.id) is not job:
+            return self.store.queue_position(job)
+        return max(1, job.seq - self._started_seq)
+
+    def _emit(self, job, frame, final):
+        for listener in self.listeners:
+            listener(job, frame, final)
+
+    def _fail(self, job, message):
+        job.state = FAILED
+        self.failed += 1
+        frame = {"status": FAILED, "message": message, "creation_id": job.id}
+        # Every listener gets the final frame, even if one of them is what failed
+        for listener in self.listeners:
+            try:
+                listener(job, frame, True)
+            except Exception:
+                logger.exception("job listener failed on the final frame of %s", job.id)
+
+    async def _worker(self):
+        while True:
+            while not self.pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            job = self.pending.popleft()
+            self._started_seq = max(self._started_seq, job.seq)
+            await self._run(job)
+
+    async def _run(self, job):
+        job.state = RUNNING
+        job.started_at = time.monotonic()
+        self.running += 1
+        frames = job.frames
+        last = len(frames) - 1
+        step = job.duration / max(1, last)
+        try:
+            for index, frame in enumerate(frames):
+                if index:
+                    await job.pacing.sleep(step)
+                job.progress = round(100 * index / max(1, last))
+                self._emit(job, frame, index == last)
+            job.state = COMPLETED
+            self.completed += 1
+        except asyncio.CancelledError:
+            self._fail(job, "Job cancelled")
+            raise
+        except Exception:
+            logger.exception("job %s failed", job.id)
+            self._fail(job, "Job failed")
+        finally:
+            self.running -= 1
+            job.finished_at = time.monotonic()
+            self.total_wait += job.started_at - job.submitted_at
+            self.total_run += job.finished_at - job.started_at
+            if self.active.get(job.id) is job:
+                del self.active[job.id]
+            self.finished[job.id] = job
+            while len(self.finished) > MAX_FINISHED_JOBS:
+                self.finished.popitem(last=False)
+            for listener in self.finish_listeners:
+                try:
+                    listener(job)
+                except Exception:
+                    logger.exception("job finish listener failed for %s", job.id)
+
+    async def stop(self):
+        workers, self._workers = self._workers, []
+        # Workers started on an earlier (now closed) loop can't be cancelled; they are already gone
+        if self._loop is asyncio.get_running_loop():
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        self._loop = None
+
+    def stats(self):
+        done = self.completed + self.failed
+        return {
+            "queue_depth": len(self.pending),
+            "running": self.running,
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(1000 * self.total_wait / done, 3) if done else None,
+            "avg_run_ms": round(1000 * self.total_run / done, 3) if done else None,
+        }
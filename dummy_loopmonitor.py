@@ -0,0 +1,166 @@
+import asyncio
+import gc
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+from dummy_profiler import stack_labels
+
+# Event loop lag and blocking-call detection.
+#
+# A heartbeat task sleeps for `interval` in a loop; how late it wakes up is the
+# event loop lag, i.e. how long ready callbacks wait their turn. On its own the
+# heartbeat only learns about a stall after it is over, when the culprit is
+# gone, so a watchdog thread also watches it: once the heartbeat is more than
+# `threshold` overdue, the watchdog reads the loop thread's stack with
+# sys._current_frames(), which shows the callback that is holding the loop at
+# that moment. One stack is captured per stall; when the heartbeat finally
+# runs, it fills in how long the stall lasted and how much of it was garbage
+# collection, which pauses whatever code happens to be allocating.
+#
+# Costs: one timer callback per interval on the loop, two clock reads per
+# garbage collection, and a thread that wakes every half threshold to compare
+# two floats. No stack is walked unless the loop is stuck.
+#
+# DUMMY_LOOP_MONITOR        "off" disables the monitor
+# DUMMY_LOOP_INTERVAL_MS    heartbeat interval (default 50)
+# DUMMY_BLOCKING_MS         stalls at least this long are flagged (default 100)
+# DUMMY_BLOCKING_CALLS      flagged stalls kept (default 50)
+
+LOOP_MONITOR_ENV = "DUMMY_LOOP_MONITOR"
+LOOP_INTERVAL_MS_ENV = "DUMMY_LOOP_INTERVAL_MS"
+BLOCKING_MS_ENV = "DUMMY_BLOCKING_MS"
+BLOCKING_CALLS_ENV = "DUMMY_BLOCKING_CALLS"
+
+# Lag samples kept for the windowed maximum (a minute at the default interval)
+LAG_WINDOW = 1200
+
+# Frames from here outwards are the event loop running a callback; leaving
+# them out makes a blocked-call stack start at the callback itself
+_CALLBACK_RUNNER = asyncio.events.Handle._run.__code__
+
+
+class LoopMonitor:
+    def __init__(self, interval_ms=50.0, threshold_ms=100.0, history=50, enabled=True):
+        self.interval = interval_ms / 1000.0
+        self.threshold = threshold_ms / 1000.0
+        self.enabled = enabled
+        self.lag = 0.0
+        self.recent = deque(maxlen=LAG_WINDOW)
+        self.blocked_calls = deque(maxlen=history)
+        self.ticks = 0
+        self.blocked = 0
+        self.blocked_seconds = 0.0
+        self.gc_seconds = 0.0
+        self._gc_start = None
+        # perf_counter time the heartbeat is due to wake up, None while it runs
+        self._due = None
+        # (due, entry) of the stall the watchdog captured last
+        self._stall = None
+        self._loop_thread = None
+        self._task = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            float(os.environ.get(LOOP_INTERVAL_MS_ENV, 50)),
+            float(os.environ.get(BLOCKING_MS_ENV, 100)),
+            int(os.environ.get(BLOCKING_CALLS_ENV, 50)),
+            os.environ.get(LOOP_MONITOR_ENV, "on").lower() not in ("0", "off", "false", "no"),
+        )
+
+    @property
+    def running(self):
+        return self._task is not None
+
+    def start(self):
+        """Start watching the running event loop."""
+        if not self.enabled or self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        gc.callbacks.append(self._on_gc)
+        self._thread = threading.Thread(target=self._watch, name="dummy-loop-monitor", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        task, self._task = self._task, None
+        thread, self._thread = self._thread, None
+        if task is not None:
+            gc.callbacks.remove(self._on_gc)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+        self._due = None
+
+    def _on_gc(self, phase, info):
+        if phase == "start":
+            self._gc_start = time.perf_counter()
+        elif self._gc_start is not None:
+            self.gc_seconds += time.perf_counter() - self._gc_start
+            self._gc_start = None
+
+    async def _heartbeat(self):
+        interval = self.interval
+        while True:
+            due = time.perf_counter() + interval
+            self._due = due
+            gc_seconds = self.gc_seconds
+            await asyncio.sleep(interval)
+            lag = max(0.0, time.perf_counter() - due)
+            self._due = None
+            self.ticks += 1
+            self.lag = lag
+            self.recent.append(lag)
+            if lag >= self.threshold:
+                self.blocked += 1
+                self.blocked_seconds += lag
+                stall = self._stall
+                if stall is not None and stall[0] == due:
+                    stall[1]["blocked_ms"] = round(lag * 1000, 3)
+                    stall[1]["gc_ms"] = round((self.gc_seconds - gc_seconds) * 1000, 3)
+
+    def _watch(self):
+        poll = min(self.interval, self.threshold) / 2
+        while not self._stop.wait(poll):
+            due = self._due
+            if due is None or time.perf_counter() - due < self.threshold:
+                continue
+            stall = self._stall
+            if stall is not None and stall[0] == due:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            entry = {
+                "at": time.time(),
+                # Filled in by the heartbeat when the loop gets going again
+                "blocked_ms": None,
+                "gc_ms": None,
+                "stack": stack_labels(frame, stop=_CALLBACK_RUNNER),
+            }
+            self._stall = (due, entry)
+            self.blocked_calls.append(entry)
+
+    def max_lag(self):
+        return max(self.recent, default=0.0)
+
+    def stats(self):
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "lag_ms": round(self.lag * 1000, 3),
+            "max_lag_ms": round(self.max_lag() * 1000, 3),
+            "ticks": self.ticks,
+            "blocked": self.blocked,
+            "blocked_seconds": round(self.blocked_seconds, 3),
+            "gc_seconds": round(self.gc_seconds, 3),
+        }
@@ -0,0 +1,416 @@
+import asyncio
+import functools
+import hashlib
+import importlib.util
+import io
+import math
+import os
+import struct
+import zlib
+
+from dummy_blobs import PNG_SIGNATURE, png_chunk
+
+# CPU-bound image work for /process_images and /merge_background.
+#
+# Pixels are computed with NumPy in a process pool, so the work uses every core
+# and never holds the event loop (or the GIL of the server process). A request
+# allocates its output canvas in shared memory; one task per input decodes and
+# scales an image straight into its box of that canvas, in parallel, and a last
+# task composites and encodes the canvas into a file. Only file paths and the
+# shared memory block's name cross the process boundary, never pixel arrays.
+#
+#   tile()   up to five images side by side, TILE_SIZE square each, as PNG
+#   merge()  the combined image alpha-blended over a background that covers
+#            MERGE_WIDTH x MERGE_HEIGHT, as JPEG (PNG without Pillow)
+#
+# At most `max_pending` renders are admitted at once; beyond that submit
+# raises MediaBusy and the routes answer 503, instead of queueing work that
+# would only finish after clients gave up.
+#
+# NumPy, Pillow and multiprocessing are imported by the functions that use
+# them, so importing this module (as the server does) costs none of them; the
+# pool's fork server loads NumPy once for all its workers.
+#
+# DUMMY_MEDIA_WORKERS   worker processes (default: CPU count; 0 runs the work on
+#                       threads in the server process)
+# DUMMY_MEDIA_QUEUE     renders admitted at once (default: twice the workers)
+
+MEDIA_WORKERS_ENV = "DUMMY_MEDIA_WORKERS"
+MEDIA_QUEUE_ENV = "DUMMY_MEDIA_QUEUE"
+
+TILE_SIZE = 512
+TILES_PER_ROW = 3
+MAX_TILES = 5
+MERGE_WIDTH = 1280
+MERGE_HEIGHT = 720
+# Undecodable inputs (no Pillow, unknown format, no bytes) become a synthetic picture this size
+SYNTHETIC_SIZE = 512
+PNG_LEVEL = 6
+JPEG_QUALITY = 90
+
+# Optional: without Pillow, PNGs are decoded here, other formats become a
+# synthetic picture, and merged images are written as PNG instead of JPEG
+HAVE_PIL = importlib.util.find_spec("PIL") is not None
+
+MERGE_FORMAT = "jpg" if HAVE_PIL else "png"
+
+# PNG color type -> channels (8-bit depth only)
+_PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+
+class MediaBusy(Exception):
+    pass
+
+
+def _unfilter_sequential(kind, row, prev, bpp):
+    """Undo the Average (3) or Paeth (4) filter, which depend on the pixel just decoded."""
+    out = bytearray(row)
+    for i in range(len(out)):
+        left = out[i - bpp] if i >= bpp else 0
+        up = prev[i]
+        if kind == 3:
+            out[i] = (out[i] + ((left + up) >> 1)) & 0xFF
+            continue
+        upper_left = prev[i - bpp] if i >= bpp else 0
+        estimate = left + up - upper_left
+        to_left, to_up, to_upper_left = abs(estimate - left), abs(estimate - up), abs(estimate - upper_left)
+        if to_left <= to_up and to_left <= to_upper_left:
+            predictor = left
+        elif to_up <= to_upper_left:
+            predictor = up
+        else:
+            predictor = upper_left
+        out[i] = (out[i] + predictor) & 0xFF
+    return out
+
+
+def decode_png(data):
+    """RGBA array of a non-interlaced 8-bit PNG; ValueError for anything else."""
+    import numpy as np
+
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError("not a PNG")
+    at = len(PNG_SIGNATURE)
+    header = None
+    palette = transparency = None
+    compressed = []
+    while at + 8 <= len(data):
+        length, chunk_type = struct.unpack_from(">I4s", data, at)
+        payload = data[at + 8:at + 8 + length]
+        at += 12 + length
+        if chunk_type == b"IHDR":
+            header = struct.unpack(">IIBBBBB", payload)
+        elif chunk_type == b"PLTE":
+            palette = payload
+        elif chunk_type == b"tRNS":
+            transparency = payload
+        elif chunk_type == b"IDAT":
+            compressed.append(payload)
+        elif chunk_type == b"IEND":
+            break
+    if header is None:
+        raise ValueError("PNG has no IHDR")
+    width, height, depth, color_type, _, _, interlace = header
+    channels = _PNG_CHANNELS.get(color_type)
+    if depth != 8 or channels is None or interlace:
+        raise ValueError("only non-interlaced 8-bit PNGs are supported")
+    stride = width * channels
+    rows = np.frombuffer(zlib.decompress(b"".join(compressed)), np.uint8)[:height * (stride + 1)]
+    rows = rows.reshape(height, stride + 1)
+    filters = rows[:, 0]
+    pixels = rows[:, 1:].copy()
+    if filters.any():
+        prev = np.zeros(stride, np.uint8)
+        for y, kind in enumerate(filters.tolist()):
+            row = pixels[y]
+            if kind == 1:
+                row[:] = np.cumsum(row.reshape(width, channels), axis=0, dtype=np.uint8).reshape(stride)
+            elif kind == 2:
+                row += prev
+            elif kind in (3, 4):
+                row[:] = np.frombuffer(_unfilter_sequential(kind, row.tobytes(), prev.tobytes(), channels), np.uint8)
+            elif kind:
+                raise ValueError(f"unknown PNG filter {kind}")
+            prev = row
+    pixels = pixels.reshape(height, width, channels)
+    if color_type == 3:
+        if palette is None:
+            raise ValueError("palette PNG has no PLTE")
+        table = np.full((256, 4), 255, np.uint8)
+        entries = np.frombuffer(palette, np.uint8).reshape(-1, 3)[:256]
+        table[:len(entries), :3] = entries
+        if transparency:
+            alpha = np.frombuffer(transparency, np.uint8)[:256]
+            table[:len(alpha), 3] = alpha
+        return table[pixels[..., 0]]
+    rgba = np.empty((height, width, 4), np.uint8)
+    if channels <= 2:
+        rgba[..., :3] = pixels[..., :1]
+    else:
+        rgba[..., :3] = pixels[..., :3]
+    rgba[..., 3] = pixels[..., -1] if channels in (2, 4) else 255
+    return rgba
+
+
+def encode_png(pixels, level=PNG_LEVEL):
+    """PNG of an RGBA or RGB array, every row Up-filtered (vectorized, and it helps zlib on photos)."""
+    import numpy as np
+
+    height, width, channels = pixels.shape
+    rows = pixels.reshape(height, width * channels)
+    filtered = np.empty((height, width * channels + 1), np.uint8)
+    filtered[:, 0] = 2
+    filtered[0, 1:] = rows[0]
+    np.subtract(rows[1:], rows[:-1], out=filtered[1:, 1:])
+    return (
+        PNG_SIGNATURE
+        + png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6 if channels == 4 else 2, 0, 0, 0))
+        + png_chunk(b"IDAT", zlib.compress(filtered.tobytes(), level))
+        + png_chunk(b"IEND", b"")
+    )
+
+
+def synthetic_image(data, size=SYNTHETIC_SIZE):
+    """Opaque gradient whose colors derive from the input bytes, standing in for an image we can't decode."""
+    import numpy as np
+
+    seed = hashlib.sha256(data[:4096]).digest()
+    ramp = np.arange(size, dtype=np.uint16) * 255 // max(1, size - 1)
+    rgba = np.empty((size, size, 4), np.uint8)
+    rgba[..., 0] = (ramp[None, :] + seed[0]) % 256
+    rgba[..., 1] = (ramp[:, None] + seed[1]) % 256
+    rgba[..., 2] = ((ramp[None, :] + ramp[:, None]) // 2 + seed[2]) % 256
+    rgba[..., 3] = 255
+    return rgba
+
+
+def decode_image(data):
+    if HAVE_PIL and data:
+        import numpy as np
+        from PIL import Image
+
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                return np.asarray(image.convert("RGBA"))
+        except (OSError, ValueError):
+            pass
+    if data.startswith(PNG_SIGNATURE):
+        try:
+            return decode_png(data)
+        except (ValueError, zlib.error, struct.error):
+            pass
+    return synthetic_image(data)
+
+
+def resize_nearest(pixels, height, width):
+    import numpy as np
+
+    rows = np.arange(height) * pixels.shape[0] // height
+    columns = np.arange(width) * pixels.shape[1] // width
+    return pixels[rows[:, None], columns]
+
+
+def render_into(path, canvas_name, canvas_shape, box, cover=False):
+    """Decode the image at path into box (top, left, height, width) of a shared-memory canvas.
+
+    The image keeps its aspect ratio: it fits inside the box, centered, or
+    with cover=True fills the box and is cropped to it.
+    """
+    from multiprocessing import shared_memory
+
+    import numpy as np
+
+    data = b""
+    if path is not None:
+        with open(path, "rb") as file:
+            data = file.read()
+    pixels = decode_image(data)
+    top, left, box_height, box_width = box
+    source_height, source_width = pixels.shape[:2]
+    scale = (max if cover else min)(box_height / source_height, box_width / source_width)
+    height = max(1, round(source_height * scale))
+    width = max(1, round(source_width * scale))
+    scaled = resize_nearest(pixels, height, width)
+    if cover:
+        y, x = (height - box_height) // 2, (width - box_width) // 2
+        scaled = scaled[y:y + box_height, x:x + box_width]
+        height, width = box_height, box_width
+    top += (box_height - height) // 2
+    left += (box_width - width) // 2
+    block = shared_memory.SharedMemory(name=canvas_name)
+    try:
+        canvas = np.ndarray(canvas_shape, np.uint8, buffer=block.buf)
+        canvas[top:top + height, left:left + width] = scaled
+        del canvas
+    finally:
+        block.close()
+
+
+def composite_to_file(layer_names, shape, out_path, image_format):
+    """Blend each shared-memory layer over the previous ones and write the result; returns (sha256, size)."""
+    from multiprocessing import shared_memory
+
+    import numpy as np
+
+    blocks = [shared_memory.SharedMemory(name=name) for name in layer_names]
+    try:
+        layers = [np.ndarray(shape, np.uint8, buffer=block.buf) for block in blocks]
+        result = layers[0].copy()
+        del layers[0]
+        while layers:
+            # Straight-alpha "over": out = fg * a + bg * (1 - a), alpha likewise
+            top = layers.pop(0).astype(np.float32) / 255
+            bottom = result.astype(np.float32) / 255
+            top_alpha = top[..., 3:]
+            alpha = top_alpha + bottom[..., 3:] * (1 - top_alpha)
+            color = top[..., :3] * top_alpha + bottom[..., :3] * bottom[..., 3:] * (1 - top_alpha)
+            np.divide(color, alpha, out=color, where=alpha > 0)
+            result[..., :3] = np.rint(color * 255)
+            result[..., 3:] = np.rint(alpha * 255)
+            del top, bottom
+    finally:
+        for block in blocks:
+            block.close()
+    if image_format == "jpg":
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.fromarray(result[..., :3]).save(buffer, "JPEG", quality=JPEG_QUALITY)
+        encoded = buffer.getvalue()
+    else:
+        encoded = encode_png(result)
+    with open(out_path, "wb") as file:
+        file.write(encoded)
+    return hashlib.sha256(encoded).hexdigest(), len(encoded)
+
+
+def tile_layout(count, size=TILE_SIZE):
+    """Canvas (height, width) and the box of each of count tiles, TILES_PER_ROW to a row."""
+    columns = min(count, TILES_PER_ROW)
+    rows = math.ceil(count / columns)
+    boxes = [((index // columns) * size, (index % columns) * size, size, size) for index in range(count)]
+    return (rows * size, columns * size), boxes
+
+
+class MediaPool:
+    def __init__(self, workers=None, max_pending=None):
+        self.workers = os.cpu_count() or 1 if workers is None else workers
+        self.max_pending = max_pending or 2 * max(1, self.workers)
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._executor = None
+        self._starting = None
+
+    @classmethod
+    def from_env(cls):
+        workers = os.environ.get(MEDIA_WORKERS_ENV)
+        return cls(None if workers is None else int(workers), int(os.environ.get(MEDIA_QUEUE_ENV, 0)) or None)
+
+    def _start_workers(self):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        methods = multiprocessing.get_all_start_methods()
+        # Forking a server with running threads is unsafe. The fork server
+        # imports the main module (which, as with any multiprocessing
+        # program, must guard its entry point) and this one once; workers
+        # forked from it start without importing either again
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        if context.get_start_method() == "forkserver":
+            context.set_forkserver_preload(["__main__", __name__, "numpy"])
+        executor = ProcessPoolExecutor(self.workers, mp_context=context)
+        # Workers are started on demand, by whoever submits; start them all now
+        for future in [executor.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+        self._executor = executor
+
+    async def start(self):
+        """Start the worker processes on a thread: starting them blocks for as long as an import of the main module."""
+        if not self.workers or self._executor is not None:
+            return
+        if self._starting is None:
+            self._starting = asyncio.get_running_loop().run_in_executor(None, self._start_workers)
+            # Cleared when the start finishes, not when an awaiter leaves: a
+            # cancelled awaiter must not let a second start begin meanwhile
+            self._starting.add_done_callback(self._started)
+        await asyncio.shield(self._starting)
+
+    def _started(self, future):
+        if self._starting is future:
+            self._starting = None
+        if not future.cancelled():
+            # Marks a failure as retrieved when every awaiter was cancelled
+            future.exception()
+
+    async def _call(self, fn, *args, **kwargs):
+        from concurrent.futures.process import BrokenProcessPool
+
+        await self.start()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, functools.partial(fn, *args, **kwargs))
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); start a fresh pool next time
+            self._executor = None
+            raise
+
+    async def _render(self, layers, shape, out_path, image_format):
+        """layers: per canvas, the (path, box, cover) inputs drawn into it. Returns (sha256, size)."""
+        from multiprocessing import shared_memory
+
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise MediaBusy(f"image workers are busy ({self.pending} renders in progress)")
+        self.pending += 1
+        blocks = []
+        try:
+            for _ in layers:
+                # New shared memory is zero-filled, i.e. transparent
+                blocks.append(shared_memory.SharedMemory(create=True, size=math.prod(shape)))
+            await asyncio.gather(*(
+                self._call(render_into, path, block.name, shape, box, cover)
+                for block, inputs in zip(blocks, layers) for path, box, cover in inputs
+            ))
+            result = await self._call(composite_to_file, [block.name for block in blocks], shape, out_path,
+                                      image_format)
+            self.completed += 1
+            return result
+        except BaseException:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    async def tile(self, paths, out_path, size=TILE_SIZE):
+        """Tile up to MAX_TILES images (None: no bytes) into a PNG at out_path; returns (sha256, size)."""
+        (height, width), boxes = tile_layout(len(paths), size)
+        inputs = [(path, box, False) for path, box in zip(paths, boxes)]
+        return await self._render([inputs], (height, width, 4), out_path, "png")
+
+    async def merge(self, background_path, foreground_path, out_path):
+        """Alpha-blend the foreground over a cropped-to-fit background; returns (sha256, size)."""
+        box = (0, 0, MERGE_HEIGHT, MERGE_WIDTH)
+        return await self._render([[(background_path, box, True)], [(foreground_path, box, False)]],
+                                  (MERGE_HEIGHT, MERGE_WIDTH, 4), out_path, MERGE_FORMAT)
+
+    def shutdown(self):
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            # Joined: a pool started moments before shutdown could otherwise
+            # leave its workers behind when the process exits on a signal
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,163 @@
+import bisect
+import os
+import time
+
+# Prometheus text-format metrics for the dummy server.
+#
+# MetricsMiddleware times every HTTP request and records it under its route
+# template (not the raw path, so /library/<id> is one series; requests that
+# match no route share "unmatched"). Recording is a few dict lookups, a bisect
+# and integer increments on the event loop thread, with no lock: nothing else
+# writes these counters, and a scrape only reads them.
+#
+# Values that other components already track (WebSocket connections, job
+# queue depth, ...) are read when /metrics is scraped, through register().
+#
+# DUMMY_METRICS   "off" makes the middleware a pass-through
+
+# Latency histogram bucket upper bounds in seconds
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Response size histogram bucket upper bounds in bytes
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+
+METRICS_ENV = "DUMMY_METRICS"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+UNMATCHED = "unmatched"
+
+
+class RouteStats:
+    __slots__ = ("durations", "duration_sum", "sizes", "size_sum", "statuses")
+
+    def __init__(self):
+        # One slot per bucket plus +Inf; cumulated when rendered
+        self.durations = [0] * (len(DURATION_BUCKETS) + 1)
+        self.duration_sum = 0.0
+        self.sizes = [0] * (len(SIZE_BUCKETS) + 1)
+        self.size_sum = 0
+        self.statuses = {}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class RequestMetrics:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        # (method, route template) -> RouteStats
+        self.routes = {}
+        self.in_flight = 0
+        # name -> (kind, help, fn returning a number or {labels tuple: number})
+        self.scraped = {}
+
+    @classmethod
+    def from_env(cls):
+        return cls(os.environ.get(METRICS_ENV, "on").lower() not in ("0", "off", "false", "no"))
+
+    def observe(self, method, route, status, seconds, size):
+        key = (method, route)
+        stats = self.routes.get(key)
+        if stats is None:
+            stats = self.routes[key] = RouteStats()
+        stats.durations[bisect.bisect_left(DURATION_BUCKETS, seconds)] += 1
+        stats.duration_sum += seconds
+        stats.sizes[bisect.bisect_left(SIZE_BUCKETS, size)] += 1
+        stats.size_sum += size
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+    def register(self, name, help, fn, kind="gauge"):
+        """fn() is called per scrape; it returns a value, or {((label, value), ...): value} for labelled series."""
+        self.scraped[name] = (kind, help, fn)
+
+    def _histogram(self, lines, name, bounds, series):
+        # labels is the already escaped label list of a series, without braces
+        bucket_labels = [f'le="{bound}"' for bound in bounds + ("+Inf",)]
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(bucket_labels, counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{{{labels},{bound}}} {cumulative}")
+            lines.append(f"{name}_sum{{{labels}}} {_number(total)}")
+            lines.append(f"{name}_count{{{labels}}} {cumulative}")
+
+    def render(self):
+        lines = []
+        # Route labels are escaped once per render, not once per line
+        routes = [(_labels((("method", method), ("route", route)))[1:-1], stats)
+                  for (method, route), stats in sorted(self.routes.items())]
+        lines.append("# HELP http_requests_total HTTP requests by route template and status code.")
+        lines.append("# TYPE http_requests_total counter")
+        for labels, stats in routes:
+            for status, count in sorted(stats.statuses.items()):
+                lines.append(f'http_requests_total{{{labels},status="{status}"}} {count}')
+        lines.append("# HELP http_request_duration_seconds Time from request start to the last response byte.")
+        lines.append("# TYPE http_request_duration_seconds histogram")
+        self._histogram(lines, "http_request_duration_seconds", DURATION_BUCKETS, [
+            (labels, stats.durations, stats.duration_sum) for labels, stats in routes
+        ])
+        lines.append("# HELP http_response_size_bytes Response body size.")
+        lines.append("# TYPE http_response_size_bytes histogram")
+        self._histogram(lines, "http_response_size_bytes", SIZE_BUCKETS, [
+            (labels, stats.sizes, stats.size_sum) for labels, stats in routes
+        ])
+        lines.append("# HELP http_requests_in_flight HTTP requests being handled, including this scrape.")
+        lines.append("# TYPE http_requests_in_flight gauge")
+        lines.append(f"http_requests_in_flight {self.in_flight}")
+        for name, (kind, help, fn) in self.scraped.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            value = fn()
+            if isinstance(value, dict):
+                for labels, sample in value.items():
+                    lines.append(f"{name}{_labels(labels)} {_number(sample)}")
+            else:
+                lines.append(f"{name} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording every HTTP request into a RequestMetrics."""
+
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        metrics = self.metrics
+        if scope["type"] != "http" or not metrics.enabled:
+            return await self.app(scope, receive, send)
+        status = 500
+        size = 0
+
+        async def send_counted(message):
+            nonlocal status, size
+            kind = message["type"]
+            if kind == "http.response.body":
+                size += len(message.get("body", b""))
+            elif kind == "http.response.start":
+                status = message["status"]
+            elif kind == "http.response.zerocopysend":
+                size += message.get("count") or 0
+            await send(message)
+
+        metrics.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_counted)
+        finally:
+            metrics.in_flight -= 1
+            route = scope.get("route")
+            metrics.observe(scope["method"], getattr(route, "path", UNMATCHED), status, time.perf_counter() - start, size)
@@ -0,0 +1,254 @@
+import contextvars
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+from fastapi.routing import APIRoute
+
+# Where does a slow request spend its time? Two tools behind the /admin routes:
+#
+# Slow-request capture. TimingMiddleware starts a RequestTiming per HTTP
+# request in a context variable; TimedRoute (the router's route_class) marks
+# when the route handler starts and when the endpoint runs, and the auth
+# dependency, multipart parser and JSON encoder add their own stages. Requests
+# slower than the threshold land in a ring buffer with a breakdown into
+# exclusive stages (they add up to the total):
+#
+#   routing     middleware and routing before the route handler
+#   auth        bearer token check
+#   validation  body parsing and pydantic validation of the parameters
+#   handler     the endpoint itself, minus the stages below
+#   multipart   multipart parsing (CPU only; waiting for the body is handler)
+#   serialize   JSON encoding of the response
+#   send        sending the response (all of it, for streams)
+#
+# Sampling profiler. While active, a daemon thread reads the event loop
+# thread's stack every interval via sys._current_frames() and counts collapsed
+# stacks ("outer;...;inner count" lines, the input of flamegraph.pl and
+# speedscope). It costs nothing when off; when on, one stack walk per sample.
+#
+# DUMMY_SLOW_REQUEST_MS   capture requests slower than this (default 100)
+# DUMMY_SLOW_REQUESTS     requests kept in the ring buffer (default 200)
+
+SLOW_REQUEST_MS_ENV = "DUMMY_SLOW_REQUEST_MS"
+SLOW_REQUESTS_ENV = "DUMMY_SLOW_REQUESTS"
+
+STAGES = ("routing", "auth", "validation", "handler", "multipart", "serialize", "send")
+# Stages that happen while the endpoint runs, and come out of its time
+NESTED_STAGES = ("multipart", "serialize")
+
+current_timing = contextvars.ContextVar("current_timing", default=None)
+
+
+class RequestTiming:
+    __slots__ = ("start", "route_start", "endpoint_start", "endpoint_end", "route_end", "stages", "status")
+
+    def __init__(self, start):
+        self.start = start
+        self.route_start = None
+        self.endpoint_start = None
+        self.endpoint_end = None
+        self.route_end = None
+        self.stages = {}
+        self.status = None
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def breakdown(self, end):
+        stages = dict.fromkeys(STAGES, 0.0)
+        stages.update(self.stages)
+        if self.route_start is None:
+            # Answered before routing (rate limiter, 404)
+            stages["routing"] = end - self.start
+            return stages
+        route_end = self.route_end or end
+        stages["routing"] = self.route_start - self.start
+        stages["send"] = end - route_end
+        if self.endpoint_start is None:
+            # Rejected while resolving dependencies (401, 422)
+            stages["validation"] = route_end - self.route_start - stages["auth"]
+            return stages
+        endpoint_end = self.endpoint_end or route_end
+        stages["validation"] = self.endpoint_start - self.route_start - stages["auth"]
+        nested = sum(stages[name] for name in NESTED_STAGES)
+        stages["handler"] = max(0.0, endpoint_end - self.endpoint_start - nested)
+        # Response serialization FastAPI does after the endpoint returns
+        stages["serialize"] += route_end - endpoint_end
+        return stages
+
+
+def record_stage(stage, seconds):
+    """Add time to a stage of the current request, if it is being timed."""
+    timing = current_timing.get()
+    if timing is not None:
+        timing.add(stage, seconds)
+
+
+class SlowRequestLog:
+    def __init__(self, threshold_ms=100.0, size=200):
+        self.threshold = threshold_ms / 1000.0
+        self.entries = deque(maxlen=size)
+        self.timed = 0
+        self.captured = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(float(os.environ.get(SLOW_REQUEST_MS_ENV, 100)), int(os.environ.get(SLOW_REQUESTS_ENV, 200)))
+
+    def finish(self, scope, timing, end):
+        self.timed += 1
+        total = end - timing.start
+        if total < self.threshold:
+            return
+        self.captured += 1
+        route = scope.get("route")
+        self.entries.append({
+            "at": time.time(),
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": getattr(route, "path", None),
+            "status": timing.status,
+            "total_ms": round(total * 1000, 3),
+            "stages_ms": {stage: round(seconds * 1000, 3) for stage, seconds in timing.breakdown(end).items()},
+        })
+
+    def slowest(self, limit=None):
+        return sorted(self.entries, key=lambda entry: entry["total_ms"], reverse=True)[:limit]
+
+
+class TimingMiddleware:
+    """Pure ASGI middleware giving every HTTP request a RequestTiming."""
+
+    def __init__(self, app, log):
+        self.app = app
+        self.log = log
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        timing = RequestTiming(time.perf_counter())
+
+        async def send_timed(message):
+            if message["type"] == "http.response.start":
+                timing.status = message["status"]
+            await send(message)
+
+        token = current_timing.set(timing)
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            current_timing.reset(token)
+            self.log.finish(scope, timing, time.perf_counter())
+
+
+def _timed_endpoint(endpoint):
+    @functools.wraps(endpoint)
+    async def timed(*args, **kwargs):
+        timing = current_timing.get()
+        if timing is None:
+            return await endpoint(*args, **kwargs)
+        timing.endpoint_start = time.perf_counter()
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            timing.endpoint_end = time.perf_counter()
+
+    return timed
+
+
+class TimedRoute(APIRoute):
+    """APIRoute that marks route handler and endpoint boundaries on the current RequestTiming."""
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            timing = current_timing.get()
+            if timing is None:
+                return await handler(request)
+            timing.route_start = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                timing.route_end = time.perf_counter()
+
+        return timed_handler
+
+
+# code object -> "function (file.py:line)"
+_frame_labels = {}
+
+
+def _frame_label(code):
+    label = _frame_labels.get(code)
+    if label is None:
+        label = _frame_labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return label
+
+
+def stack_labels(frame, stop=None):
+    """Labels of frame and its callers, outermost first; stop is a code object whose frame and callers are left out."""
+    labels = []
+    while frame is not None and frame.f_code is not stop:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+class SamplingProfiler:
+    """Samples one thread's stack (or all threads') from a daemon thread while active."""
+
+    def __init__(self):
+        self.stacks = Counter()
+        self.samples = 0
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self, interval=0.005, thread_id=None):
+        """Sample thread_id (None: every thread but the sampler) each interval seconds."""
+        if self._thread is not None:
+            raise RuntimeError("profiler is already running")
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval, thread_id), name="dummy-profiler",
+                                         daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+        return self.stacks
+
+    def _run(self, interval, thread_id):
+        own = threading.get_ident()
+        names = {}
+        stacks = self.stacks
+        while not self._stop.wait(interval):
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (thread_id is not None and ident != thread_id):
+                    continue
+                labels = stack_labels(frame)
+                if thread_id is None:
+                    if ident not in names:
+                        names.update((thread.ident, thread.name) for thread in threading.enumerate())
+                    labels.insert(0, names.get(ident, str(ident)))
+                stacks[";".join(labels)] += 1
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
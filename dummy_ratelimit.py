@@ -0,0 +1,188 @@
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+
+from dummy_responses import JSONResponse
+
+# Token-bucket rate limiting, so clients can be tested against 429s.
+#
+# Every request to a limited route group takes one token from the bucket of
+# (caller, group). A bucket holds up to `burst` tokens and refills at `rate`
+# per second; an empty bucket answers 429 with Retry-After (WebSocket
+# handshakes are accepted and then closed with 1013, "try again later").
+# Callers are the token's user, or the client address for anonymous requests,
+# and their limits come from the user's subscription_tier.
+#
+# Buckets live in an OrderedDict in least-recently-used order. Each call looks
+# at the oldest couple of buckets and drops them once they have refilled, which
+# loses nothing since a full bucket is what a new caller gets anyway; past
+# max_buckets the oldest go regardless. Memory stays bounded with millions of
+# distinct callers and no sweeper task.
+#
+# DUMMY_RATE_LIMIT          "off" disables the middleware
+# DUMMY_RATE_LIMITS         JSON overrides, {"tier": {"group": [rate, burst]}}
+# DUMMY_RATE_LIMIT_BUCKETS  buckets kept at most (default 1000000)
+
+RATE_LIMIT_ENV = "DUMMY_RATE_LIMIT"
+RATE_LIMITS_ENV = "DUMMY_RATE_LIMITS"
+RATE_LIMIT_BUCKETS_ENV = "DUMMY_RATE_LIMIT_BUCKETS"
+
+AUTH = "auth"
+GENERATION = "generation"
+LIBRARY = "library"
+STATUS = "status"
+
+# First path segment (second after /api) -> group; other routes are not limited
+ROUTE_GROUPS = {
+    AUTH: ["/signup", "/login", "/logout", "/verify-token", "/forgot-password", "/verify-otp", "/reset-password",
+           "/auth"],
+    GENERATION: ["/text-segmentor", "/process_images", "/upload_custom_background", "/generate_ai_background",
+                 "/colorize-image", "/merge_background", "/generate_prompt", "/generate_video_thread", "/watermark",
+                 "/movie", "/api/video", "/api/upload_video", "/api/generate_audio"],
+    LIBRARY: ["/library", "/character", "/save_preferences", "/referral", "/api/get_s3_file"],
+    STATUS: ["/api/status", "/api/audio_status", "/api/jobs", "/api/get_output_video", "/api/extract_audio",
+             "/credits", "/events", "/ws", "/text-to-video", "/api/ws", "/api/events"],
+}
+GROUP_BY_PREFIX = {prefix: group for group, prefixes in ROUTE_GROUPS.items() for prefix in prefixes}
+
+# (tokens per second, burst) for the free tier; other tiers scale both
+BASE_LIMITS = {
+    AUTH: (2.0, 20),
+    GENERATION: (1.0, 10),
+    LIBRARY: (10.0, 50),
+    STATUS: (20.0, 100),
+}
+TIER_MULTIPLIERS = {
+    "anonymous": 0.5,
+    "free": 1,
+    "basic": 2,
+    "premium": 5,
+    "enterprise": 20,
+}
+
+# Buckets looked at for eviction per call; more than the one a call can add
+EVICT_PER_CALL = 2
+
+
+def group_for(path):
+    first, _, rest = path[1:].partition("/")
+    if first == "api":
+        return GROUP_BY_PREFIX.get("/api/" + rest.partition("/")[0])
+    return GROUP_BY_PREFIX.get("/" + first)
+
+
+def default_limits():
+    return {
+        tier: {group: (rate * factor, max(1, round(burst * factor))) for group, (rate, burst) in BASE_LIMITS.items()}
+        for tier, factor in TIER_MULTIPLIERS.items()
+    }
+
+
+class RateLimiter:
+    def __init__(self, limits=None, max_buckets=1_000_000, enabled=True):
+        # tier -> group -> (rate, burst)
+        self.limits = limits or default_limits()
+        self.max_buckets = max_buckets
+        self.enabled = enabled
+        # (caller, group) -> [tokens, updated, full_at]
+        self.buckets = OrderedDict()
+        self.allowed = 0
+        self.limited = 0
+        self.evicted = 0
+
+    @classmethod
+    def from_env(cls):
+        limits = default_limits()
+        overrides = os.environ.get(RATE_LIMITS_ENV)
+        if overrides:
+            for tier, groups in json.loads(overrides).items():
+                tier_limits = limits.setdefault(tier, dict(limits["free"]))
+                for group, (rate, burst) in groups.items():
+                    tier_limits[group] = (float(rate), int(burst))
+        return cls(
+            limits,
+            int(os.environ.get(RATE_LIMIT_BUCKETS_ENV, 1_000_000)),
+            os.environ.get(RATE_LIMIT_ENV, "on").lower() not in ("0", "off", "false", "no"),
+        )
+
+    def acquire(self, caller, tier, group, now=None):
+        """Take a token; returns 0.0, or the seconds until one is available when the bucket is empty."""
+        rate, burst = (self.limits.get(tier) or self.limits["free"])[group]
+        now = time.monotonic() if now is None else now
+        key = (caller, group)
+        buckets = self.buckets
+        bucket = buckets.get(key)
+        if bucket is None:
+            tokens = burst
+        else:
+            buckets.move_to_end(key)
+            tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+        # Lazy eviction from the least recently used end
+        for _ in range(EVICT_PER_CALL):
+            if not buckets:
+                break
+            oldest, state = next(iter(buckets.items()))
+            if oldest == key or (state[2] > now and len(buckets) < self.max_buckets):
+                break
+            del buckets[oldest]
+            self.evicted += 1
+        if tokens < 1:
+            bucket[0] = tokens
+            bucket[1] = now
+            self.limited += 1
+            return (1 - tokens) / rate
+        tokens -= 1
+        full_at = now + (burst - tokens) / rate
+        if bucket is None:
+            buckets[key] = [tokens, now, full_at]
+        else:
+            bucket[0] = tokens
+            bucket[1] = now
+            bucket[2] = full_at
+        self.allowed += 1
+        return 0.0
+
+    def stats(self):
+        return {"buckets": len(self.buckets), "allowed": self.allowed, "limited": self.limited,
+                "evicted": self.evicted}
+
+
+def limited_response(group, wait):
+    """The 429 for a request whose bucket is empty for another `wait` seconds."""
+    retry_after = max(1, math.ceil(wait))
+    return JSONResponse({
+        "status": "error",
+        "message": f"Rate limit exceeded for {group} requests",
+        "retry_after": retry_after
+    }, status_code=429, headers={"Retry-After": str(retry_after)})
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware; identify(scope) returns (caller, subscription tier)."""
+
+    def __init__(self, app, limiter, identify):
+        self.app = app
+        self.limiter = limiter
+        self.identify = identify
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket") or not self.limiter.enabled:
+            return await self.app(scope, receive, send)
+        group = group_for(scope["path"])
+        if group is None:
+            return await self.app(scope, receive, send)
+        caller, tier = self.identify(scope)
+        wait = self.limiter.acquire(caller, tier, group)
+        if not wait:
+            return await self.app(scope, receive, send)
+        if scope["type"] == "websocket":
+            # A close before accept reaches the client as a plain HTTP 403,
+            # so accept first to deliver the 1013 close code
+            message = await receive()
+            if message["type"] == "websocket.connect":
+                await send({"type": "websocket.accept"})
+                await send({"type": "websocket.close", "code": 1013, "reason": "rate limit exceeded"})
+            return
+        await limited_response(group, wait)(scope, receive, send)
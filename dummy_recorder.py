@@ -0,0 +1,190 @@
+import atexit
+import base64
+import json
+import os
+import queue
+import threading
+import time
+from urllib.parse import unquote_plus
+
+# Traffic capture in the JSONL format benchmarks.replay plays back.
+#
+# RecordMiddleware hands every finished HTTP request to a TrafficRecorder as a
+# dict; the recorder's writer thread turns those into JSON lines and appends
+# them to the capture file in batches. The event loop never touches the file or
+# encodes JSON, and when the disk can't keep up, records beyond `max_pending`
+# are dropped and counted instead of piling up in memory. One line per request:
+#
+#   {"t": 12.5031, "method": "POST", "path": "/login?next=1",
+#    "headers": [["content-type", "application/json"], ...],
+#    "body": "{...}", "status": 200, "ms": 3.2}
+#
+# "t" is the arrival time in seconds since the first recorded request, so the
+# inter-arrival time of a request is the difference to the previous line's.
+# Lines are written as responses finish, so a slow request can land after one
+# that arrived later. Bodies that aren't UTF-8 are stored as "body_b64";
+# bodies over `max_body` bytes are cut short and marked "truncated".
+# Credentials are never written: Authorization and cookie headers are left
+# out, the value of a ?token= query parameter is replaced with "redacted", and
+# the bodies of the routes that carry passwords or one-time codes are dropped
+# and the line marked "redacted".
+#
+# DUMMY_RECORD              capture file to append to; unset disables recording
+# DUMMY_RECORD_MAX_BODY     request body bytes kept per request (default 1 MiB)
+
+RECORD_ENV = "DUMMY_RECORD"
+RECORD_MAX_BODY_ENV = "DUMMY_RECORD_MAX_BODY"
+
+SECRET_HEADERS = {b"authorization", b"cookie"}
+SECRET_PARAMS = {"token"}
+SECRET_BODY_PATHS = {"/signup", "/login", "/verify-otp", "/reset-password"}
+# Seconds the writer thread waits before writing what it has collected
+FLUSH_INTERVAL = 0.5
+
+
+def redact_query(query_string):
+    """The query string with the values of SECRET_PARAMS replaced."""
+    parts = []
+    for part in query_string.split(b"&"):
+        name, _, _ = part.partition(b"=")
+        if unquote_plus(name.decode("latin-1")) in SECRET_PARAMS:
+            part = name + b"=redacted"
+        parts.append(part)
+    return b"&".join(parts)
+
+
+def capture_line(record):
+    body = record.pop("body", b"")
+    if body:
+        try:
+            record["body"] = body.decode()
+        except UnicodeDecodeError:
+            record["body_b64"] = base64.b64encode(body).decode()
+    return json.dumps(record, separators=(",", ":")) + "\n"
+
+
+class TrafficRecorder:
+    def __init__(self, path, max_body=2**20, max_pending=100_000):
+        self.path = path
+        self.max_body = max_body
+        self.records = queue.Queue(max_pending)
+        # Arrival time of the first recorded request
+        self.started = None
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+        self._thread = None
+        self._closed = threading.Event()
+
+    @classmethod
+    def from_env(cls):
+        """None unless DUMMY_RECORD names a capture file."""
+        path = os.environ.get(RECORD_ENV)
+        if not path:
+            return None
+        return cls(path, int(os.environ.get(RECORD_MAX_BODY_ENV, 2**20)))
+
+    def record(self, record):
+        """Queue one request for writing; never blocks."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._write, name="dummy-recorder", daemon=True)
+            self._thread.start()
+            # Apps run without a lifespan (test clients, the benchmarks) still get everything written
+            atexit.register(self.close)
+        try:
+            self.records.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        self.recorded += 1
+
+    def _write(self):
+        with open(self.path, "a", encoding="utf-8") as file:
+            while True:
+                try:
+                    batch = [self.records.get(timeout=FLUSH_INTERVAL)]
+                except queue.Empty:
+                    if self._closed.is_set():
+                        return
+                    continue
+                while True:
+                    try:
+                        batch.append(self.records.get_nowait())
+                    except queue.Empty:
+                        break
+                file.writelines(capture_line(record) for record in batch)
+                file.flush()
+                self.written += len(batch)
+
+    def close(self):
+        """Write out what is queued and stop the writer thread."""
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._closed.set()
+            thread.join()
+            self._closed.clear()
+
+    def stats(self):
+        return {"recorded": self.recorded, "written": self.written, "dropped": self.dropped}
+
+
+class RecordMiddleware:
+    """Pure ASGI middleware passing every HTTP request to a TrafficRecorder."""
+
+    def __init__(self, app, recorder):
+        self.app = app
+        self.recorder = recorder
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        recorder = self.recorder
+        start = time.monotonic()
+        if recorder.started is None:
+            recorder.started = start
+        chunks = []
+        kept = 0
+        truncated = False
+        redacted = scope["path"] in SECRET_BODY_PATHS
+        status = 500
+
+        async def receive_recorded():
+            nonlocal kept, truncated
+            message = await receive()
+            if message["type"] == "http.request" and not redacted:
+                body = message.get("body", b"")
+                if kept + len(body) > recorder.max_body:
+                    truncated = True
+                    body = body[:recorder.max_body - kept]
+                if body:
+                    chunks.append(body)
+                    kept += len(body)
+            return message
+
+        async def send_recorded(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive_recorded, send_recorded)
+        finally:
+            path = scope["path"]
+            if scope["query_string"]:
+                path += "?" + redact_query(scope["query_string"]).decode("latin-1")
+            record = {
+                "t": round(start - recorder.started, 4),
+                "method": scope["method"],
+                "path": path,
+                "headers": [[name.decode("latin-1"), value.decode("latin-1")]
+                            for name, value in scope["headers"] if name not in SECRET_HEADERS],
+                "body": b"".join(chunks),
+                "status": status,
+                "ms": round((time.monotonic() - start) * 1000, 3),
+            }
+            if truncated:
+                record["truncated"] = True
+            if redacted:
+                record["redacted"] = True
+            recorder.record(record)
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import time
+
+from starlette import responses
+
+from dummy_profiler import record_stage
+
+# JSON serialization shared by every HTTP response and WebSocket frame.
+#
+# DUMMY_JSON_BACKEND picks the encoder: "auto" (default) uses orjson, then
+# msgspec, then the stdlib, whichever imports first. All backends produce
+# compact UTF-8 JSON like starlette's JSONResponse; orjson writes NaN as null
+# where the stdlib would raise.
+
+JSON_BACKEND_ENV = "DUMMY_JSON_BACKEND"
+
+
+def _stdlib_dumps(content):
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def _orjson_dumps():
+    import orjson
+
+    return orjson.dumps
+
+
+def _msgspec_dumps():
+    import msgspec
+
+    return msgspec.json.Encoder().encode
+
+
+BACKENDS = {
+    "orjson": _orjson_dumps,
+    "msgspec": _msgspec_dumps,
+    "json": lambda: _stdlib_dumps,
+}
+
+
+def available_backends():
+    names = []
+    for name, load in BACKENDS.items():
+        try:
+            load()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def set_backend(name="auto"):
+    """Switch the encoder used by render_json, render_text and JSONResponse."""
+    global backend, _dumps
+    candidates = ["orjson", "msgspec", "json"] if name == "auto" else [name]
+    for candidate in candidates:
+        if candidate not in BACKENDS:
+            raise ValueError(f"unknown JSON backend {candidate!r}, expected one of {sorted(BACKENDS)} or 'auto'")
+        try:
+            _dumps = BACKENDS[candidate]()
+        except ImportError:
+            if name != "auto":
+                raise
+            continue
+        backend = candidate
+        return backend
+
+
+backend = None
+_dumps = _stdlib_dumps
+set_backend(os.environ.get(JSON_BACKEND_ENV) or "auto")
+
+
+def render_json(content):
+    return _dumps(content)
+
+
+class JSONResponse(responses.JSONResponse):
+    def render(self, content):
+        started = time.perf_counter()
+        body = _dumps(content)
+        record_stage("serialize", time.perf_counter() - started)
+        return body
+
+
+def render_text(frame):
+    # WebSocket text frame payload, like WebSocket.send_json, but through the selected encoder
+    return _dumps(frame).decode("utf-8")
+
+
+# Precomputed responses for routes whose body never changes. The body is
+# serialized once at import, so the hot path does no dict construction or JSON
+# encoding, and clients revalidating with If-None-Match get a bodyless 304.
+
+
+class RawResponse(responses.Response):
+    """Response with a prebuilt body and header list; skips render/init_headers."""
+
+    def __init__(self, status_code, body, raw_headers):
+        self.status_code = status_code
+        self.body = body
+        self.raw_headers = raw_headers
+        self.background = None
+
+
+def etag_matches(if_none_match, etag):
+    if if_none_match.strip() == b"*":
+        return True
+    for candidate in if_none_match.split(b","):
+        candidate = candidate.strip()
+        if candidate.startswith(b"W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class PrecomputedJSON:
+    def __init__(self, content, status_code=200):
+        self.status_code = status_code
+        self.body = render_json(content)
+        self.etag = b'"' + hashlib.blake2b(self.body, digest_size=12).hexdigest().encode("ascii") + b'"'
+        self._headers = (
+            (b"content-length", str(len(self.body)).encode("latin-1")),
+            (b"content-type", b"application/json"),
+            (b"etag", self.etag),
+            (b"cache-control", b"no-cache"),
+        )
+        self._not_modified_headers = (
+            (b"etag", self.etag),
+            (b"cache-control", b"no-cache"),
+        )
+
+    def response(self, request):
+        # Scan the raw ASGI headers rather than building request.headers
+        for name, value in request.scope["headers"]:
+            if name == b"if-none-match":
+                if etag_matches(value, self.etag):
+                    return RawResponse(304, b"", list(self._not_modified_headers))
+                break
+        # Middleware (CORS) appends to raw_headers, so each response gets its own list
+        return RawResponse(self.status_code, self.body, list(self._headers))
@@ -0,0 +1,669 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+from dummy_credits import CHECKOUT_CREDITS, CreditLedger, InsufficientCredits
+from dummy_db import MockDatabase, new_user
+from dummy_jobs import MAX_FINISHED_JOBS, QUEUED, Job
+
+# State shared by the worker processes of a multi-worker run.
+#
+#   python -m dummy_shared --workers 4 --port 8001
+#
+# starts uvicorn with N worker processes (no reload) after pointing
+# DUMMY_SHARED_STATE at one SQLite file. Each worker then keeps in that file,
+# instead of in its own memory:
+#
+#   - MockDatabase: users (credits in their own column, so debits are one
+#     atomic UPDATE), creations with their per-user order and usage totals,
+#     preferences, watermarks, generations and deleted fixture rows
+#   - the credit ledger's reservations and checkout sessions
+#   - the status of every generation job, so /api/status answers on any worker
+#   - the blob index, so an object uploaded or rendered on one worker is
+#     served, and read by the image routes, on all of them (the object files
+#     are in DUMMY_BLOB_DIR, which the workers share already)
+#   - an append-only event log carrying job progress frames and logouts to the
+#     other workers, which poll it every DUMMY_SHARED_POLL_MS and hand frames to
+#     their own WebSocket/SSE subscribers and revocations to their token cache
+#
+# The database runs in WAL mode: readers never wait, and writers queue on one
+# lock that a statement or transaction usually holds for microseconds. The
+# calls are synchronous and stay on the event loop, so waiting for that lock
+# stalls the whole worker: a write blocks the loop for at most BUSY_TIMEOUT,
+# then fails with "database is locked" (a 500 for that request) rather than
+# stalling longer. The event poll is a read and does not wait for writers.
+# Jobs still run on the worker that accepted them, and the rate limiter,
+# metrics, profiler and loop monitor remain per worker.
+#
+# DUMMY_SHARED_STATE      SQLite file shared by the workers; unset keeps all
+#                         state in process memory (single worker)
+# DUMMY_SHARED_POLL_MS    how often a worker picks up other workers' events
+#                         (default 20)
+
+SHARED_STATE_ENV = "DUMMY_SHARED_STATE"
+SHARED_POLL_ENV = "DUMMY_SHARED_POLL_MS"
+
+# Seconds a write waits for another worker's write lock, blocking the event
+# loop meanwhile; the longest stall shared state can cause
+BUSY_TIMEOUT = 0.25
+# Creating the schema happens once per worker, before it serves requests
+SCHEMA_BUSY_TIMEOUT = 10.0
+# Events older than this are deleted; a worker that stalls longer misses them
+EVENT_RETENTION = 60.0
+# Seconds between clean-ups of old events, finished jobs and expired revocations
+PRUNE_INTERVAL = 5.0
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    email TEXT PRIMARY KEY, credits INTEGER NOT NULL, data BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS records (
+    kind TEXT NOT NULL, id TEXT NOT NULL, data BLOB NOT NULL, PRIMARY KEY (kind, id)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS creation_keys (
+    id TEXT PRIMARY KEY, user_id TEXT NOT NULL, type TEXT NOT NULL, created_at REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS creation_keys_by_user ON creation_keys (user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS creation_keys_by_type ON creation_keys (user_id, type, created_at, id);
+CREATE TABLE IF NOT EXISTS deleted_base (row INTEGER PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS usage (
+    user_id TEXT NOT NULL, type TEXT NOT NULL, count INTEGER NOT NULL, duration REAL NOT NULL,
+    PRIMARY KEY (user_id, type)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS reservations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, email TEXT NOT NULL, amount INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS reservations_by_email ON reservations (email);
+CREATE TABLE IF NOT EXISTS checkouts (
+    session_id TEXT PRIMARY KEY, email TEXT NOT NULL, credits INTEGER, granted INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY, kind TEXT, user_id TEXT, state TEXT NOT NULL, progress INTEGER NOT NULL,
+    result TEXT, worker INTEGER NOT NULL, seq INTEGER NOT NULL, finished_at REAL);
+CREATE INDEX IF NOT EXISTS jobs_queued ON jobs (worker, state, seq);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, origin INTEGER NOT NULL, at REAL NOT NULL,
+    kind TEXT NOT NULL, body TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS revoked (jti TEXT PRIMARY KEY, exp REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS blobs (
+    bucket TEXT NOT NULL, key TEXT NOT NULL, digest TEXT NOT NULL, size INTEGER NOT NULL,
+    content_type TEXT NOT NULL, PRIMARY KEY (bucket, key)) WITHOUT ROWID;
+"""
+
+
+def _dump(value):
+    return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+class SharedState:
+    """One SQLite database in WAL mode, with a connection per thread."""
+
+    def __init__(self, path, poll_interval=0.02):
+        self.path = path
+        self.poll_interval = poll_interval
+        # Origin of the events this process writes
+        self.worker = os.getpid()
+        self._local = threading.local()
+
+    @classmethod
+    def from_env(cls):
+        """None unless DUMMY_SHARED_STATE names a database file."""
+        path = os.environ.get(SHARED_STATE_ENV)
+        if not path:
+            return None
+        state = cls(path, float(os.environ.get(SHARED_POLL_ENV, 20)) / 1000)
+        state.initialize()
+        return state
+
+    @property
+    def db(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # Only multi-worker runs get here, so single-process servers don't import sqlite3
+            import sqlite3
+
+            # Autocommit; multi-statement changes go through transaction()
+            connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def execute(self, sql, params=()):
+        return self.db.execute(sql, params)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """BEGIN IMMEDIATE: takes the write lock up front, so reads inside see no interleaved writes."""
+        db = self.db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def initialize(self):
+        db = self.db
+        # Workers start together and all run the schema script
+        db.execute(f"PRAGMA busy_timeout = {int(SCHEMA_BUSY_TIMEOUT * 1000)}")
+        try:
+            db.executescript(SCHEMA)
+        finally:
+            db.execute(f"PRAGMA busy_timeout = {int(BUSY_TIMEOUT * 1000)}")
+
+    def is_empty(self):
+        return self.execute("SELECT 1 FROM users LIMIT 1").fetchone() is None
+
+
+class SharedRecords:
+    """The dict interface MockDatabase uses for creations, preferences, watermarks and generations."""
+
+    def __init__(self, state, kind):
+        self.state = state
+        self.kind = kind
+
+    def get(self, key, default=None):
+        row = self.state.execute("SELECT data FROM records WHERE kind = ? AND id = ?", (self.kind, key)).fetchone()
+        return default if row is None else pickle.loads(row[0])
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.state.execute("INSERT OR REPLACE INTO records (kind, id, data) VALUES (?, ?, ?)",
+                           (self.kind, key, _dump(value)))
+
+    def __contains__(self, key):
+        return self.state.execute("SELECT 1 FROM records WHERE kind = ? AND id = ?", (self.kind, key)).fetchone() is not None
+
+    def pop(self, key, default=None):
+        # DELETE ... RETURNING: of two workers popping the same key, one gets it
+        rows = self.state.execute("DELETE FROM records WHERE kind = ? AND id = ? RETURNING data",
+                                  (self.kind, key)).fetchall()
+        return pickle.loads(rows[0][0]) if rows else default
+
+    def __len__(self):
+        return self.state.execute("SELECT COUNT(*) FROM records WHERE kind = ?", (self.kind,)).fetchone()[0]
+
+    def items(self):
+        for key, data in self.state.execute("SELECT id, data FROM records WHERE kind = ?", (self.kind,)):
+            yield key, pickle.loads(data)
+
+
+class SharedRowSet:
+    """Set of deleted fixture rows, as FixtureTable.page() and MockDatabase test them."""
+
+    def __init__(self, state):
+        self.state = state
+
+    def __contains__(self, row):
+        return self.state.execute("SELECT 1 FROM deleted_base WHERE row = ?", (row,)).fetchone() is not None
+
+    def add(self, row):
+        self.state.execute("INSERT OR IGNORE INTO deleted_base (row) VALUES (?)", (row,))
+
+    def __iter__(self):
+        return (row for row, in self.state.execute("SELECT row FROM deleted_base"))
+
+    def __len__(self):
+        return self.state.execute("SELECT COUNT(*) FROM deleted_base").fetchone()[0]
+
+
+class SharedBlobIndex:
+    """BlobStore.index: (bucket, key) -> (digest, size, content_type)."""
+
+    def __init__(self, state):
+        self.state = state
+
+    def get(self, key, default=None):
+        row = self.state.execute("SELECT digest, size, content_type FROM blobs WHERE bucket = ? AND key = ?",
+                                 key).fetchone()
+        return default if row is None else tuple(row)
+
+    def __setitem__(self, key, entry):
+        self.state.execute("INSERT OR REPLACE INTO blobs (bucket, key, digest, size, content_type) VALUES (?, ?, ?, ?, ?)",
+                           (*key, *entry))
+
+    def __len__(self):
+        return self.state.execute("SELECT COUNT(*) FROM blobs").fetchone()[0]
+
+    def values(self):
+        return (tuple(row) for row in self.state.execute("SELECT digest, size, content_type FROM blobs"))
+
+
+class SharedDatabase(MockDatabase):
+    """MockDatabase whose overlay lives in SQLite; the fixture base layer stays in (shared) memory."""
+
+    def __init__(self, state):
+        super().__init__()
+        self.state = state
+        for user in self.users.values():
+            self._insert_user(user)
+        # Kept in SQLite instead
+        self.users = self.libraries = self._creation_keys = self.usage = None
+        self.creations = SharedRecords(state, "creation")
+        self.preferences = SharedRecords(state, "preferences")
+        self.watermarks = SharedRecords(state, "watermark")
+        self.generations = SharedRecords(state, "generation")
+        self._deleted_base = SharedRowSet(state)
+
+    def attach_base(self, table):
+        # Rows other workers deleted stay deleted
+        self.base = table
+
+    def _insert_user(self, user):
+        data = {name: value for name, value in user.items() if name != "credits_remaining"}
+        self.state.execute("INSERT OR IGNORE INTO users (email, credits, data) VALUES (?, ?, ?)",
+                           (user["email"], user["credits_remaining"], _dump(data)))
+
+    def overlay_state(self):
+        return {
+            "users": {email: self._user(credits, data)
+                      for email, credits, data in self.state.execute("SELECT email, credits, data FROM users")},
+            "creations": dict(self.creations.items()),
+            "creation_keys": {
+                creation_id: ((created_at, creation_id), user_id)
+                for creation_id, user_id, created_at in self.state.execute(
+                    "SELECT id, user_id, created_at FROM creation_keys")
+            },
+            "preferences": dict(self.preferences.items()),
+            "watermarks": dict(self.watermarks.items()),
+            "generations": dict(self.generations.items()),
+            "deleted_base": sorted(self._deleted_base),
+            "usage": self._all_usage(),
+        }
+
+    def _all_usage(self):
+        usage = {}
+        for user_id, creation_type, count, duration in self.state.execute(
+                "SELECT user_id, type, count, duration FROM usage"):
+            usage.setdefault(user_id, {})[creation_type] = [count, duration]
+        return usage
+
+    def restore_overlay_state(self, state):
+        with self.state.transaction() as db:
+            for table in ("users", "records", "creation_keys", "deleted_base", "usage"):
+                db.execute(f"DELETE FROM {table}")
+            for user in state["users"].values():
+                self._insert_user(user)
+            for kind, records in (("creation", state["creations"]), ("preferences", state["preferences"]),
+                                  ("watermark", state["watermarks"]), ("generation", state["generations"])):
+                db.executemany("INSERT INTO records (kind, id, data) VALUES (?, ?, ?)",
+                               ((kind, key, _dump(value)) for key, value in records.items()))
+            db.executemany("INSERT INTO creation_keys (id, user_id, type, created_at) VALUES (?, ?, ?, ?)", (
+                (creation_id, user_id, state["creations"][creation_id]["type"], key[0])
+                for creation_id, (key, user_id) in state["creation_keys"].items()
+            ))
+            db.executemany("INSERT INTO deleted_base (row) VALUES (?)", ((row,) for row in state["deleted_base"]))
+            db.executemany("INSERT INTO usage (user_id, type, count, duration) VALUES (?, ?, ?, ?)", (
+                (user_id, creation_type, count, duration)
+                for user_id, totals in state["usage"].items()
+                for creation_type, (count, duration) in totals.items()
+            ))
+
+    @staticmethod
+    def _user(credits, data):
+        user = pickle.loads(data)
+        user["credits_remaining"] = credits
+        return user
+
+    def get_user_by_email(self, email):
+        row = self.state.execute("SELECT credits, data FROM users WHERE email = ?", (email,)).fetchone()
+        if row is not None:
+            return self._user(*row)
+        if self.base is None:
+            return None
+        base_row = self.base.user_row_by_email(email)
+        if base_row is None:
+            return None
+        # Materialized on first access so that credit updates have a row to change
+        self._insert_user(self.base.user_dict(base_row))
+        return self.get_user_by_email(email)
+
+    def create_user(self, email, password_hash=None):
+        # Of two workers signing up the same address, the first one wins
+        self._insert_user(new_user(email, password_hash))
+        return self.get_user_by_email(email)
+
+    def update_user(self, email, data):
+        with self.state.transaction() as db:
+            row = db.execute("SELECT credits, data FROM users WHERE email = ?", (email,)).fetchone()
+            if row is None:
+                return False
+            user = self._user(*row)
+            user.update(data)
+            credits = user.pop("credits_remaining")
+            db.execute("UPDATE users SET credits = ?, data = ? WHERE email = ?", (credits, _dump(user), email))
+        return True
+
+    @staticmethod
+    def _add_usage(db, user_id, creation_type, count, duration):
+        db.execute("INSERT INTO usage (user_id, type, count, duration) VALUES (?, ?, ?, ?) "
+                   "ON CONFLICT (user_id, type) DO UPDATE "
+                   "SET count = count + excluded.count, duration = duration + excluded.duration",
+                   (user_id, creation_type, count, duration))
+
+    # Each index change and its usage update are one transaction, and only the
+    # worker whose statement changed a row counts it, so totals stay exact when
+    # two workers add or delete the same creation
+    def _index_creation(self, key, user_id, creation_type, duration):
+        with self.state.transaction() as db:
+            added = db.execute("INSERT OR IGNORE INTO creation_keys (id, user_id, type, created_at) VALUES (?, ?, ?, ?)",
+                               (key[1], user_id, creation_type, key[0])).rowcount
+            if added:
+                self._add_usage(db, user_id, creation_type, 1, duration)
+
+    def _unindex_creation(self, creation_id, creation_type, duration):
+        with self.state.transaction() as db:
+            removed = db.execute("DELETE FROM creation_keys WHERE id = ? RETURNING user_id", (creation_id,)).fetchall()
+            if removed:
+                self._add_usage(db, removed[0][0], creation_type, -1, -duration)
+
+    def _delete_base_creation(self, row):
+        with self.state.transaction() as db:
+            if db.execute("INSERT OR IGNORE INTO deleted_base (row) VALUES (?)", (row,)).rowcount:
+                self._add_usage(db, self.base.creation_user_id(row), self.base.creation_type(row), -1,
+                                -self.base.creations["duration"][row])
+
+    def _creation_user(self, creation_id):
+        row = self.state.execute("SELECT user_id FROM creation_keys WHERE id = ?", (creation_id,)).fetchone()
+        return None if row is None else row[0]
+
+    def _overlay_usage(self, user_id):
+        return {creation_type: (count, duration) for creation_type, count, duration in self.state.execute(
+            "SELECT type, count, duration FROM usage WHERE user_id = ?", (user_id,))}
+
+    def _creation_page(self, user_id, creation_type, before, limit):
+        sql = "SELECT created_at, id FROM creation_keys WHERE user_id = ?"
+        params = [user_id]
+        if creation_type is not None:
+            sql += " AND type = ?"
+            params.append(creation_type)
+        if before is not None:
+            sql += " AND (created_at, id) < (?, ?)"
+            params += before
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+        return [tuple(key) for key in self.state.execute(sql, params)]
+
+
+class SharedCreditLedger(CreditLedger):
+    """CreditLedger on the users table: each balance change is one UPDATE with its own check.
+
+    The counters (committed, released, ...) stay per worker.
+    """
+
+    def __init__(self, state):
+        super().__init__()
+        self.state = state
+
+    def _debit(self, db, user, amount):
+        rows = db.execute("UPDATE users SET credits = credits - ? WHERE email = ? AND credits >= ? RETURNING credits",
+                          (amount, user["email"], amount)).fetchall()
+        if not rows:
+            self.rejected += 1
+            balance = db.execute("SELECT credits FROM users WHERE email = ?", (user["email"],)).fetchone()
+            raise InsufficientCredits(balance[0] if balance else 0, amount)
+        user["credits_remaining"] = rows[0][0]
+
+    def reserve(self, user, amount):
+        with self.state.transaction() as db:
+            self._debit(db, user, amount)
+            return db.execute("INSERT INTO reservations (email, amount) VALUES (?, ?)",
+                              (user["email"], amount)).lastrowid
+
+    def commit(self, reservation):
+        (_, amount), = self.state.execute("DELETE FROM reservations WHERE id = ? RETURNING email, amount",
+                                          (reservation,)).fetchall()
+        self.committed += amount
+        return amount
+
+    def release(self, reservation):
+        with self.state.transaction() as db:
+            (email, amount), = db.execute("DELETE FROM reservations WHERE id = ? RETURNING email, amount",
+                                          (reservation,)).fetchall()
+            db.execute("UPDATE users SET credits = credits + ? WHERE email = ?", (amount, email))
+        self.released += amount
+        return amount
+
+    def charge(self, user, amount):
+        self._debit(self.state.db, user, amount)
+        self.committed += amount
+        return amount
+
+    def open_checkout(self, session_id, email, credits=CHECKOUT_CREDITS):
+        self.state.execute("INSERT OR REPLACE INTO checkouts (session_id, email, credits, granted) VALUES (?, ?, ?, 0)",
+                           (session_id, email, credits))
+
+    def checkout_owner(self, session_id):
+        row = self.state.execute("SELECT email FROM checkouts WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else None
+
+    def complete_checkout(self, session_id, user):
+        with self.state.transaction() as db:
+            row = db.execute("SELECT credits, granted FROM checkouts WHERE session_id = ?", (session_id,)).fetchone()
+            if row is None:
+                raise KeyError(session_id)
+            amount, done = row
+            if done:
+                self.duplicate_grants += 1
+                return 0
+            db.execute("UPDATE checkouts SET granted = 1 WHERE session_id = ?", (session_id,))
+            (user["credits_remaining"],), = db.execute(
+                "UPDATE users SET credits = credits + ? WHERE email = ? RETURNING credits", (amount, user["email"])
+            ).fetchall()
+        self.granted += amount
+        return amount
+
+    def held(self, email):
+        return self.state.execute("SELECT COALESCE(SUM(amount), 0) FROM reservations WHERE email = ?",
+                                  (email,)).fetchone()[0]
+
+    def total_held(self):
+        return self.state.execute("SELECT COALESCE(SUM(amount), 0) FROM reservations").fetchone()[0]
+
+    def stats(self):
+        return {
+            **super().stats(),
+            "open_reservations": self.state.execute("SELECT COUNT(*) FROM reservations").fetchone()[0],
+        }
+
+
+class SharedJob(Job):
+    """A job another worker runs, as read back from the jobs table."""
+
+    __slots__ = ("worker",)
+
+
+class SharedJobs:
+    """Mirrors a JobScheduler's jobs into the jobs table and answers for jobs it doesn't run."""
+
+    def __init__(self, state):
+        self.state = state
+
+    def attach(self, scheduler):
+        scheduler.store = self
+        scheduler.on_submit(self._submitted)
+        scheduler.subscribe(self._progressed)
+        scheduler.on_finish(self._finished)
+
+    def _submitted(self, job):
+        self.state.execute(
+            "INSERT OR REPLACE INTO jobs (id, kind, user_id, state, progress, result, worker, seq, finished_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, NULL)",
+            (job.id, job.kind, job.user_id, job.state, job.progress, job.result, self.state.worker, job.seq))
+
+    def _progressed(self, job, frame, final):
+        self.state.execute("UPDATE jobs SET state = ?, progress = ? WHERE id = ?", (job.state, job.progress, job.id))
+
+    def _finished(self, job):
+        self.state.execute("UPDATE jobs SET state = ?, progress = ?, finished_at = ? WHERE id = ?",
+                           (job.state, job.progress, time.time(), job.id))
+
+    def get(self, job_id):
+        row = self.state.execute("SELECT kind, user_id, state, progress, result, worker, seq FROM jobs WHERE id = ?",
+                                 (job_id,)).fetchone()
+        if row is None:
+            return None
+        kind, user_id, state, progress, result, worker, seq = row
+        job = SharedJob(job_id, kind, user_id, None, (), None, result)
+        job.state = state
+        job.progress = progress
+        job.worker = worker
+        job.seq = seq
+        return job
+
+    def queue_position(self, job):
+        return self.state.execute("SELECT COUNT(*) FROM jobs WHERE worker = ? AND state = ? AND seq <= ?",
+                                  (job.worker, QUEUED, job.seq)).fetchone()[0] or None
+
+    def prune(self):
+        # Like JobScheduler.finished, remember the newest MAX_FINISHED_JOBS finished jobs
+        self.state.execute(
+            "DELETE FROM jobs WHERE finished_at < "
+            "(SELECT finished_at FROM jobs WHERE finished_at IS NOT NULL ORDER BY finished_at DESC LIMIT 1 OFFSET ?)",
+            (MAX_FINISHED_JOBS,))
+
+
+class SharedEvents:
+    """Relays job frames and token revocations between workers through the events table."""
+
+    def __init__(self, state, manager, auth, jobs=None):
+        self.state = state
+        self.manager = manager
+        self.auth = auth
+        self.jobs = jobs
+        self.last_id = state.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+        # Logouts that happened before this worker started
+        now = time.time()
+        auth.revoked.update(state.execute("SELECT jti, exp FROM revoked WHERE exp > ?", (now,)))
+        self.relayed = 0
+        self._task = None
+        self._pruned_at = 0.0
+
+    def _append(self, kind, body):
+        self.state.execute("INSERT INTO events (origin, at, kind, body) VALUES (?, ?, ?, ?)",
+                           (self.state.worker, time.time(), kind, json.dumps(body, separators=(",", ":"))))
+
+    def publish_job_frame(self, job, frame, final):
+        """JobScheduler listener; this worker's own subscribers get the frame from dummy_endpoint directly."""
+        self._append("frame", [list(job_topic(job)), frame, final])
+
+    def revoke(self, claims):
+        # Only the token's id is stored or published, never the token itself
+        self.state.execute("INSERT OR REPLACE INTO revoked (jti, exp) VALUES (?, ?)", (claims.get("jti"), claims["exp"]))
+        self._append("revoke", [claims.get("jti"), claims["exp"]])
+
+    def poll(self):
+        rows = self.state.execute("SELECT id, origin, kind, body FROM events WHERE id > ? ORDER BY id",
+                                  (self.last_id,)).fetchall()
+        for event_id, origin, kind, body in rows:
+            self.last_id = event_id
+            if origin == self.state.worker:
+                continue
+            self.relayed += 1
+            if kind == "frame":
+                topic, frame, final = json.loads(body)
+                self.manager.publish(tuple(topic), frame, final)
+            elif kind == "revoke":
+                jti, exp = json.loads(body)
+                self.auth.revoke_id(jti, exp)
+        now = time.monotonic()
+        if now - self._pruned_at >= PRUNE_INTERVAL:
+            self._pruned_at = now
+            self.prune()
+
+    def prune(self):
+        now = time.time()
+        self.state.execute("DELETE FROM events WHERE at < ?", (now - EVENT_RETENTION,))
+        self.state.execute("DELETE FROM revoked WHERE exp <= ?", (now,))
+        if self.jobs is not None:
+            self.jobs.prune()
+
+    async def _run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception:
+                # A busy database or a failing subscriber must not stop the relay for good;
+                # last_id is already past the event that failed, so it isn't retried
+                logger.exception("shared event poll failed")
+            await asyncio.sleep(self.state.poll_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+def job_topic(job):
+    """ConnectionManager topic the frames of a job are published under."""
+    return job.user_id, job.id
+
+
+def base_table():
+    """The fixture base layer a worker attaches, from DUMMY_SNAPSHOT or the DUMMY_FIXTURE_* settings."""
+    from dummy_fixtures import fixture_from_env
+    from dummy_snapshot import SNAPSHOT_ENV, map_snapshot
+
+    snapshot_path = os.environ.get(SNAPSHOT_ENV)
+    if snapshot_path and os.path.exists(snapshot_path):
+        return map_snapshot(snapshot_path)[0]
+    return fixture_from_env()
+
+
+def main(argv=None):
+    from dummy_snapshot import SAVE_ON_EXIT_ENV, SNAPSHOT_ENV, map_snapshot, save_snapshot
+
+    parser = argparse.ArgumentParser(description="Run dummy_api with several worker processes sharing one state file.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--state", default=None,
+                        help="SQLite file to keep (and reuse on the next start); default: a temporary file")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    path = args.state
+    if path is None:
+        handle, path = tempfile.mkstemp(prefix="dummy-state-", suffix=".sqlite3")
+        os.close(handle)
+    os.environ[SHARED_STATE_ENV] = path
+    # Each worker starts its own image pool; together they should fill the machine once
+    os.environ.setdefault("DUMMY_MEDIA_WORKERS", str(max(1, (os.cpu_count() or 1) // args.workers)))
+    state = SharedState.from_env()
+    snapshot_path = os.environ.get(SNAPSHOT_ENV)
+    if state.is_empty() and snapshot_path and os.path.exists(snapshot_path):
+        # Workers only map the snapshot's columns; its overlay is loaded here, once
+        SharedDatabase(state).restore_overlay_state(map_snapshot(snapshot_path)[1])
+    try:
+        uvicorn.run("dummy_api:app", host=args.host, port=args.port, workers=args.workers, log_level=args.log_level)
+    finally:
+        if snapshot_path and os.environ.get(SAVE_ON_EXIT_ENV):
+            db = SharedDatabase(state)
+            db.attach_base(base_table())
+            save_snapshot(db, snapshot_path)
+        if args.state is None:
+            for suffix in ("", "-wal", "-shm"):
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path + suffix)
+
+
+if __name__ == "__main__":
+    main()
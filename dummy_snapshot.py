@@ -0,0 +1,203 @@
+"""On-disk snapshots of MockDatabase that load with mmap.
+
+File layout (little-endian):
+
+    header       magic, version, fixture tag, row counts, column count, overlay offset/length
+    directory    one entry per column: name, array typecode, offset, item count
+    columns      raw array.array bytes of the FixtureTable columns, 64-byte aligned
+    overlay      pickle of the dict-backed state (users touched, live creations,
+                 preferences, watermarks, generations, deleted fixture rows,
+                 usage totals)
+
+Loading maps the file read-only and casts each column in place, so a
+multi-GB fixture is ready in milliseconds and its pages are shared by every
+worker process that maps the same file; only the overlay is unpickled.
+Snapshots are trusted local files (the overlay is a pickle).
+
+    python -m dummy_snapshot build fixture.snap --users 1000000 --seed 42
+    python -m dummy_snapshot info fixture.snap
+    DUMMY_SNAPSHOT=fixture.snap python dummy_api.py
+"""
+import argparse
+import mmap
+import os
+import pickle
+import struct
+import sys
+import time
+from array import array
+
+from dummy_fixtures import (
+    CREATION_COLUMNS,
+    PREFERENCE_COLUMNS,
+    USER_COLUMNS,
+    WATERMARK_COLUMNS,
+    FixtureTable,
+    generate_fixture,
+)
+
+MAGIC = b"DMDBSNAP"
+VERSION = 2
+ALIGNMENT = 64
+
+HEADER = struct.Struct("<8sIIQQQQIQQ")
+COLUMN = struct.Struct("<32sc7xQQ")
+
+SNAPSHOT_ENV = "DUMMY_SNAPSHOT"
+SAVE_ON_EXIT_ENV = "DUMMY_SNAPSHOT_SAVE_ON_EXIT"
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _table_columns(table):
+    """(name, column) pairs in file order."""
+    if table is None:
+        return []
+    columns = [(f"users.{name}", table.users[name]) for name in USER_COLUMNS]
+    columns.append(("users.type_counts", table.type_counts))
+    columns += [(f"creations.{name}", table.creations[name]) for name in CREATION_COLUMNS]
+    columns += [(f"preferences.{name}", table.preferences[name]) for name in PREFERENCE_COLUMNS]
+    columns += [(f"watermarks.{name}", table.watermarks[name]) for name in WATERMARK_COLUMNS]
+    return columns
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def save_snapshot(db, path):
+    if sys.byteorder != "little":
+        raise SnapshotError("snapshots are little-endian only")
+    table = db.base
+    columns = _table_columns(table)
+    overlay = pickle.dumps(db.overlay_state(), protocol=pickle.HIGHEST_PROTOCOL)
+
+    offset = _align(HEADER.size + COLUMN.size * len(columns))
+    offsets = []
+    for name, column in columns:
+        offsets.append(offset)
+        offset = _align(offset + len(column) * column.itemsize)
+    overlay_offset = offset
+
+    header = HEADER.pack(
+        MAGIC, VERSION, table.tag if table else 0,
+        table.user_count if table else 0, table.creation_count if table else 0,
+        table.preference_count if table else 0, table.watermark_count if table else 0,
+        len(columns), overlay_offset, len(overlay),
+    )
+    # Write beside the target and rename, so processes mapping the old file keep a consistent view
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as fh:
+        fh.write(header)
+        for (name, column), offset in zip(columns, offsets):
+            # array.array has .typecode; a column mapped from a previous snapshot is a memoryview
+            typecode = getattr(column, "typecode", None) or column.format
+            fh.write(COLUMN.pack(name.encode(), typecode.encode(), offset, len(column)))
+        for (name, column), offset in zip(columns, offsets):
+            fh.write(b"\0" * (offset - fh.tell()))
+            fh.write(column)
+        fh.write(b"\0" * (overlay_offset - fh.tell()))
+        fh.write(overlay)
+    os.replace(tmp_path, path)
+    return overlay_offset + len(overlay)
+
+
+def read_header(view):
+    if len(view) < HEADER.size:
+        raise SnapshotError("file too short for a snapshot header")
+    magic, version, tag, users, creations, preferences, watermarks, column_count, overlay_offset, overlay_length = \
+        HEADER.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise SnapshotError("not a MockDatabase snapshot")
+    if version != VERSION:
+        raise SnapshotError(f"snapshot version {version} is not supported (expected {VERSION})")
+    return {
+        "tag": tag,
+        "users": users,
+        "creations": creations,
+        "preferences": preferences,
+        "watermarks": watermarks,
+        "column_count": column_count,
+        "overlay_offset": overlay_offset,
+        "overlay_length": overlay_length,
+    }
+
+
+def map_snapshot(path):
+    """Map a snapshot; returns (FixtureTable or None, overlay state dict)."""
+    with open(path, "rb") as fh:
+        mapping = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapping)
+    header = read_header(view)
+
+    columns = {}
+    for index in range(header["column_count"]):
+        raw_name, typecode, offset, count = COLUMN.unpack_from(view, HEADER.size + index * COLUMN.size)
+        typecode = typecode.decode()
+        columns[raw_name.rstrip(b"\0").decode()] = view[offset:offset + count * array(typecode).itemsize].cast(typecode)
+
+    start = header["overlay_offset"]
+    overlay = pickle.loads(view[start:start + header["overlay_length"]])
+
+    if not columns:
+        return None, overlay
+
+    def table(prefix, spec):
+        return {name: columns[f"{prefix}.{name}"] for name in spec}
+
+    fixture = FixtureTable(
+        header["tag"],
+        table("users", USER_COLUMNS),
+        columns["users.type_counts"],
+        table("creations", CREATION_COLUMNS),
+        table("preferences", PREFERENCE_COLUMNS),
+        table("watermarks", WATERMARK_COLUMNS),
+    )
+    # Keep the mapping alive as long as the table's memoryviews
+    fixture.mapping = mapping
+    return fixture, overlay
+
+
+def load_snapshot(db, path):
+    fixture, overlay = map_snapshot(path)
+    db.attach_base(fixture)
+    db.restore_overlay_state(overlay)
+    return db
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="generate a fixture and write it as a snapshot")
+    build.add_argument("path")
+    build.add_argument("--users", type=int, default=100_000)
+    build.add_argument("--creations-per-user", type=float, default=10)
+    build.add_argument("--heavy-users", type=int, default=0)
+    build.add_argument("--seed", type=int, default=0)
+    info = commands.add_parser("info", help="print a snapshot's header and time a full load")
+    info.add_argument("path")
+    args = parser.parse_args(argv)
+
+    from dummy_db import MockDatabase
+
+    if args.command == "build":
+        start = time.perf_counter()
+        db = MockDatabase()
+        db.attach_base(generate_fixture(args.users, args.creations_per_user, args.seed, args.heavy_users))
+        generated = time.perf_counter() - start
+        size = save_snapshot(db, args.path)
+        print(f"generated in {generated:.2f}s, wrote {size / 2**20:.1f} MiB in {time.perf_counter() - start - generated:.2f}s")
+    else:
+        with open(args.path, "rb") as fh:
+            header = read_header(fh.read(HEADER.size))
+        for key, value in header.items():
+            print(f"{key:16} {value:,}" if key != "tag" else f"{key:16} {value:08x}")
+        start = time.perf_counter()
+        load_snapshot(MockDatabase(), args.path)
+        print(f"loaded in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import asyncio
+import math
+import os
+import random
+
+# Time compression for the simulated generation pipelines.
+#
+# A speed factor of 1 replays the pipelines in real time, 10 runs them ten
+# times faster and "instant" (or 0) removes the waits entirely. Latency
+# profiles add simulated network delay on top and are not compressed, so a
+# fast pipeline can still be tested against a slow link.
+#
+# Server default:   DUMMY_SPEED=20 DUMMY_LATENCY_PROFILE=jitter python dummy_api.py
+# Per connection:   ws://host/ws/user@example.com?speed=instant&profile=mobile&seed=7
+
+SPEED_ENV = "DUMMY_SPEED"
+PROFILE_ENV = "DUMMY_LATENCY_PROFILE"
+
+# name -> (jitter as a fraction of each step, base latency seconds, latency spread seconds)
+LATENCY_PROFILES = {
+    "none": (0.0, 0.0, 0.0),
+    "jitter": (0.25, 0.0, 0.0),
+    "lan": (0.0, 0.002, 0.001),
+    "wifi": (0.1, 0.015, 0.010),
+    "mobile": (0.1, 0.080, 0.040),
+}
+
+
+def parse_speed(value):
+    if value is None or value == "":
+        return 1.0
+    if str(value).lower() == "instant":
+        return 0.0
+    speed = float(value)
+    if speed == 0:
+        return 0.0
+    if not math.isfinite(speed) or speed < 0:
+        raise ValueError(f"speed must be a finite positive number or 'instant', got {value!r}")
+    return speed
+
+
+class Pacing:
+    __slots__ = ("speed", "profile", "jitter", "latency", "spread", "_rng")
+
+    def __init__(self, speed=1.0, profile="none", seed=None):
+        if profile not in LATENCY_PROFILES:
+            raise ValueError(f"unknown latency profile {profile!r}, expected one of {sorted(LATENCY_PROFILES)}")
+        self.speed = speed
+        self.profile = profile
+        self.jitter, self.latency, self.spread = LATENCY_PROFILES[profile]
+        self._rng = random.Random(seed)
+
+    @classmethod
+    def from_env(cls):
+        return cls(parse_speed(os.environ.get(SPEED_ENV)), os.environ.get(PROFILE_ENV) or "none")
+
+    @property
+    def instant(self):
+        return self.speed == 0.0 and self.latency == 0.0
+
+    def delay(self, seconds):
+        """Wall-clock seconds to wait for a simulated step of `seconds`."""
+        scaled = 0.0 if self.speed == 0.0 else seconds / self.speed
+        if self.jitter and scaled:
+            scaled *= 1.0 + self._rng.uniform(-self.jitter, self.jitter)
+        if self.latency:
+            scaled += max(0.0, self.latency + self._rng.uniform(-self.spread, self.spread))
+        return scaled
+
+    async def sleep(self, seconds):
+        # sleep(0) still yields, so instant pipelines don't starve the loop
+        await asyncio.sleep(self.delay(seconds))
+
+
+server_pacing = Pacing.from_env()
+
+
+def pacing_for(query_params):
+    """Per-connection pacing from ?speed=&profile=&seed=, defaulting to the server's."""
+    speed = query_params.get("speed")
+    profile = query_params.get("profile")
+    seed = query_params.get("seed")
+    if speed is None and profile is None and seed is None:
+        return server_pacing
+    return Pacing(
+        server_pacing.speed if speed is None else parse_speed(speed),
+        profile or server_pacing.profile,
+        None if seed is None else int(seed),
+    )
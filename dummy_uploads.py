@@ -0,0 +1,397 @@
+import hashlib
+import os
+import re
+import struct
+import time
+
+from dummy_profiler import record_stage
+
+# Streaming multipart/form-data handling for the upload routes.
+#
+# The request body is parsed chunk by chunk straight from request.stream(), so
+# nothing is buffered or spooled to disk: each file part is reduced on the fly
+# to its size, SHA-256 and a few sniffed properties (image dimensions, MP4
+# duration). Memory stays bounded by one network chunk plus the boundary, and
+# sniffing only ever holds the few header bytes it asked for.
+#
+# Discard mode (?discard=1, or DUMMY_UPLOAD_DISCARD=1 for every request) only
+# counts bytes, for blasting large uploads at the server at line rate.
+
+UPLOAD_DISCARD_ENV = "DUMMY_UPLOAD_DISCARD"
+
+MAX_HEADER_BYTES = 16 * 1024
+# Non-file form fields (e.g. upload_video's `watermark`) are kept in memory
+MAX_FIELD_BYTES = 64 * 1024
+# Sniffer requests are at most 32 bytes and never start further back than this
+SNIFF_TAIL_BYTES = 64
+
+_BOUNDARY = re.compile(r'boundary="?([^";,]+)"?', re.IGNORECASE)
+_DISPOSITION_PARAM = re.compile(r';\s*([\w*-]+)\s*=\s*(?:"((?:[^"\\]|\\.)*)"|([^;\s]+))')
+
+_PREAMBLE, _AFTER_DELIMITER, _HEADERS, _BODY, _DONE = range(5)
+
+PART, DATA, END = "part", "data", "end"
+
+
+class MultipartError(ValueError):
+    pass
+
+
+def discard_requested(request):
+    value = request.query_params.get("discard", os.environ.get(UPLOAD_DISCARD_ENV, ""))
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+def parse_boundary(content_type):
+    if not content_type.lower().startswith("multipart/form-data"):
+        raise MultipartError("expected a multipart/form-data body")
+    match = _BOUNDARY.search(content_type)
+    if match is None:
+        raise MultipartError("multipart body without a boundary")
+    return match.group(1).encode("latin-1")
+
+
+def parse_part_headers(raw):
+    headers = {}
+    for line in raw.decode("latin-1").split("\r\n"):
+        name, sep, value = line.partition(":")
+        if not sep:
+            raise MultipartError(f"malformed part header {line!r}")
+        headers[name.strip().lower()] = value.strip()
+    params = {}
+    for match in _DISPOSITION_PARAM.finditer(headers.get("content-disposition", "")):
+        value = match.group(2) if match.group(2) is not None else match.group(3)
+        params[match.group(1).lower()] = value.replace('\\"', '"')
+    if "name" not in params:
+        raise MultipartError("part without a form field name")
+    return params["name"], params.get("filename"), headers.get("content-type", "application/octet-stream")
+
+
+class MultipartParser:
+    """Incremental parser: feed() takes raw body chunks and returns (event, value) pairs.
+
+    PART events carry (name, filename, content_type); DATA events carry
+    memoryviews into the current chunk, valid until the next feed().
+    """
+
+    def __init__(self, boundary):
+        self.delimiter = b"\r\n--" + boundary
+        # The first delimiter has no leading CRLF
+        self.buffer = b"\r\n"
+        self.state = _PREAMBLE
+
+    def feed(self, chunk):
+        data = self.buffer + chunk if self.buffer else chunk
+        view = memoryview(data)
+        delimiter = self.delimiter
+        events = []
+        pos = 0
+        while True:
+            state = self.state
+            if state == _BODY or state == _PREAMBLE:
+                index = data.find(delimiter, pos)
+                if index < 0:
+                    # Keep a tail that could be the start of a delimiter split across chunks
+                    keep = max(pos, len(data) - len(delimiter) + 1)
+                    if state == _BODY and keep > pos:
+                        events.append((DATA, view[pos:keep]))
+                    pos = keep
+                    break
+                if state == _BODY and index > pos:
+                    events.append((DATA, view[pos:index]))
+                pos = index + len(delimiter)
+                self.state = _AFTER_DELIMITER
+            elif state == _AFTER_DELIMITER:
+                if len(data) - pos < 2:
+                    break
+                marker = data[pos:pos + 2]
+                if marker == b"--":
+                    events.append((END, None))
+                    self.state = _DONE
+                elif marker == b"\r\n":
+                    pos += 2
+                    self.state = _HEADERS
+                else:
+                    raise MultipartError("malformed multipart delimiter")
+            elif state == _HEADERS:
+                index = data.find(b"\r\n\r\n", pos)
+                if index < 0:
+                    if len(data) - pos > MAX_HEADER_BYTES:
+                        raise MultipartError("multipart part headers too large")
+                    break
+                events.append((PART, parse_part_headers(data[pos:index])))
+                pos = index + 4
+                self.state = _BODY
+            else:
+                # Epilogue after the closing delimiter is ignored
+                pos = len(data)
+                break
+        self.buffer = data[pos:]
+        return events
+
+    def close(self):
+        if self.state != _DONE:
+            raise MultipartError("multipart body ended before the closing boundary")
+
+
+class Sniffer:
+    """Incremental format sniffing that only buffers the byte ranges it asks for.
+
+    Detects PNG, GIF, WebP and JPEG dimensions and the MP4/MOV duration from
+    the mvhd box, wherever moov sits in the file.
+    """
+
+    def __init__(self):
+        self.kind = None
+        self.width = None
+        self.height = None
+        self.duration = None
+        self.pos = 0
+        self._at = 0
+        self._need = 32
+        self._buf = bytearray()
+        self._then = self._detect
+        # The most recent stream bytes, for requests that start in an earlier chunk
+        self._tail = b""
+
+    def _want(self, at, count, then):
+        self._at = at
+        self._need = count
+        self._then = then
+
+    def _stop(self):
+        self._then = None
+
+    def feed(self, data):
+        end = self.pos + len(data)
+        while self._then is not None:
+            missing = self._need - len(self._buf)
+            if missing > 0:
+                start = self._at + len(self._buf)
+                if start < self.pos:
+                    offset = start - self.pos + len(self._tail)
+                    if offset < 0:
+                        # Points back past what we kept (malformed sizes)
+                        self._stop()
+                        break
+                    self._buf += self._tail[offset:offset + missing]
+                    continue
+                if start >= end:
+                    break
+                offset = start - self.pos
+                self._buf += data[offset:offset + missing]
+                if len(self._buf) < self._need:
+                    break
+            wanted = bytes(self._buf)
+            self._buf.clear()
+            self._then(wanted)
+        self._tail = (self._tail + bytes(data[-SNIFF_TAIL_BYTES:]))[-SNIFF_TAIL_BYTES:]
+        self.pos = end
+
+    @property
+    def done(self):
+        return self._then is None
+
+    def _detect(self, head):
+        self._stop()
+        if head.startswith(b"\x89PNG\r\n\x1a\n"):
+            self.kind = "png"
+            self.width, self.height = struct.unpack(">II", head[16:24])
+        elif head[:6] in (b"GIF87a", b"GIF89a"):
+            self.kind = "gif"
+            self.width, self.height = struct.unpack("<HH", head[6:10])
+        elif head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            self.kind = "webp"
+            chunk = head[12:16]
+            if chunk == b"VP8X":
+                self.width = 1 + int.from_bytes(head[24:27], "little")
+                self.height = 1 + int.from_bytes(head[27:30], "little")
+            elif chunk == b"VP8L":
+                bits = int.from_bytes(head[21:25], "little")
+                self.width = (bits & 0x3FFF) + 1
+                self.height = ((bits >> 14) & 0x3FFF) + 1
+            elif chunk == b"VP8 ":
+                self.width = int.from_bytes(head[26:28], "little") & 0x3FFF
+                self.height = int.from_bytes(head[28:30], "little") & 0x3FFF
+        elif head[:3] == b"\xff\xd8\xff":
+            self.kind = "jpeg"
+            self._want(2, 4, lambda segment: self._jpeg_segment(2, segment))
+        elif head[4:8] in (b"ftyp", b"moov", b"mdat", b"free", b"wide", b"skip"):
+            self.kind = "mp4"
+            self._mp4_box(0, head[:16], None)
+
+    def _jpeg_segment(self, at, segment):
+        if segment[0] != 0xFF:
+            return self._stop()
+        marker = segment[1]
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            # Start of frame: precision(1) height(2) width(2)
+            return self._want(at + 5, 4, self._jpeg_size)
+        if marker == 0xFF:
+            # Fill byte before the marker
+            return self._want(at + 1, 4, lambda next_segment: self._jpeg_segment(at + 1, next_segment))
+        if 0xD0 <= marker <= 0xD8 or marker == 0x01:
+            length = 0
+        elif marker == 0xD9 or marker == 0xDA:
+            # End of image, or entropy-coded data without a frame header first
+            return self._stop()
+        else:
+            length = struct.unpack(">H", segment[2:4])[0]
+        following = at + 2 + length
+        self._want(following, 4, lambda next_segment: self._jpeg_segment(following, next_segment))
+
+    def _jpeg_size(self, size):
+        self.height, self.width = struct.unpack(">HH", size)
+        self._stop()
+
+    def _mp4_box(self, at, header, parent_end):
+        size, box_type = struct.unpack(">I4s", header[:8])
+        header_size = 8
+        if size == 1:
+            size = struct.unpack(">Q", header[8:16])[0]
+            header_size = 16
+        if box_type == b"mvhd":
+            return self._want(at + header_size, 32, self._mvhd)
+        if box_type == b"moov":
+            child = at + header_size
+            end = at + size if size else None
+            return self._want(child, 16, lambda next_header: self._mp4_box(child, next_header, end))
+        if size < header_size:
+            # Zero size runs to the end of the file; anything smaller is corrupt
+            return self._stop()
+        following = at + size
+        if parent_end is not None and following >= parent_end:
+            return self._stop()
+        self._want(following, 16, lambda next_header: self._mp4_box(following, next_header, parent_end))
+
+    def _mvhd(self, payload):
+        if payload[0] == 1:
+            timescale, duration = struct.unpack(">IQ", payload[20:32])
+        else:
+            timescale, duration = struct.unpack(">II", payload[12:20])
+        if timescale:
+            self.duration = round(duration / timescale, 3)
+        self._stop()
+
+
+class UploadedFile:
+    __slots__ = ("field", "filename", "content_type", "size", "writer", "_hash", "_sniffer")
+
+    def __init__(self, field, filename, content_type, discard=False, writer=None):
+        self.field = field
+        self.filename = filename
+        self.content_type = content_type
+        self.size = 0
+        # Optional sink for the raw bytes (a dummy_blobs.BlobWriter)
+        self.writer = writer
+        self._hash = None if discard else hashlib.sha256()
+        self._sniffer = None if discard else Sniffer()
+
+    def feed(self, data):
+        self.size += len(data)
+        if self.writer is not None:
+            self.writer.write(data)
+        if self._hash is not None:
+            self._hash.update(data)
+            if not self._sniffer.done:
+                self._sniffer.feed(data)
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest() if self._hash is not None else None
+
+    @property
+    def duration(self):
+        return self._sniffer.duration if self._sniffer is not None else None
+
+    def summary(self):
+        info = {
+            "field": self.field,
+            "filename": self.filename,
+            "content_type": self.content_type,
+            "size": self.size,
+            "sha256": self.sha256
+        }
+        sniffer = self._sniffer
+        if sniffer is not None and sniffer.kind is not None:
+            info["format"] = sniffer.kind
+            if sniffer.width is not None:
+                info["width"] = sniffer.width
+                info["height"] = sniffer.height
+            if sniffer.duration is not None:
+                info["duration"] = sniffer.duration
+        return info
+
+
+async def read_multipart(request, discard=None, open_writer=None):
+    """Stream a multipart body; returns ({field: [UploadedFile]}, {field: str}).
+
+    open_writer(), if given, returns a sink for each file's bytes (not used in
+    discard mode); the sinks are aborted if the body turns out to be invalid.
+    """
+    if discard is None:
+        discard = discard_requested(request)
+    if discard:
+        open_writer = None
+    files = {}
+    fields = {}
+    content_type = request.headers.get("content-type")
+    if content_type is None:
+        # No form at all, like a request without any of the optional files
+        async for chunk in request.stream():
+            if chunk:
+                raise MultipartError("expected a multipart/form-data body")
+        return files, fields
+    parser = MultipartParser(parse_boundary(content_type))
+    current = None
+    value = None
+    # CPU time spent parsing, without the waits for the next chunk
+    parsing = 0.0
+    try:
+        async for chunk in request.stream():
+            started = time.perf_counter()
+            for event, payload in parser.feed(chunk):
+                if event == DATA:
+                    if current is not None:
+                        current.feed(payload)
+                    else:
+                        value += payload
+                        if len(value) > MAX_FIELD_BYTES:
+                            raise MultipartError("form field too large")
+                elif event == PART:
+                    name, filename, content_type = payload
+                    current = value = None
+                    if filename is not None:
+                        writer = open_writer() if open_writer is not None else None
+                        current = UploadedFile(name, filename, content_type, discard, writer)
+                        files.setdefault(name, []).append(current)
+                    else:
+                        value = bytearray()
+                        fields[name] = value
+            parsing += time.perf_counter() - started
+        parser.close()
+    except BaseException:
+        # Includes client disconnects mid-upload
+        for uploads in files.values():
+            for upload in uploads:
+                if upload.writer is not None:
+                    upload.writer.abort()
+        raise
+    finally:
+        record_stage("multipart", parsing)
+    return files, {name: raw.decode("utf-8", "replace") for name, raw in fields.items()}
+
+
+def multipart_openapi(*file_fields, form_fields=(), required=()):
+    """requestBody schema for routes that parse the body themselves (FastAPI can't infer it)."""
+    properties = {name: {"type": "string", "format": "binary"} for name in file_fields}
+    properties.update({name: {"type": "string"} for name in form_fields})
+    schema = {"type": "object", "properties": properties}
+    if required:
+        schema["required"] = list(required)
+    return {
+        "requestBody": {
+            "required": bool(required),
+            "content": {"multipart/form-data": {"schema": schema}}
+        }
+    }